@@ -1,65 +1,100 @@
-from langchain.llms.base import BaseLLM
-from langchain.schema import HumanMessage
-from typing import Any, Dict, List
-import json
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
 import sys
 import os
-import numpy as np
 from datetime import datetime
 
 # Add the services directory to the path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from services.enhanced_financial_data_service import EnhancedFinancialDataService
+from services.metrics import SYMBOL_RESOLUTION_SECONDS
+from services.prompt_encoding import encode_data, encode_snapshot, snapshot_token_budget
+from services.tracing import propagate, span
+from .llm_client import record_failure
+from .model_router import as_router
 
 class EnhancedAnalysisAgent:
-    def __init__(self, llm: BaseLLM):
+    def __init__(self, llm: Any, data_service: EnhancedFinancialDataService = None):
         self.llm = llm
+        self.router = as_router(llm)
         self.name = "Enhanced Analysis Agent"
-        self.data_service = EnhancedFinancialDataService()
+        self.data_service = data_service or EnhancedFinancialDataService()
     
-    def _call_llm(self, prompt: str) -> str:
-        """Helper method to call the LLM with proper format"""
+    def _call_llm(self, prompt: str, call_type: str = "analysis", task: str = "agent_report") -> str:
+        """Helper method to call the LLM for a task class (see agents/model_router.py)"""
+        return self.router.call(prompt, self.name, call_type, task)
+    
+    async def _acall_llm(self, prompt: str, call_type: str = "analysis", task: str = "agent_report") -> str:
+        """Async _call_llm, awaited on the caller's event loop"""
+        return await self.router.acall(prompt, self.name, call_type, task)
+    
+    def analyze_financial_data(self, research_data: str, symbol: str = None, real_data: Dict = None,
+                               quant_metrics: Dict = None) -> str:
+        """
+        Perform detailed financial analysis using real market data.
+        symbol and real_data, when already known (e.g. from a stored run), skip re-extracting
+        the symbol from the research text and fetching the data again; quant_metrics
+        (from compute_quant_metrics) skips recalculating them.
+        """
         try:
-            if hasattr(self.llm, 'predict_messages') or 'Chat' in str(type(self.llm)):
-                response = self.llm.invoke([HumanMessage(content=prompt)])
-                return response.content if hasattr(response, 'content') else str(response)
-            else:
-                return self.llm.invoke(prompt)
+            prompt, call_type, symbol = self._analysis_prompt(research_data, symbol, real_data, quant_metrics)
+            return self._analysis_report(self._call_llm(prompt, call_type=call_type, task="agent_report"), symbol)
+            
         except Exception as e:
-            return f"LLM call failed: {str(e)}"
+            record_failure(self.name, "analysis")
+            return f"Enhanced Analysis Agent error: {str(e)}"
     
-    def analyze_financial_data(self, research_data: str) -> str:
+    async def aanalyze_financial_data(self, research_data: str, symbol: str = None, real_data: Dict = None,
+                                      quant_metrics: Dict = None) -> str:
         """
-        Perform detailed financial analysis using real market data
+        analyze_financial_data with the LLM call awaited on the caller's event loop. Symbol
+        extraction and the data fetch, when still needed, run on a worker thread.
         """
         try:
-            # Extract symbol from research data
-            symbol = self._extract_symbol_from_research(research_data)
-            
-            if not symbol:
-                return self._analyze_research_text_only(research_data)
-            
-            # Get fresh real data for analysis
-            print(f"🔄 Performing real-time analysis for {symbol}...")
-            real_data = self.data_service.get_comprehensive_stock_data(symbol)
-            
-            if "error" in real_data:
-                return self._analyze_research_text_only(research_data)
-            
-            # Perform comprehensive analysis with real data
-            analysis = self._perform_comprehensive_analysis(symbol, real_data, research_data)
-            
-            return f"**ENHANCED FINANCIAL ANALYSIS** ({symbol})\nReal-time Data Analysis Complete\n\n{analysis}"
+            if symbol and real_data is not None:
+                prompt, call_type, symbol = self._analysis_prompt(research_data, symbol, real_data, quant_metrics)
+            else:
+                prompt, call_type, symbol = await asyncio.to_thread(
+                    propagate(self._analysis_prompt), research_data, symbol, real_data, quant_metrics)
+            return self._analysis_report(await self._acall_llm(prompt, call_type=call_type, task="agent_report"), symbol)
             
         except Exception as e:
+            record_failure(self.name, "analysis")
             return f"Enhanced Analysis Agent error: {str(e)}"
     
-    def analyze_data(self, data: str) -> str:
+    def _analysis_prompt(self, research_data: str, symbol: Optional[str], real_data: Optional[Dict],
+                         quant_metrics: Optional[Dict]) -> Tuple[str, str, Optional[str]]:
+        """(prompt, call type, symbol) of the analysis to run; symbol is None for the text-only fallback"""
+        if not symbol:
+            # Extract symbol from research data
+            with SYMBOL_RESOLUTION_SECONDS.time(agent=self.name), span('symbol_resolution', agent=self.name):
+                symbol = self._extract_symbol_from_research(research_data)
+        
+        if not symbol:
+            return self._text_only_analysis_prompt(research_data), "text_only_analysis", None
+        
+        # Get fresh real data for analysis
+        print(f"🔄 Performing real-time analysis for {symbol}...")
+        if real_data is None:
+            real_data = self.data_service.get_comprehensive_stock_data(symbol)
+        
+        if "error" in real_data:
+            return self._text_only_analysis_prompt(research_data), "text_only_analysis", None
+        
+        # Perform comprehensive analysis with real data
+        return self._comprehensive_analysis_prompt(symbol, real_data, research_data, quant_metrics), "analysis", symbol
+    
+    def _analysis_report(self, analysis: str, symbol: Optional[str]) -> str:
+        if symbol is None:
+            return analysis
+        return f"**ENHANCED FINANCIAL ANALYSIS** ({symbol})\nReal-time Data Analysis Complete\n\n{analysis}"
+    
+    def analyze_data(self, data: str, symbol: str = None, real_data: Dict = None) -> str:
         """
         Legacy method name compatibility - delegates to analyze_financial_data
         """
-        return self.analyze_financial_data(data)
+        return self.analyze_financial_data(data, symbol=symbol, real_data=real_data)
     
     def _extract_symbol_from_research(self, research_data: str) -> str:
         """Extract stock symbol from research data"""
@@ -96,8 +131,8 @@ class EnhancedAnalysisAgent:
         except Exception:
             return False
     
-    def _analyze_research_text_only(self, research_data: str) -> str:
-        """Analyze research data when no symbol is available"""
+    def _text_only_analysis_prompt(self, research_data: str) -> str:
+        """Prompt analyzing the research text alone, when no symbol or data is available"""
         
         prompt = f"""
         You are a senior financial analyst reviewing a research report. Analyze the provided research data and provide additional insights, validations, and risk assessments.
@@ -142,10 +177,22 @@ class EnhancedAnalysisAgent:
         Focus on providing actionable insights and professional-grade financial analysis. Do not use emojis in your response.
         """
         
-        return self._call_llm(prompt)
+        return prompt
     
-    def _perform_comprehensive_analysis(self, symbol: str, real_data: Dict, research_data: str) -> str:
-        """Perform comprehensive analysis using real financial data"""
+    def compute_quant_metrics(self, real_data: Dict) -> Dict[str, Any]:
+        """
+        The analysis' numeric inputs; they depend only on the data snapshot, so the
+        orchestrator computes them while the research report is still being generated
+        """
+        return {
+            'advanced_metrics': self._calculate_advanced_metrics(real_data),
+            'investment_score': self._calculate_investment_score(real_data),
+            'risk_assessment': self._perform_risk_assessment(real_data)
+        }
+
+    def _comprehensive_analysis_prompt(self, symbol: str, real_data: Dict, research_data: str,
+                                       quant_metrics: Dict = None) -> str:
+        """The analysis prompt: research text plus quantitative metrics from the real financial data"""
         
         # Extract key metrics for calculations
         price_data = real_data.get('price_data', {})
@@ -155,9 +202,11 @@ class EnhancedAnalysisAgent:
         market_data = real_data.get('market_data', {})
         
         # Perform advanced calculations
-        advanced_metrics = self._calculate_advanced_metrics(real_data)
-        investment_score = self._calculate_investment_score(real_data)
-        risk_assessment = self._perform_risk_assessment(real_data)
+        if quant_metrics is None:
+            quant_metrics = self.compute_quant_metrics(real_data)
+        advanced_metrics = quant_metrics['advanced_metrics']
+        investment_score = quant_metrics['investment_score']
+        risk_assessment = quant_metrics['risk_assessment']
         
         prompt = f"""
         You are a quantitative financial analyst with expertise in advanced financial modeling. You have access to REAL, LIVE financial data for {symbol} and need to provide a comprehensive analytical assessment.
@@ -166,15 +215,15 @@ class EnhancedAnalysisAgent:
         {research_data[:1500]}...
         
         **REAL-TIME FINANCIAL DATA FOR ANALYSIS:**
-        {json.dumps(real_data, indent=2)[:3000]}...
+        {encode_snapshot(real_data)['text']}
         
         **ADVANCED CALCULATED METRICS:**
-        {json.dumps(advanced_metrics, indent=2)}
+        {encode_data('ADVANCED METRICS', advanced_metrics)}
         
         **QUANTITATIVE INVESTMENT SCORE:** {investment_score}/100
         
         **RISK ASSESSMENT SUMMARY:**
-        {json.dumps(risk_assessment, indent=2)}
+        {encode_data('RISK ASSESSMENT', risk_assessment)}
         
         Provide a comprehensive financial analysis using this real data:
 
@@ -266,7 +315,7 @@ class EnhancedAnalysisAgent:
         **Next Review:** Quarterly earnings or significant market events
         """
         
-        return self._call_llm(prompt)
+        return prompt
     
     def _calculate_advanced_metrics(self, data: Dict) -> Dict:
         """Calculate advanced financial metrics from real data"""
@@ -689,10 +738,10 @@ class EnhancedAnalysisAgent:
         You are performing a comparative analysis of multiple stocks using real financial data. Provide a comprehensive comparison focusing on investment merits of each stock.
         
         **REAL COMPARISON DATA:**
-        {json.dumps(comparison_metrics, indent=2)}
+        {encode_data('COMPARISON METRICS', comparison_metrics)}
         
         **DETAILED DATA FOR EACH STOCK:**
-        {json.dumps({k: v for k, v in comparison_data.items()}, indent=2)[:2000]}...
+        {self._format_comparison_details(comparison_data)}
         
         Generate a professional comparative analysis:
 
@@ -750,8 +799,16 @@ class EnhancedAnalysisAgent:
         Use only the real financial data provided to support all conclusions and recommendations.
         """
         
-        return self._call_llm(prompt)
+        return self._call_llm(prompt, call_type="comparison", task="summarize")
     
+    def _format_comparison_details(self, comparison_data: Dict) -> str:
+        """Compact snapshot of each stock, splitting the token budget evenly between them"""
+        budget = snapshot_token_budget() // max(len(comparison_data), 1)
+        details = []
+        for symbol, data in comparison_data.items():
+            details.append(f"=== {symbol} ===\n{encode_snapshot(data, token_budget=budget)['text']}")
+        return "\n\n".join(details)
+
     def _format_performance_comparison(self, metrics: Dict) -> str:
         """Format performance comparison"""
         performance_data = []
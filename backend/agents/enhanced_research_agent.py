@@ -1,7 +1,5 @@
-from langchain.llms.base import BaseLLM
-from langchain.schema import HumanMessage
-from typing import Any, Dict, List
-import json
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
 import sys
 import os
 import re
@@ -11,25 +9,30 @@ from datetime import datetime
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from services.enhanced_financial_data_service import EnhancedFinancialDataService
+from services.metrics import SYMBOL_RESOLUTION_SECONDS
+from services.prompt_encoding import encode_snapshot
+from services.tracing import propagate, span
+from .llm_client import record_failure
+from .model_router import as_router
 
 class EnhancedResearchAgent:
-    def __init__(self, llm: BaseLLM):
+    # Snapshot sections included in the research prompt
+    PROMPT_SECTIONS = ('basic_info', 'price_data', 'financial_statements',
+                       'valuation_metrics', 'risk_metrics', 'market_data')
+
+    def __init__(self, llm: Any, data_service: EnhancedFinancialDataService = None):
         self.llm = llm
+        self.router = as_router(llm)
         self.name = "Enhanced Research Agent"
-        self.data_service = EnhancedFinancialDataService()
+        self.data_service = data_service or EnhancedFinancialDataService()
     
-    def _call_llm(self, prompt: str) -> str:
-        """Helper method to call the LLM with proper format"""
-        try:
-            # Check if it's ChatOpenAI (has message-based interface)
-            if hasattr(self.llm, 'predict_messages') or 'Chat' in str(type(self.llm)):
-                response = self.llm.invoke([HumanMessage(content=prompt)])
-                return response.content if hasattr(response, 'content') else str(response)
-            else:
-                # Fallback for other LLM types
-                return self.llm.invoke(prompt)
-        except Exception as e:
-            return f"LLM call failed: {str(e)}"
+    def _call_llm(self, prompt: str, call_type: str = "research", task: str = "agent_report") -> str:
+        """Helper method to call the LLM for a task class (see agents/model_router.py)"""
+        return self.router.call(prompt, self.name, call_type, task)
+    
+    async def _acall_llm(self, prompt: str, call_type: str = "research", task: str = "agent_report") -> str:
+        """Async _call_llm, awaited on the caller's event loop"""
+        return await self.router.acall(prompt, self.name, call_type, task)
     
     def _extract_stock_symbol(self, company_info: str) -> str:
         """Extract stock symbol from company information"""
@@ -113,44 +116,98 @@ class EnhancedResearchAgent:
         """
         Research comprehensive financial information about a company using REAL data
         """
+        return self.research_company_with_data(company_info)['report']
+
+    def resolve_symbol(self, company_info: str) -> str:
+        """Extract and validate the stock symbol for a query (None if no valid symbol is found)"""
+        with SYMBOL_RESOLUTION_SECONDS.time(agent=self.name), span('symbol_resolution', agent=self.name):
+            return self._extract_stock_symbol(company_info)
+
+    def research_company_with_data(self, company_info: str, symbol: str = None, real_data: Dict = None) -> Dict[str, Any]:
+        """
+        research_company, also returning the resolved symbol and the market data snapshot
+        the report was written from ({'report', 'symbol', 'data'}; symbol/data are None on failure).
+        symbol and real_data, when already known, skip symbol resolution and the data fetch.
+        """
+        try:
+            failed, symbol, real_data = self._research_inputs(company_info, symbol, real_data)
+            if failed is not None:
+                return failed
+            
+            # Generate comprehensive analysis using real data
+            analysis = self._generate_comprehensive_analysis(symbol, real_data)
+            return self._research_report(analysis, symbol, real_data)
+            
+        except Exception as e:
+            record_failure(self.name, "research")
+            return self._research_result(f"Enhanced Research Agent error: {str(e)}")
+
+    async def aresearch_company_with_data(self, company_info: str, symbol: str = None,
+                                          real_data: Dict = None) -> Dict[str, Any]:
+        """
+        research_company_with_data with the LLM call awaited on the caller's event loop. Symbol
+        resolution and the data fetch, when still needed, run on a worker thread.
+        """
         try:
-            # Extract stock symbol
-            symbol = self._extract_stock_symbol(company_info)
+            if symbol and real_data is not None:
+                failed, symbol, real_data = self._research_inputs(company_info, symbol, real_data)
+            else:
+                failed, symbol, real_data = await asyncio.to_thread(
+                    propagate(self._research_inputs), company_info, symbol, real_data)
+            if failed is not None:
+                return failed
+            
+            analysis = await self._acall_llm(self._comprehensive_analysis_prompt(symbol, real_data),
+                                             call_type="research", task="agent_report")
+            return self._research_report(analysis, symbol, real_data)
             
-            if not symbol:
-                # Try to suggest potential symbols if company name is provided
-                suggestions = self._suggest_symbols(company_info)
-                suggestion_text = f"\n\nDid you mean one of these? {', '.join(suggestions)}" if suggestions else ""
-                return f"""Unable to identify a valid stock symbol from: "{company_info}"
+        except Exception as e:
+            record_failure(self.name, "research")
+            return self._research_result(f"Enhanced Research Agent error: {str(e)}")
+
+    def _research_inputs(self, company_info: str, symbol: Optional[str],
+                         real_data: Optional[Dict]) -> Tuple[Optional[Dict[str, Any]], Optional[str], Optional[Dict]]:
+        """(failure result or None, symbol, snapshot): resolves the symbol and fetches its data when not given"""
+        # Extract stock symbol
+        if not symbol:
+            symbol = self.resolve_symbol(company_info)
+        
+        if not symbol:
+            # Try to suggest potential symbols if company name is provided
+            suggestions = self._suggest_symbols(company_info)
+            suggestion_text = f"\n\nDid you mean one of these? {', '.join(suggestions)}" if suggestions else ""
+            return self._research_result(f"""Unable to identify a valid stock symbol from: "{company_info}"
 
 Please provide:
 1. A valid stock ticker symbol (e.g., AAPL, MSFT, GOOGL, TSLA)
 2. Company name with ticker in parentheses (e.g., "Apple Inc. (AAPL)")
 3. Any publicly traded stock symbol on major exchanges{suggestion_text}
 
-The system can analyze ANY publicly traded stock with real-time data from Yahoo Finance."""
-            
-            # Get comprehensive real data
+The system can analyze ANY publicly traded stock with real-time data from Yahoo Finance."""), None, None
+        
+        # Get comprehensive real data
+        if real_data is None:
             print(f"Fetching real financial data for {symbol}...")
             real_data = self.data_service.get_comprehensive_stock_data(symbol)
-            
-            if "error" in real_data:
-                return f"""Error fetching data for {symbol}: {real_data['error']}
+        
+        if "error" in real_data:
+            return self._research_result(f"""Error fetching data for {symbol}: {real_data['error']}
 
 This might mean:
 1. {symbol} is not a valid/active stock ticker
 2. The stock is delisted or suspended
 3. Temporary data service issue
 
-Please verify the ticker symbol and try again. The system supports all major exchanges (NYSE, NASDAQ, etc.)."""
-            
-            # Generate comprehensive analysis using real data
-            analysis = self._generate_comprehensive_analysis(symbol, real_data)
-            
-            return f"**REAL-TIME FINANCIAL RESEARCH REPORT** ({symbol})\nData Updated: {real_data.get('data_timestamp', 'N/A')}\n\n{analysis}"
-            
-        except Exception as e:
-            return f"Enhanced Research Agent error: {str(e)}"
+Please verify the ticker symbol and try again. The system supports all major exchanges (NYSE, NASDAQ, etc.)."""), None, None
+        
+        return None, symbol, real_data
+
+    def _research_report(self, analysis: str, symbol: str, real_data: Dict) -> Dict[str, Any]:
+        report = f"**REAL-TIME FINANCIAL RESEARCH REPORT** ({symbol})\nData Updated: {real_data.get('data_timestamp', 'N/A')}\n\n{analysis}"
+        return self._research_result(report, symbol, real_data)
+
+    def _research_result(self, report: str, symbol: str = None, data: Dict = None) -> Dict[str, Any]:
+        return {'report': report, 'symbol': symbol, 'data': data}
 
     def _suggest_symbols(self, company_info: str) -> List[str]:
         """Suggest potential stock symbols based on partial company names"""
@@ -206,6 +263,10 @@ Please verify the ticker symbol and try again. The system supports all major exc
     
     def _generate_comprehensive_analysis(self, symbol: str, data: Dict) -> str:
         """Generate comprehensive analysis using real data"""
+        return self._call_llm(self._comprehensive_analysis_prompt(symbol, data), call_type="research", task="agent_report")
+    
+    def _comprehensive_analysis_prompt(self, symbol: str, data: Dict) -> str:
+        """The research prompt for symbol's snapshot"""
         
         basic_info = data.get('basic_info', {})
         price_data = data.get('price_data', {})
@@ -352,32 +413,11 @@ Please verify the ticker symbol and try again. The system supports all major exc
         *This report uses real financial data and professional analysis methodologies. All numbers are actual market values, not estimates or projections.*
         """
         
-        result = self._call_llm(prompt)
-        return result
+        return prompt
     
     def _format_real_data_for_llm(self, data: Dict) -> str:
-        """Format real data comprehensively for LLM"""
-        sections = []
-        
-        if 'basic_info' in data:
-            sections.append(f"COMPANY INFO: {json.dumps(data['basic_info'], indent=2)}")
-        
-        if 'price_data' in data:
-            sections.append(f"PRICE & PERFORMANCE DATA: {json.dumps(data['price_data'], indent=2)}")
-        
-        if 'financial_statements' in data:
-            sections.append(f"FINANCIAL STATEMENTS: {json.dumps(data['financial_statements'], indent=2)}")
-        
-        if 'valuation_metrics' in data:
-            sections.append(f"VALUATION METRICS: {json.dumps(data['valuation_metrics'], indent=2)}")
-        
-        if 'risk_metrics' in data:
-            sections.append(f"RISK METRICS: {json.dumps(data['risk_metrics'], indent=2)}")
-        
-        if 'market_data' in data:
-            sections.append(f"MARKET CONTEXT: {json.dumps(data['market_data'], indent=2)}")
-        
-        return "\n\n".join(sections)
+        """Format real data comprehensively for LLM (compact key/value encoding within the token budget)"""
+        return encode_snapshot(data, sections=self.PROMPT_SECTIONS)['text']
     
     def _format_returns_analysis(self, returns: Dict) -> str:
         """Format returns data for analysis"""
@@ -490,17 +530,27 @@ Please verify the ticker symbol and try again. The system supports all major exc
     
     def get_quick_analysis(self, symbol: str) -> str:
         """Get quick financial analysis for a stock"""
+        return self.get_quick_analysis_with_data(symbol)['report']
+    
+    def get_quick_analysis_with_data(self, symbol: str, narrative: bool = False) -> Dict[str, Any]:
+        """
+        Rule-based quick analysis: fundamentals and technicals (both cached by the data service) scored
+        by quick_assessment() and rendered from a template, with no LLM call unless narrative is set.
+        Returns {'report', 'assessment', 'narrative'}; assessment/narrative are None when unavailable.
+        """
         try:
             # Get fundamental data
             fundamentals = self.data_service.get_stock_fundamentals(symbol)
             if "error" in fundamentals:
-                return f"{fundamentals['error']}"
+                return {'report': f"{fundamentals['error']}", 'assessment': None, 'narrative': None}
             
             # Get technical indicators
             technical = self.data_service.get_technical_indicators(symbol)
             if "error" in technical:
                 technical = {}
             
+            assessment = self.quick_assessment(fundamentals, technical)
+            
             # Format quick analysis
             analysis = f"""
 **QUICK ANALYSIS: {symbol}**
@@ -521,51 +571,84 @@ Please verify the ticker symbol and try again. The system supports all major exc
 - RSI: {technical.get('rsi', 50):.1f}
 
 **💡 Quick Assessment:**
-{self._generate_quick_assessment(fundamentals, technical)}
+{self._format_quick_assessment(assessment)}
             """
             
-            return analysis
+            return {
+                'report': analysis,
+                'assessment': assessment,
+                'narrative': self._quick_narrative(symbol, analysis) if narrative else None
+            }
             
         except Exception as e:
-            return f"Error in quick analysis: {str(e)}"
+            return {'report': f"Error in quick analysis: {str(e)}", 'assessment': None, 'narrative': None}
     
-    def _generate_quick_assessment(self, fundamentals: Dict, technical: Dict) -> str:
-        """Generate quick investment assessment"""
-        assessments = []
+    def quick_assessment(self, fundamentals: Dict, technical: Dict) -> Dict[str, Any]:
+        """
+        Score the quick-analysis rules: each triggered rule is a signal scored +1 (favourable) or
+        -1 (unfavourable), or 0 for a neutral valuation. Returns the signals, their total and a stance.
+        """
+        signals = []
+        
+        def signal(factor: str, score: int, label: str):
+            signals.append({'factor': factor, 'score': score, 'signal': label})
         
         # Valuation assessment
-        pe_ratio = fundamentals.get('pe_ratio', 0)
+        pe_ratio = fundamentals.get('pe_ratio', 0) or 0
         if pe_ratio > 0:
             if pe_ratio < 15:
-                assessments.append("Potentially undervalued (low P/E)")
+                signal('valuation', 1, "Potentially undervalued (low P/E)")
             elif pe_ratio > 25:
-                assessments.append("Potentially overvalued (high P/E)")
+                signal('valuation', -1, "Potentially overvalued (high P/E)")
             else:
-                assessments.append("Fairly valued (moderate P/E)")
+                signal('valuation', 0, "Fairly valued (moderate P/E)")
         
         # Financial health
-        current_ratio = fundamentals.get('current_ratio', 0)
+        current_ratio = fundamentals.get('current_ratio', 0) or 0
         if current_ratio > 1.5:
-            assessments.append("Strong liquidity position")
+            signal('liquidity', 1, "Strong liquidity position")
         elif current_ratio < 1:
-            assessments.append("Potential liquidity concerns")
+            signal('liquidity', -1, "Potential liquidity concerns")
         
         # Profitability
-        roe = fundamentals.get('roe', 0)
+        roe = fundamentals.get('roe', 0) or 0
         if roe > 15:
-            assessments.append("Strong profitability (ROE > 15%)")
+            signal('profitability', 1, "Strong profitability (ROE > 15%)")
         elif roe < 5:
-            assessments.append("Low profitability concerns")
+            signal('profitability', -1, "Low profitability concerns")
         
         # Technical position
         if technical:
-            price_vs_sma200 = technical.get('price_vs_sma200', 0)
+            price_vs_sma200 = technical.get('price_vs_sma200', 0) or 0
             if price_vs_sma200 > 10:
-                assessments.append("Strong technical momentum")
+                signal('technical', 1, "Strong technical momentum")
             elif price_vs_sma200 < -10:
-                assessments.append("Weak technical position")
+                signal('technical', -1, "Weak technical position")
         
-        return " | ".join(assessments) if assessments else "Mixed signals - requires deeper analysis"
+        score = sum(s['score'] for s in signals)
+        if score >= 2:
+            stance = 'positive'
+        elif score <= -2:
+            stance = 'negative'
+        else:
+            stance = 'mixed'
+        return {'score': score, 'stance': stance, 'signals': signals}
+    
+    def _format_quick_assessment(self, assessment: Dict[str, Any]) -> str:
+        if not assessment['signals']:
+            return "Mixed signals - requires deeper analysis"
+        summary = " | ".join(s['signal'] for s in assessment['signals'])
+        return f"{summary}\nOverall: {assessment['stance'].capitalize()} ({assessment['score']:+d})"
+    
+    def _quick_narrative(self, symbol: str, analysis: str) -> str:
+        """Optional short LLM commentary on a rendered quick analysis"""
+        prompt = f"""
+        You are a financial analyst. In 3-4 sentences, explain what the following quick analysis of {symbol} means for an investor.
+        Use only the figures given. Do not use emojis in your response.
+        
+        {analysis}
+        """
+        return self._call_llm(prompt, call_type="quick_narrative", task="summarize")
     
     def get_market_data(self, symbol: str) -> str:
         """
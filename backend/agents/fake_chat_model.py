@@ -0,0 +1,180 @@
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+import asyncio
+import itertools
+import random
+import re
+import time
+
+# Global call counter so every call draws a different (but reproducible) latency sample
+_CALL_COUNTER = itertools.count()
+
+DEFAULT_TEMPLATE = """{heading}
+
+This is a deterministic response from the fake chat model ({model_name}), call #{call_number}.
+The prompt contained {prompt_tokens} tokens. No external model was contacted.
+"""
+
+FILLER_SENTENCE = ("The fake backend produces filler text at the configured token rate so that "
+                   "orchestration overhead can be measured separately from model latency. ")
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic, network-free chat model for load testing.
+
+    Responses are canned (first matching keyword in ``responses``) or rendered
+    from ``default_template``, then padded to ``output_tokens``. Latency follows
+    time-to-first-token plus tokens/second, both scaled by a per-call jitter
+    factor drawn from a seeded distribution. With ``straggler_probability`` set,
+    that fraction of calls stalls for an extra ``straggler_delay_seconds``
+    before the first token, to exercise hedging and timeouts.
+    """
+
+    model_name: str = "fake-chat"
+    temperature: float = 0.0
+    ttft_seconds: float = 0.5
+    tokens_per_second: float = 50.0
+    jitter: str = "lognormal"  # none | uniform | normal | lognormal
+    jitter_scale: float = 0.25
+    output_tokens: int = 600
+    straggler_probability: float = 0.0
+    straggler_delay_seconds: float = 30.0
+    seed: int = 42
+    responses: Dict[str, str] = {}
+    default_template: str = DEFAULT_TEMPLATE
+
+    @classmethod
+    def from_config(cls, config) -> "FakeChatModel":
+        """Build the fake model from FAKE_LLM_* settings in config.py"""
+        return cls(
+            model_name=getattr(config, 'FAKE_LLM_MODEL_NAME', 'fake-chat'),
+            temperature=getattr(config, 'AGENT_TEMPERATURE', 0.0),
+            ttft_seconds=getattr(config, 'FAKE_LLM_TTFT_SECONDS', 0.5),
+            tokens_per_second=getattr(config, 'FAKE_LLM_TOKENS_PER_SECOND', 50.0),
+            jitter=getattr(config, 'FAKE_LLM_JITTER', 'lognormal'),
+            jitter_scale=getattr(config, 'FAKE_LLM_JITTER_SCALE', 0.25),
+            output_tokens=getattr(config, 'FAKE_LLM_OUTPUT_TOKENS', 600),
+            straggler_probability=getattr(config, 'FAKE_LLM_STRAGGLER_PROBABILITY', 0.0),
+            straggler_delay_seconds=getattr(config, 'FAKE_LLM_STRAGGLER_DELAY_SECONDS', 30.0),
+            seed=getattr(config, 'FAKE_LLM_SEED', 42),
+            responses=getattr(config, 'FAKE_LLM_RESPONSES', {})
+        )
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name, "temperature": self.temperature}
+
+    # =========================================================================
+    # RESPONSE AND LATENCY MODEL
+    # =========================================================================
+
+    def _jitter_factor(self, rng: random.Random) -> float:
+        """Multiplicative latency jitter for one call"""
+        scale = self.jitter_scale
+        if self.jitter == "uniform":
+            return max(0.0, rng.uniform(1 - scale, 1 + scale))
+        if self.jitter == "normal":
+            return max(0.05, rng.gauss(1.0, scale))
+        if self.jitter == "lognormal":
+            # mu chosen so the distribution has mean 1
+            return rng.lognormvariate(-(scale ** 2) / 2, scale)
+        return 1.0
+
+    def _plan(self, messages: List[BaseMessage]) -> Dict[str, Any]:
+        """Decide the response text and delays for one call"""
+        call_number = next(_CALL_COUNTER)
+        rng = random.Random(f"{self.seed}:{call_number}")
+        prompt = "\n".join(str(message.content) for message in messages)
+        factor = self._jitter_factor(rng)
+        stall = self.straggler_delay_seconds if rng.random() < self.straggler_probability else 0.0
+
+        text = self._render_response(prompt, call_number)
+        tokens = re.findall(r'\S+\s*', text)
+        per_token = factor / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+        return {
+            'tokens': tokens,
+            'ttft': self.ttft_seconds * factor + stall,
+            'per_token': per_token,
+            'prompt_tokens': len(prompt.split())
+        }
+
+    def _render_response(self, prompt: str, call_number: int) -> str:
+        for keyword, canned in self.responses.items():
+            if keyword in prompt:
+                return canned
+
+        heading = next((line.strip() for line in prompt.splitlines() if line.strip().startswith('#')),
+                       "# ANALYSIS")
+        text = self.default_template.format(
+            heading=heading,
+            model_name=self.model_name,
+            call_number=call_number,
+            prompt_tokens=len(prompt.split())
+        )
+
+        # Pad with filler so output length (and therefore generation time) is realistic
+        missing = self.output_tokens - len(text.split())
+        if missing > 0:
+            filler_words = FILLER_SENTENCE.split()
+            text += "\n" + " ".join(filler_words[i % len(filler_words)] for i in range(missing))
+        return text
+
+    def _message(self, plan: Dict[str, Any]) -> AIMessage:
+        content = "".join(plan['tokens'])
+        return AIMessage(
+            content=content,
+            response_metadata={'model_name': self.model_name, 'finish_reason': 'stop'},
+            usage_metadata={
+                'input_tokens': plan['prompt_tokens'],
+                'output_tokens': len(plan['tokens']),
+                'total_tokens': plan['prompt_tokens'] + len(plan['tokens'])
+            }
+        )
+
+    # =========================================================================
+    # LANGCHAIN CHAT MODEL INTERFACE
+    # =========================================================================
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        plan = self._plan(messages)
+        time.sleep(plan['ttft'] + plan['per_token'] * len(plan['tokens']))
+        return ChatResult(generations=[ChatGeneration(message=self._message(plan))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs: Any) -> ChatResult:
+        plan = self._plan(messages)
+        await asyncio.sleep(plan['ttft'] + plan['per_token'] * len(plan['tokens']))
+        return ChatResult(generations=[ChatGeneration(message=self._message(plan))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        plan = self._plan(messages)
+        time.sleep(plan['ttft'])
+        for index, token in enumerate(plan['tokens']):
+            if index:
+                time.sleep(plan['per_token'])
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        plan = self._plan(messages)
+        await asyncio.sleep(plan['ttft'])
+        for index, token in enumerate(plan['tokens']):
+            if index:
+                await asyncio.sleep(plan['per_token'])
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
@@ -0,0 +1,225 @@
+from contextlib import contextmanager
+from typing import Callable, Optional, Tuple
+import contextvars
+import sys
+import os
+import time
+
+# Add the services directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from services.metrics import LLM_CALL_SECONDS, LLM_CALLS, LLM_FIRST_TOKEN_SECONDS, LLM_PROMPT_BYTES, LLM_PROMPT_TOKENS
+from services.prompt_encoding import count_tokens
+from services.tracing import span
+from services import llm_cache
+from services.llm_hedging import LLMTimeout, run_hedged
+from services.llm_scheduler import LLMQueueFull, get_scheduler
+
+
+class StreamCancelled(BaseException):
+    """Raised by a token sink when its consumer has gone away; like asyncio.CancelledError it
+    derives from BaseException so the agents' broad exception handlers don't swallow it"""
+
+
+# When set, LLM calls stream their output and pass each text chunk to this callable
+_token_sink: contextvars.ContextVar = contextvars.ContextVar('llm_token_sink', default=None)
+
+
+@contextmanager
+def stream_tokens_to(sink: Callable[[str], None]):
+    """Stream every LLM call made inside this block, passing text chunks to sink as they arrive"""
+    token = _token_sink.set(sink)
+    try:
+        yield
+    finally:
+        _token_sink.reset(token)
+
+
+def token_sink() -> Optional[Callable[[str], None]]:
+    """The token sink installed by stream_tokens_to in this context, if any"""
+    return _token_sink.get()
+
+
+def _current_sink() -> Optional[Callable[[str], None]]:
+    """
+    The installed token sink, bound to the caller's context: streaming runs on the scheduler's
+    event loop, and the sink may need caller context (e.g. which orchestration phase is running)
+    """
+    sink = _token_sink.get()
+    if sink is None:
+        return None
+    context = contextvars.copy_context()
+    return lambda text: context.run(sink, text)
+
+
+# When set, a list that collects (agent, call_type) of every LLM call or agent step that failed
+_failure_log: contextvars.ContextVar = contextvars.ContextVar('llm_failure_log', default=None)
+
+
+@contextmanager
+def recording_failures():
+    """
+    Collect the failures inside this block (and the threads and tasks it hands its context to)
+    in the yielded list, so a caller can tell a complete result from one with failure placeholders
+    """
+    failures = []
+    token = _failure_log.set(failures)
+    try:
+        yield failures
+    finally:
+        _failure_log.reset(token)
+
+
+def record_failure(agent: str, call_type: str):
+    """Note a failed LLM call or agent step in the enclosing recording_failures block, if any"""
+    failures = _failure_log.get()
+    if failures is not None:
+        failures.append((agent, call_type))
+
+
+def _is_chat_model(llm) -> bool:
+    return hasattr(llm, 'predict_messages') or 'Chat' in str(type(llm))
+
+
+def _messages(prompt: str):
+    # langchain_core.messages is imported on the first call rather than at server start
+    from langchain_core.messages import HumanMessage
+    return [HumanMessage(content=prompt)]
+
+
+async def _ainvoke(llm, prompt: str) -> str:
+    if _is_chat_model(llm):
+        response = await llm.ainvoke(_messages(prompt))
+        return response.content if hasattr(response, 'content') else str(response)
+    # Fallback for other LLM types
+    return await llm.ainvoke(prompt)
+
+
+async def _astream(llm, prompt: str, sink: Callable[[str], None], agent: str, call_type: str) -> str:
+    start = time.perf_counter()
+    chunks = []
+    stream = llm.astream(_messages(prompt)) if _is_chat_model(llm) else llm.astream(prompt)
+    async for chunk in stream:
+        text = chunk.content if hasattr(chunk, 'content') else str(chunk)
+        if not text:
+            continue
+        if not chunks:
+            LLM_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - start, agent=agent, call_type=call_type)
+        chunks.append(text)
+        sink(text)
+    return "".join(chunks)
+
+
+def _generation(llm, prompt: str, sink: Optional[Callable[[str], None]], agent: str, call_type: str,
+                timeout: Optional[float] = None):
+    """
+    Coroutine factory for one LLM call, streamed when a token sink is installed. The call is hedged
+    and bounded by an adaptive timeout (never above timeout, when given); when streaming, only the
+    attempt that produces the first token reaches the sink.
+    """
+    if sink:
+        def attempt(claim):
+            def forward(text):
+                if claim():
+                    sink(text)
+            return _astream(llm, prompt, forward, agent, call_type)
+        return lambda: run_hedged(call_type, attempt, streaming=True, max_timeout=timeout, slots=get_scheduler())
+    return lambda: run_hedged(call_type, lambda claim: _ainvoke(llm, prompt), max_timeout=timeout,
+                              slots=get_scheduler())
+
+
+def _cached_response(llm, prompt: str, agent: str, call_type: str, prompt_tokens: int) -> Optional[str]:
+    LLM_PROMPT_BYTES.observe(len(prompt.encode('utf-8')), agent=agent, call_type=call_type)
+    LLM_PROMPT_TOKENS.observe(prompt_tokens, agent=agent, call_type=call_type)
+    with span('llm.cache_lookup', call_type=call_type) as cache_span:
+        cached = llm_cache.lookup(llm, prompt, call_type)
+        if cache_span:
+            cache_span.set_attribute('hit', cached is not None)
+    if cached is not None:
+        LLM_CALLS.inc(agent=agent, call_type=call_type, outcome='cache_hit')
+        sink = _token_sink.get()
+        if sink:
+            sink(cached)
+    return cached
+
+
+def _succeeded(llm, prompt: str, agent: str, call_type: str, result: str, llm_span) -> str:
+    LLM_CALLS.inc(agent=agent, call_type=call_type, outcome='success')
+    llm_cache.store(llm, prompt, call_type, result)
+    if llm_span:
+        llm_span.set_attribute('response_chars', len(result))
+    return result
+
+
+def _failure_outcome(error: Exception) -> str:
+    if isinstance(error, LLMQueueFull):
+        return 'rejected'
+    if isinstance(error, LLMTimeout):
+        return 'timeout'
+    return 'error'
+
+
+def _failed(agent: str, call_type: str, error: Exception, llm_span) -> str:
+    LLM_CALLS.inc(agent=agent, call_type=call_type, outcome=_failure_outcome(error))
+    record_failure(agent, call_type)
+    if llm_span:
+        llm_span.status = 'error'
+        llm_span.error = str(error)
+    return f"LLM call failed: {str(error)}"
+
+
+def call_llm_with_outcome(llm, prompt: str, agent: str, call_type: str,
+                          timeout: Optional[float] = None) -> Tuple[str, str]:
+    """
+    call_llm, also returning the call's outcome (cache_hit, success, error, timeout or rejected)
+    for callers that account usage themselves
+    """
+    prompt_tokens = count_tokens(prompt)
+    cached = _cached_response(llm, prompt, agent, call_type, prompt_tokens)
+    if cached is not None:
+        return cached, 'cache_hit'
+
+    with LLM_CALL_SECONDS.time(agent=agent, call_type=call_type), \
+            span(f'llm.{call_type}', agent=agent, prompt_chars=len(prompt), prompt_tokens=prompt_tokens) as llm_span:
+        try:
+            generation = _generation(llm, prompt, _current_sink(), agent, call_type, timeout)
+            result = get_scheduler().run(generation, label=call_type)
+            return _succeeded(llm, prompt, agent, call_type, result, llm_span), 'success'
+        except Exception as e:
+            return _failed(agent, call_type, e, llm_span), _failure_outcome(e)
+
+
+def call_llm(llm, prompt: str, agent: str, call_type: str, timeout: Optional[float] = None) -> str:
+    """
+    Call the LLM with the proper message format and record latency metrics.
+    Shared by every agent's _call_llm so all LLM traffic is measured, cached and scheduled the same way:
+    the call runs on the shared LLM scheduler and this thread waits for its result.
+    """
+    return call_llm_with_outcome(llm, prompt, agent, call_type, timeout)[0]
+
+
+async def acall_llm_with_outcome(llm, prompt: str, agent: str, call_type: str, timeout: Optional[float] = None,
+                                 priority: Optional[int] = None) -> Tuple[str, str]:
+    """
+    Async counterpart of call_llm_with_outcome for code running on an event loop: the caller awaits
+    the scheduler's result instead of blocking a thread on it
+    """
+    prompt_tokens = count_tokens(prompt)
+    cached = _cached_response(llm, prompt, agent, call_type, prompt_tokens)
+    if cached is not None:
+        return cached, 'cache_hit'
+
+    with LLM_CALL_SECONDS.time(agent=agent, call_type=call_type), \
+            span(f'llm.{call_type}', agent=agent, prompt_chars=len(prompt), prompt_tokens=prompt_tokens) as llm_span:
+        try:
+            generation = _generation(llm, prompt, _current_sink(), agent, call_type, timeout)
+            result = await get_scheduler().submit_async(generation, priority, label=call_type)
+            return _succeeded(llm, prompt, agent, call_type, result, llm_span), 'success'
+        except Exception as e:
+            return _failed(agent, call_type, e, llm_span), _failure_outcome(e)
+
+
+async def acall_llm(llm, prompt: str, agent: str, call_type: str, timeout: Optional[float] = None,
+                    priority: Optional[int] = None) -> str:
+    """Async counterpart of call_llm for code running on an event loop"""
+    return (await acall_llm_with_outcome(llm, prompt, agent, call_type, timeout, priority))[0]
@@ -0,0 +1,206 @@
+"""
+Model-tier routing for agent LLM calls.
+
+Every call site declares the class of task it performs and the router sends it
+to that tier's model with that tier's max_tokens and timeout:
+
+- extract: short structured answers (symbols, labels, single figures)
+- summarize: short narratives and comparisons of a few sections
+- agent_report: the research, analysis and recommendation agents' reports,
+  which the final report is built from; they keep the full report's limits
+- deep_report: the full multi-section final report
+- report_section: one section of the final report when sections are generated
+  separately; it uses the deep_report model with a per-section token budget
+  and timeout
+
+Tiers default to the configured OPENAI_MODEL with decreasing token budgets and
+timeouts (a tier's timeout also caps its calls' adaptive timeout, which never
+exceeds TIMEOUT_SECONDS); LLM_TIERS in config.py overrides any of model,
+max_tokens, timeout and temperature per tier. Calls, outcomes, prompt/completion tokens and latency
+are accounted per tier (stats(), /api/metrics).
+"""
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Tuple
+
+
+# Add the services directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from services.metrics import LLM_TIER_CALLS, LLM_TIER_SECONDS, LLM_TIER_TOKENS
+from services.prompt_encoding import count_tokens
+from .llm_client import acall_llm_with_outcome, call_llm_with_outcome
+
+TASKS = ('extract', 'summarize', 'agent_report', 'deep_report', 'report_section')
+
+DEFAULT_TIERS = {
+    'extract': {'max_tokens': 1000, 'timeout': 15},
+    'summarize': {'max_tokens': 3000, 'timeout': 30},
+    'agent_report': {'max_tokens': 8000, 'timeout': 120},
+    'deep_report': {'max_tokens': 8000, 'timeout': 120},
+    'report_section': {'max_tokens': 2000, 'timeout': 60}
+}
+
+# Recent latencies kept per tier for the percentiles in stats()
+LATENCY_WINDOW = 500
+
+
+def _percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class _TierUsage:
+    """Calls, outcomes, tokens and recent latencies of one tier"""
+
+    def __init__(self):
+        self.outcomes: Dict[str, int] = {}
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def to_dict(self) -> Dict[str, Any]:
+        latencies = list(self.latencies)
+        return {
+            'calls': sum(self.outcomes.values()),
+            'outcomes': dict(self.outcomes),
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'latency': {
+                'mean': sum(latencies) / len(latencies),
+                'p50': _percentile(latencies, 0.5),
+                'p95': _percentile(latencies, 0.95)
+            } if latencies else None
+        }
+
+
+class ModelRouter:
+    """Maps task classes to per-tier chat models and accounts usage per tier"""
+
+    def __init__(self, tiers: Dict[str, Dict[str, Any]], create_model: Callable[[str, Dict[str, Any]], Any]):
+        self.tiers = tiers
+        self._create_model = create_model
+        self._models: Dict[str, Any] = {}
+        self._usage = {task: _TierUsage() for task in tiers}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config) -> "ModelRouter":
+        """Build the tiers from LLM_TIERS (over the defaults) for the backend selected by LLM_BACKEND"""
+        overrides = getattr(config, 'LLM_TIERS', {}) or {}
+        unknown = [task for task in overrides if task not in TASKS]
+        if unknown:
+            raise ValueError(f"Unknown LLM_TIERS entries: {', '.join(unknown)} (expected {', '.join(TASKS)})")
+
+        tiers = {}
+        for task in TASKS:
+            tier = dict(DEFAULT_TIERS[task], model=config.OPENAI_MODEL,
+                        temperature=getattr(config, 'AGENT_TEMPERATURE', 0.7))
+            if task in ('agent_report', 'deep_report'):
+                # The agents' reports and the full report keep the pre-routing settings
+                tier.update(max_tokens=getattr(config, 'MAX_TOKENS', 8000),
+                            timeout=getattr(config, 'TIMEOUT_SECONDS', 120))
+            elif task == 'report_section':
+                # Sections are parts of the deep report: same model, a section's limits
+                deep_report = tiers['deep_report']
+                tier.update(model=deep_report['model'], temperature=deep_report['temperature'],
+                            timeout=min(tier['timeout'], deep_report['timeout']))
+            tier.update(overrides.get(task, {}))
+            tiers[task] = tier
+
+        if getattr(config, 'LLM_BACKEND', 'openai') == 'fake':
+            base_name = getattr(config, 'FAKE_LLM_MODEL_NAME', 'fake-chat')
+            for task, tier in tiers.items():
+                tier['model'] = f"{base_name}-{task}"
+
+            def create_model(task, tier):
+                from .fake_chat_model import FakeChatModel
+                base = FakeChatModel.from_config(config)
+                return base.model_copy(update={
+                    'model_name': tier['model'],
+                    'temperature': tier['temperature'],
+                    'output_tokens': min(base.output_tokens, tier['max_tokens'])
+                })
+        else:
+            def create_model(task, tier):
+                from langchain_openai import ChatOpenAI
+                return ChatOpenAI(
+                    model_name=tier['model'],
+                    temperature=tier['temperature'],
+                    api_key=config.OPENAI_API_KEY,
+                    max_tokens=tier['max_tokens'],
+                    request_timeout=tier['timeout']
+                )
+        return cls(tiers, create_model)
+
+    @classmethod
+    def single(cls, llm) -> "ModelRouter":
+        """Router that sends every task to one existing model (no per-tier limits)"""
+        return cls({task: {'model': getattr(llm, 'model_name', type(llm).__name__)} for task in TASKS},
+                   lambda task, tier: llm)
+
+    def llm_for(self, task: str):
+        """The chat model for a task class, created on first use"""
+        if task not in self.tiers:
+            raise ValueError(f"Unknown LLM task class '{task}' (expected {', '.join(TASKS)})")
+        model = self._models.get(task)
+        if model is None:
+            with self._lock:
+                model = self._models.get(task)
+                if model is None:
+                    model = self._models[task] = self._create_model(task, self.tiers[task])
+        return model
+
+    def call(self, prompt: str, agent: str, call_type: str, task: str) -> str:
+        """Run one LLM call on the task's tier (see llm_client.call_llm) and account its usage"""
+        return self.call_with_outcome(prompt, agent, call_type, task)[0]
+
+    def call_with_outcome(self, prompt: str, agent: str, call_type: str, task: str) -> Tuple[str, str]:
+        """call, also returning the outcome (cache_hit, success, error, timeout or rejected)"""
+        tier = self.tiers[task]
+        start = time.perf_counter()
+        result, outcome = call_llm_with_outcome(self.llm_for(task), prompt, agent, call_type,
+                                                timeout=tier.get('timeout'))
+        self._account(task, prompt, result, outcome, time.perf_counter() - start)
+        return result, outcome
+
+    async def acall(self, prompt: str, agent: str, call_type: str, task: str) -> str:
+        """Async call: awaited on the caller's event loop instead of blocking a thread"""
+        return (await self.acall_with_outcome(prompt, agent, call_type, task))[0]
+
+    async def acall_with_outcome(self, prompt: str, agent: str, call_type: str, task: str) -> Tuple[str, str]:
+        """Async call_with_outcome"""
+        tier = self.tiers[task]
+        start = time.perf_counter()
+        result, outcome = await acall_llm_with_outcome(self.llm_for(task), prompt, agent, call_type,
+                                                       timeout=tier.get('timeout'))
+        self._account(task, prompt, result, outcome, time.perf_counter() - start)
+        return result, outcome
+
+    def _account(self, task: str, prompt: str, result: str, outcome: str, elapsed: float):
+        tier = self.tiers[task]
+        prompt_tokens = count_tokens(prompt)
+        completion_tokens = count_tokens(result) if outcome in ('success', 'cache_hit') else 0
+        LLM_TIER_CALLS.inc(tier=task, model=tier['model'], outcome=outcome)
+        LLM_TIER_SECONDS.observe(elapsed, tier=task)
+        LLM_TIER_TOKENS.inc(prompt_tokens, tier=task, kind='prompt')
+        LLM_TIER_TOKENS.inc(completion_tokens, tier=task, kind='completion')
+        with self._lock:
+            usage = self._usage[task]
+            usage.outcomes[outcome] = usage.outcomes.get(outcome, 0) + 1
+            usage.prompt_tokens += prompt_tokens
+            usage.completion_tokens += completion_tokens
+            usage.latencies.append(elapsed)
+
+    def stats(self) -> Dict[str, Any]:
+        """Per tier: configured model, max_tokens and timeout plus calls, tokens and latency"""
+        with self._lock:
+            return {task: dict(self.tiers[task], **self._usage[task].to_dict()) for task in self.tiers}
+
+
+def as_router(llm) -> ModelRouter:
+    """Accept either a ModelRouter or a plain chat model (e.g. the fake model in benchmarks)"""
+    return llm if isinstance(llm, ModelRouter) else ModelRouter.single(llm)
@@ -1,32 +1,50 @@
-from langchain.llms.base import BaseLLM
-from langchain.schema import HumanMessage
+from .llm_client import record_failure
+from .model_router import as_router
 from typing import Any, Dict
 import json
 
 class RecommendationAgent:
-    def __init__(self, llm: BaseLLM):
+    def __init__(self, llm: Any):
         self.llm = llm
+        self.router = as_router(llm)
         self.name = "Recommendation Agent"
     
-    def _call_llm(self, prompt: str) -> str:
-        """Helper method to call the LLM with proper format"""
-        try:
-            # Check if it's ChatOpenAI (has message-based interface)
-            if hasattr(self.llm, 'predict_messages') or 'Chat' in str(type(self.llm)):
-                response = self.llm.invoke([HumanMessage(content=prompt)])
-                return response.content if hasattr(response, 'content') else str(response)
-            else:
-                # Fallback for other LLM types
-                return self.llm.invoke(prompt)
-        except Exception as e:
-            return f"LLM call failed: {str(e)}"
+    def _call_llm(self, prompt: str, call_type: str = "recommendation", task: str = "agent_report") -> str:
+        """Helper method to call the LLM for a task class (see agents/model_router.py)"""
+        return self.router.call(prompt, self.name, call_type, task)
+    
+    async def _acall_llm(self, prompt: str, call_type: str = "recommendation", task: str = "agent_report") -> str:
+        """Async _call_llm, awaited on the caller's event loop"""
+        return await self.router.acall(prompt, self.name, call_type, task)
     
     def generate_recommendation(self, analysis_data: str) -> str:
         """
         Generate comprehensive investment recommendations with realistic analysis and specific targets
         """
         try:
-            prompt = f"""
+            result = self._call_llm(self._recommendation_prompt(analysis_data), call_type="recommendation", task="agent_report")
+            
+            return f"INVESTMENT RECOMMENDATIONS & STRATEGY:\n\n{result}"
+            
+        except Exception as e:
+            record_failure(self.name, "recommendation")
+            return f"Recommendation Agent error: {str(e)}"
+    
+    async def agenerate_recommendation(self, analysis_data: str) -> str:
+        """generate_recommendation with the LLM call awaited on the caller's event loop"""
+        try:
+            result = await self._acall_llm(self._recommendation_prompt(analysis_data),
+                                           call_type="recommendation", task="agent_report")
+            
+            return f"INVESTMENT RECOMMENDATIONS & STRATEGY:\n\n{result}"
+            
+        except Exception as e:
+            record_failure(self.name, "recommendation")
+            return f"Recommendation Agent error: {str(e)}"
+    
+    def _recommendation_prompt(self, analysis_data: str) -> str:
+        """The recommendation prompt for the research and analysis text"""
+        prompt = f"""
             You are a senior portfolio manager and investment advisor at a top-tier asset management firm. Generate comprehensive investment recommendations based on: {analysis_data}
             
             CRITICAL REQUIREMENTS:
@@ -238,13 +256,7 @@ class RecommendationAgent:
 
             **ANALYST CERTIFICATION:** This recommendation reflects the analyst's genuine professional opinion based on comprehensive financial analysis and industry best practices.
             """
-            
-            result = self._call_llm(prompt)
-            
-            return f"INVESTMENT RECOMMENDATIONS & STRATEGY:\n\n{result}"
-            
-        except Exception as e:
-            return f"Recommendation Agent error: {str(e)}"
+        return prompt
     
     def assess_risk_level(self, company_data: Dict[str, Any]) -> str:
         """
@@ -0,0 +1,338 @@
+"""
+Sectional report generation.
+
+Instead of one long generation for the whole enhanced report, every section is
+written by its own LLM call from a section-specific prompt that carries only
+the agent outputs that section needs. The sections are generated concurrently
+and stitched in report order, so the wall time is roughly that of the slowest
+section. A section whose call fails is retried on its own; if it still fails
+the report keeps a short placeholder in its place.
+
+Each section also declares the market data snapshot fields it consumes. When
+the snapshot is known, a section whose input fingerprint matches the one stored
+for the symbol by a previous run is reused instead of regenerated (see
+services/section_store.py). The fingerprint covers the section's data slice
+and the text of the agent outputs its prompt carries, plus the query, the
+report model and the section's own outline: a section is only reused next to
+the very agent outputs it was written from, and after a market move only the
+sections whose data slice or agent inputs changed are written again.
+
+When the caller streams tokens, sections still arrive in report order. Each
+section's tokens are buffered until it is settled (generated, reused or
+replaced by its placeholder) and every section before it has been sent, so
+the partial output of an attempt that is retried never reaches the stream.
+
+agenerate_sections() is the same for callers on an event loop: the sections
+are asyncio tasks awaiting the LLM scheduler rather than worker threads.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Add the services directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from services import section_store
+from services.metrics import REPORT_SECTION_ATTEMPTS, REPORT_SECTION_SECONDS
+from services.tracing import propagate, span
+from .llm_client import stream_tokens_to, token_sink
+
+# Outcomes worth a second attempt (a rejected call means the LLM queue is full)
+RETRYABLE_OUTCOMES = ('error', 'timeout')
+
+# Labels of the agent outputs a section can draw on
+INPUT_LABELS = {
+    'research': 'ENHANCED RESEARCH WITH REAL DATA',
+    'analysis': 'QUANTITATIVE ANALYSIS WITH REAL DATA',
+    'recommendations': 'INVESTMENT RECOMMENDATIONS'
+}
+
+
+class ReportSection:
+    """
+    One independently generated report section: the agent outputs in its prompt (inputs) and
+    the snapshot fields, as dotted paths, its content depends on (fields)
+    """
+
+    __slots__ = ('name', 'title', 'inputs', 'fields', 'instructions')
+
+    def __init__(self, name: str, title: str, inputs: Sequence[str], fields: Sequence[str], instructions: str):
+        self.name = name
+        self.title = title
+        self.inputs = tuple(inputs)
+        self.fields = tuple(fields)
+        self.instructions = instructions
+
+
+ENHANCED_REPORT_SECTIONS = (
+    ReportSection('executive_summary', 'EXECUTIVE SUMMARY', ('research', 'analysis', 'recommendations'),
+                  ('price_data.current_price', 'price_data.returns', 'price_data.volatility_1y', 'basic_info.market_cap',
+                   'valuation_metrics.pe_ratio', 'analyst_data.latest_recommendation'), """
+        **Investment Rating:** [Based on real investment score] | **Price Target:** $[Based on real valuation] | **Expected Return:** [Based on real calculations]
+
+        **Real-Time Financial Snapshot:**
+        - Current Price: [Use actual price from data]
+        - Market Cap: [Use actual market cap]
+        - P/E Ratio: [Use actual P/E]
+        - 1-Year Return: [Use actual performance]
+        - Volatility: [Use actual volatility]
+
+        **Investment Thesis:** [Based on real financial metrics and analysis]
+        """),
+    ReportSection('financial_tables', 'MARKET PERFORMANCE AND FINANCIALS (REAL DATA)', ('research', 'analysis'),
+                  ('price_data', 'market_data', 'financial_statements'), """
+        ### Current Market Position
+        [Markdown table of actual price data, 52-week range and volume]
+
+        ### Performance vs Benchmarks
+        [Markdown table of actual return comparisons with S&P 500, NASDAQ]
+
+        ### Financial Health
+        [Markdown table of actual balance sheet metrics, ratios, cash position]
+
+        ### Profitability Analysis
+        [Markdown table of actual margins, ROE, ROA from financial statements]
+        """),
+    ReportSection('valuation', 'VALUATION ANALYSIS', ('research', 'analysis'),
+                  ('valuation_metrics', 'financial_statements'), """
+        ### Valuation Metrics
+        [Use actual P/E, P/B, EV/EBITDA, PEG ratios from data]
+
+        ### Fair Value Assessment
+        [Whether the stock looks undervalued, fairly valued or overvalued, and why]
+        """),
+    ReportSection('risks', 'RISK ASSESSMENT (QUANTIFIED)', ('analysis', 'research'),
+                  ('risk_metrics', 'news_data'), """
+        ### Risk Metrics (Real Data)
+        [Use actual beta, volatility, max drawdown, VaR]
+
+        ### Risk Factors
+        [List actual risk factors identified from analysis]
+        """),
+    ReportSection('recommendation', 'INVESTMENT RECOMMENDATION', ('recommendations', 'analysis'),
+                  ('price_data.current_price', 'valuation_metrics', 'risk_metrics', 'analyst_data'), """
+        ### Quantitative Investment Score
+        [Use actual investment score from analysis]
+
+        ### Portfolio Allocation Guidance
+        [Use calculated portfolio weight recommendations]
+
+        ### Monitoring Strategy
+        [Specific metrics to track based on analysis]
+        """)
+)
+
+
+def section_prompt(section: ReportSection, query: str, outputs: Dict[str, str]) -> str:
+    """Prompt for one section: the shared requirements, the section's inputs and its outline"""
+    inputs = "\n".join(f"        {INPUT_LABELS[name]}: {outputs.get(name, '')}" for name in section.inputs)
+    return f"""
+        You are writing one section of a professional, institutional-grade financial analysis report using the REAL MARKET DATA provided by the enhanced agents:
+
+        ORIGINAL QUERY: {query}
+{inputs}
+
+        CRITICAL REQUIREMENTS:
+        1. Use ONLY the REAL financial numbers provided - no placeholder values
+        2. All calculations must be based on the actual data provided
+        3. Create properly formatted markdown tables with real data where the outline asks for them
+        4. Write ONLY this section, starting with its heading; other sections are written separately
+
+        Do not use emojis in your response.
+
+        ## {section.title}
+        {section.instructions}
+        """
+
+
+class _OrderedStream:
+    """Passes section tokens to a sink in section order, once each section is settled"""
+
+    def __init__(self, sink: Callable[[str], None], count: int):
+        self.sink = sink
+        self.buffers: List[List[str]] = [[] for _ in range(count)]
+        self.finished = [False] * count
+        self.current = 0
+        self.lock = threading.Lock()
+
+    def emit(self, text: str):
+        with self.lock:
+            self.sink(text)
+
+    def sink_for(self, index: int) -> Callable[[str], None]:
+        # Even the first unfinished section is buffered: an attempt that fails after streaming
+        # part of its output is retried, and text already sent could not be taken back
+        def write(text: str):
+            with self.lock:
+                self.buffers[index].append(text)
+        return write
+
+    def discard(self, index: int):
+        """Drop buffered output of a failed attempt before it is retried"""
+        with self.lock:
+            self.buffers[index] = []
+
+    def finish(self, index: int, separator: str):
+        """Mark the section settled and send every settled section not preceded by an unsettled one"""
+        with self.lock:
+            self.finished[index] = True
+            while self.current < len(self.finished) and self.finished[self.current]:
+                self.sink("".join(self.buffers[self.current]) + separator)
+                self.buffers[self.current] = []
+                self.current += 1
+
+
+class _SectionRun:
+    """State shared by the section generations of one report: reuse lookups, streaming and results"""
+
+    separator = "\n\n"
+
+    def __init__(self, sections: Sequence[ReportSection], query: str, outputs: Dict[str, str], header: str,
+                 footer: str, symbol: Optional[str], snapshot: Optional[Dict[str, Any]], model: str, reuse: bool):
+        self.sections = sections
+        self.query = query
+        self.outputs = outputs
+        self.header = header
+        self.footer = footer
+        self.symbol = symbol
+        self.snapshot = snapshot
+        self.model = model
+        sink = token_sink()
+        self.stream = _OrderedStream(sink, len(sections)) if sink else None
+        # Sections are fingerprinted and stored whenever they can be; reuse=False only skips the lookup
+        self.store = bool(symbol and snapshot and 'error' not in snapshot and section_store.enabled())
+        self.reuse = self.store and reuse
+
+    def begin(self):
+        if self.stream and self.header:
+            self.stream.emit(self.header + self.separator)
+
+    def prepare(self, index: int) -> Tuple[str, Optional[str], Optional[Dict[str, Any]]]:
+        """(prompt, fingerprint, result): result is set when a stored section is reused instead of generated"""
+        section = self.sections[index]
+        fingerprint = None
+        if self.store:
+            # The agent outputs are hashed as they appear in the prompt, so a section is never
+            # reused next to agent outputs other than the ones it was written from
+            fingerprint = section_store.fingerprint(self.snapshot, section.fields,
+                                                    section_store.normalize_query(self.query), self.model,
+                                                    section.title, section.instructions,
+                                                    *(f"{name}:{self.outputs.get(name, '')}" for name in section.inputs))
+        if self.reuse:
+            text = section_store.lookup(self.symbol, section.name, fingerprint)
+            if text is not None:
+                if self.stream:
+                    self.stream.sink_for(index)(text)
+                    self.stream.finish(index, self.separator)
+                return "", fingerprint, {'name': section.name, 'fingerprint': fingerprint, 'reused': True,
+                                         'failed': False, 'seconds': 0.0, 'text': text}
+        return section_prompt(section, self.query, self.outputs), fingerprint, None
+
+    def attempt(self, index: int):
+        """Context for one generation attempt: streams the section's tokens in report order"""
+        if not self.stream:
+            return nullcontext()
+        self.stream.discard(index)
+        return stream_tokens_to(self.stream.sink_for(index))
+
+    def complete(self, index: int, text: str, outcome: str, fingerprint: Optional[str], start: float) -> Dict[str, Any]:
+        """Store or replace (with a placeholder) the section's final attempt and record its timing"""
+        section = self.sections[index]
+        failed = outcome not in ('success', 'cache_hit')
+        if failed:
+            text = f"## {section.title}\n\n_This section could not be generated ({text})._"
+            if self.stream:
+                self.stream.discard(index)
+                self.stream.sink_for(index)(text)
+        elif fingerprint:
+            section_store.store(self.symbol, section.name, fingerprint, text.strip())
+        seconds = time.perf_counter() - start
+        REPORT_SECTION_SECONDS.observe(seconds, section=section.name)
+        if self.stream:
+            self.stream.finish(index, self.separator)
+        return {'name': section.name, 'fingerprint': fingerprint, 'reused': False, 'failed': failed,
+                'seconds': seconds, 'text': text.strip()}
+
+    def end(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        if self.stream and self.footer:
+            self.stream.emit(self.footer)
+        parts = ([self.header] if self.header else []) + [result.pop('text') for result in results] \
+            + ([self.footer] if self.footer else [])
+        return {
+            'report': self.separator.join(parts),
+            'sections': results,
+            'reused_fraction': sum(result['reused'] for result in results) / len(results) if results else 0.0
+        }
+
+
+def generate_sections(call: Callable[[str, str], Tuple[str, str]], sections: Sequence[ReportSection],
+                      query: str, outputs: Dict[str, str], retries: int = 1, header: str = "", footer: str = "",
+                      symbol: Optional[str] = None, snapshot: Optional[Dict[str, Any]] = None,
+                      model: str = "", reuse: bool = True) -> Dict[str, Any]:
+    """
+    Generate sections concurrently and stitch them between header and footer.
+    call(prompt, call_type) runs one LLM call and returns (text, outcome) (see ModelRouter.call_with_outcome).
+    With symbol and snapshot, sections whose inputs are unchanged since a previous run (same query,
+    model, consumed fields and agent output text) are reused; with reuse=False (the caller asked for
+    fresh LLM output) every section is generated and replaces the stored one. Returns {'report', 'sections', 'reused_fraction'} where
+    sections lists each section's name, fingerprint, whether it was reused, whether it failed and its generation time.
+    """
+    run = _SectionRun(sections, query, outputs, header, footer, symbol, snapshot, model, reuse)
+
+    def generate(index: int) -> Dict[str, Any]:
+        section = sections[index]
+        start = time.perf_counter()
+        prompt, fingerprint, reused = run.prepare(index)
+        if reused:
+            return reused
+        with span('report.section', section=section.name):
+            for _ in range(retries + 1):
+                with run.attempt(index):
+                    text, outcome = call(prompt, f"report_{section.name}")
+                REPORT_SECTION_ATTEMPTS.inc(section=section.name, outcome=outcome)
+                if outcome not in RETRYABLE_OUTCOMES:
+                    break
+            return run.complete(index, text, outcome, fingerprint, start)
+
+    run.begin()
+    with ThreadPoolExecutor(max_workers=max(1, len(sections)), thread_name_prefix='report-section') as pool:
+        futures = [pool.submit(propagate(generate), index) for index in range(len(sections))]
+        results = [future.result() for future in futures]
+    return run.end(results)
+
+
+async def agenerate_sections(acall: Callable[[str, str], Awaitable[Tuple[str, str]]],
+                             sections: Sequence[ReportSection], query: str, outputs: Dict[str, str],
+                             retries: int = 1, header: str = "", footer: str = "", symbol: Optional[str] = None,
+                             snapshot: Optional[Dict[str, Any]] = None, model: str = "",
+                             reuse: bool = True) -> Dict[str, Any]:
+    """
+    generate_sections on the caller's event loop: each section is a task awaiting
+    acall(prompt, call_type) (see ModelRouter.acall_with_outcome) instead of a worker thread
+    """
+    run = _SectionRun(sections, query, outputs, header, footer, symbol, snapshot, model, reuse)
+
+    async def generate(index: int) -> Dict[str, Any]:
+        section = sections[index]
+        start = time.perf_counter()
+        prompt, fingerprint, reused = run.prepare(index)
+        if reused:
+            return reused
+        with span('report.section', section=section.name):
+            for _ in range(retries + 1):
+                # Each task runs in its own copy of the context, so its token sink is its own
+                with run.attempt(index):
+                    text, outcome = await acall(prompt, f"report_{section.name}")
+                REPORT_SECTION_ATTEMPTS.inc(section=section.name, outcome=outcome)
+                if outcome not in RETRYABLE_OUTCOMES:
+                    break
+            return run.complete(index, text, outcome, fingerprint, start)
+
+    run.begin()
+    results = await asyncio.gather(*(generate(index) for index in range(len(sections))))
+    return run.end(list(results))
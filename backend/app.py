@@ -1,7 +1,17 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response, stream_with_context
+from contextlib import nullcontext
 from flask_cors import CORS
-from agents.financial_orchestrator import FinancialOrchestrator
+from agents.financial_orchestrator import ANALYSIS_PHASES, FinancialOrchestrator
+from agents.llm_client import StreamCancelled, stream_tokens_to
+from services.metrics import HTTP_REQUEST_SECONDS, render_prometheus, start_publishing as start_metrics_publishing
+from services import batch, cache_warmer, job_manager, llm_cache, llm_hedging, llm_scheduler, memory_accounting, phase_graph, prefetch, profiling, prompt_encoding, response_encoding, run_store, section_store, shared_cache, tracing
+import config
+import hmac
+import json
 import logging
+import queue
+import threading
+import time
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -10,28 +20,384 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 
+tracing.configure(
+    enabled=getattr(config, 'TRACING_ENABLED', True),
+    max_traces=getattr(config, 'TRACE_MAX_STORED', 200),
+    otlp_endpoint=getattr(config, 'TRACE_OTLP_ENDPOINT', ''),
+    service_name=getattr(config, 'TRACE_SERVICE_NAME', 'financial-analysis-backend')
+)
+profiling.configure(
+    interval_ms=getattr(config, 'PROFILE_SAMPLE_INTERVAL_MS', 5),
+    max_seconds=getattr(config, 'PROFILE_MAX_SECONDS', 120),
+    max_stored=getattr(config, 'PROFILE_MAX_STORED', 20),
+    top_n=getattr(config, 'PROFILE_TOP_N', 25)
+)
+# Before the orchestrator: its data service creates the market data cache on this backend
+shared_cache.configure(
+    backend=getattr(config, 'CACHE_BACKEND', 'memory'),
+    path=getattr(config, 'CACHE_PATH', None),
+    lease_seconds=getattr(config, 'CACHE_FETCH_LEASE_SECONDS', 60)
+)
+
 # Initialize the financial orchestrator
 orchestrator = FinancialOrchestrator()
 
+memory_accounting.track_cache('market_data', orchestrator.data_service.cache,
+                                orchestrator.data_service.parse_cache_key)
+memory_accounting.track_conversation('orchestrator', lambda: orchestrator.memory if orchestrator.has_memory() else None)
+llm_cache.configure(
+    enabled=getattr(config, 'LLM_CACHE_ENABLED', True),
+    path=getattr(config, 'LLM_CACHE_PATH', None),
+    ttl_seconds=getattr(config, 'LLM_CACHE_TTL_SECONDS', 3600),
+    max_entries=getattr(config, 'LLM_CACHE_MAX_ENTRIES', 5000),
+    max_bytes=getattr(config, 'LLM_CACHE_MAX_BYTES', 200 * 1024 * 1024)
+)
+llm_scheduler.configure(
+    max_concurrency=getattr(config, 'LLM_MAX_CONCURRENCY', 8),
+    max_queue=getattr(config, 'LLM_MAX_QUEUE', 64)
+)
+prompt_encoding.configure(
+    snapshot_token_budget=getattr(config, 'PROMPT_SNAPSHOT_TOKEN_BUDGET', 1500)
+)
+llm_hedging.configure(
+    enabled=getattr(config, 'LLM_HEDGING_ENABLED', True),
+    percentile=getattr(config, 'LLM_HEDGE_PERCENTILE', 0.95),
+    min_samples=getattr(config, 'LLM_HEDGE_MIN_SAMPLES', 20),
+    budget_ratio=getattr(config, 'LLM_HEDGE_BUDGET_RATIO', 0.1),
+    budget_burst=getattr(config, 'LLM_HEDGE_BUDGET_BURST', 3),
+    timeout_multiplier=getattr(config, 'LLM_TIMEOUT_MULTIPLIER', 3.0),
+    min_timeout=getattr(config, 'LLM_MIN_TIMEOUT_SECONDS', 10),
+    max_timeout=getattr(config, 'TIMEOUT_SECONDS', 120)
+)
+prefetch.configure(
+    enabled=getattr(config, 'PREFETCH_ENABLED', True),
+    max_workers=getattr(config, 'PREFETCH_MAX_WORKERS', 8)
+)
+run_store.configure(
+    ttl_seconds=getattr(config, 'RUN_TTL_SECONDS', 1800),
+    max_runs=getattr(config, 'RUN_MAX_STORED', 200)
+)
+section_store.configure(
+    enabled=getattr(config, 'REPORT_SECTION_REUSE', True),
+    ttl_seconds=getattr(config, 'REPORT_SECTION_TTL_SECONDS', 86400),
+    max_entries=getattr(config, 'REPORT_SECTION_MAX_STORED', 2000)
+)
+job_manager.configure(
+    max_workers=getattr(config, 'JOB_MAX_WORKERS', 2),
+    max_queued=getattr(config, 'JOB_MAX_QUEUED', 50),
+    max_stored=getattr(config, 'JOB_MAX_STORED', 200),
+    ttl_seconds=getattr(config, 'JOB_TTL_SECONDS', 86400),
+    results_dir=getattr(config, 'JOB_RESULTS_DIR', None)
+)
+cache_warmer.configure(
+    orchestrator.data_service,
+    enabled=getattr(config, 'WARM_ENABLED', False),
+    watchlist=getattr(config, 'WARM_WATCHLIST', []),
+    times=getattr(config, 'WARM_TIMES', ['09:30', '16:00']),
+    timezone=getattr(config, 'WARM_TIMEZONE', 'America/New_York'),
+    weekdays_only=getattr(config, 'WARM_WEEKDAYS_ONLY', True),
+    lead_seconds=getattr(config, 'WARM_LEAD_SECONDS', 180),
+    max_upstream_calls=getattr(config, 'WARM_MAX_UPSTREAM_CALLS', 300),
+    concurrency=getattr(config, 'WARM_CONCURRENCY', 4),
+    quick_assessment=getattr(config, 'WARM_QUICK_ASSESSMENT', True)
+)
+response_encoding.configure(
+    enabled=getattr(config, 'RESPONSE_COMPRESSION', True),
+    min_bytes=getattr(config, 'RESPONSE_COMPRESSION_MIN_BYTES', 1024),
+    gzip_level=getattr(config, 'RESPONSE_GZIP_LEVEL', 6),
+    brotli_quality=getattr(config, 'RESPONSE_BROTLI_QUALITY', 5),
+    etags=getattr(config, 'RESPONSE_ETAGS', True)
+)
+memory_accounting.configure(
+    tracemalloc_enabled=getattr(config, 'MEMORY_TRACEMALLOC', False),
+    tracemalloc_frames=getattr(config, 'MEMORY_TRACEMALLOC_FRAMES', 1),
+    tracemalloc_top_n=getattr(config, 'MEMORY_TRACEMALLOC_TOP_N', 15),
+    log_interval_seconds=getattr(config, 'MEMORY_LOG_INTERVAL_SECONDS', 300)
+)
+
+def _is_admin() -> bool:
+    """True when the request carries the configured ADMIN_TOKEN (admin features are off without one)"""
+    admin_token = getattr(config, 'ADMIN_TOKEN', '')
+    # Header only: a token in the query string would end up in access logs, proxies and browser history
+    supplied = request.headers.get('X-Admin-Token', '')
+    return bool(admin_token) and hmac.compare_digest(supplied.encode(), admin_token.encode())
+
+def _admin_forbidden():
+    return jsonify({'success': False, 'error': 'Admin token required'}), 403
+
+def _llm_cache_bypass_requested() -> bool:
+    """Cache-Control: no-cache, ?no_cache=1 or {"no_cache": true} forces fresh LLM responses"""
+    if 'no-cache' in request.headers.get('Cache-Control', ''):
+        return True
+    if request.args.get('no_cache', '').lower() in ('1', 'true', 'yes'):
+        return True
+    body = request.get_json(silent=True)
+    return isinstance(body, dict) and bool(body.get('no_cache'))
+
+def _profiling_requested() -> bool:
+    flag = request.headers.get('X-Profile') or request.args.get('profile', '')
+    return flag.lower() in ('1', 'true', 'yes') and _is_admin()
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    # Trace ids are generated here, so a client cannot pick (or collide with) another request's id;
+    # its X-Request-ID (if any) is recorded on the root span for correlation
+    attributes = {'http.method': request.method, 'http.path': request.path}
+    if request.headers.get('X-Request-ID'):
+        attributes['request_id'] = request.headers['X-Request-ID'][:128]
+    g.trace = tracing.begin_trace(f"{request.method} {request.path}", **attributes)
+    if _llm_cache_bypass_requested():
+        g.llm_cache_bypass = llm_cache.begin_bypass()
+    if _profiling_requested():
+        g.profiler = profiling.start_profile(f"{request.method} {request.path}")
+
+# Endpoints that make LLM calls; they are shed with 503 while the LLM queue is full
+_LLM_ENDPOINTS = {
+    'research_agent', 'analysis_agent', 'recommendation_agent',
+    'research_agent_stream', 'analysis_agent_stream', 'recommendation_agent_stream',
+    'analyze_financial_data', 'analyze_financial_data_stream', 'analyze_financial_data_enhanced',
+    'compare_stocks', 'generate_comprehensive_report', 'analyze_batch'
+}
+
+@app.before_request
+def shed_load_when_llm_saturated():
+    if request.endpoint in _LLM_ENDPOINTS and llm_scheduler.get_scheduler().saturated():
+        logger.warning(f"⚠️ LLM queue full - rejecting {request.path}")
+        response = jsonify({'success': False, 'error': 'Server is busy (LLM queue full), please retry shortly'})
+        response.headers['Retry-After'] = str(getattr(config, 'LLM_RETRY_AFTER_SECONDS', 5))
+        return response, 503
+
+# Endpoints whose work starts by resolving a ticker from the query and fetching its data
+_PREFETCH_ENDPOINTS = {
+    'research_agent', 'research_agent_stream', 'analysis_agent', 'analysis_agent_stream',
+    'analyze_financial_data', 'analyze_financial_data_stream', 'analyze_financial_data_enhanced',
+    'submit_analysis_job'
+}
+
+@app.before_request
+def start_prefetch():
+    """Resolve the query's symbol and start warming its market data before the endpoint runs"""
+    g.prefetch = None
+    if request.endpoint not in _PREFETCH_ENDPOINTS:
+        return
+    data = request.args.to_dict() if request.method == 'GET' else request.get_json(silent=True) or {}
+    if data.get('run_id') and request.endpoint.startswith('analysis_agent'):
+        return  # The run already holds the research step's symbol and snapshot
+    g.prefetch = prefetch.start(data.get('query', ''), orchestrator.research_agent.resolve_symbol,
+                                orchestrator.data_service)
+
+@app.after_request
+def record_request_metrics(response):
+    if hasattr(g, 'request_start'):
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - g.request_start,
+            endpoint=endpoint, method=request.method, status=response.status_code
+        )
+        # With shared caches each worker publishes its metrics for the others' scrapes
+        start_metrics_publishing()
+    if g.get('trace'):
+        g.trace['trace'].root.set_attribute('http.status_code', response.status_code)
+        response.headers['X-Trace-Id'] = g.trace['trace'].trace_id
+    if g.get('profiler'):
+        response.headers['X-Profile-Id'] = g.profiler.profile_id
+        if g.get('trace'):
+            g.trace['trace'].root.set_attribute('profile_id', g.profiler.profile_id)
+    return response
+
+@app.after_request
+def compress_response(response):
+    """gzip/brotli-encode JSON and text bodies as negotiated by Accept-Encoding (streams are left alone)"""
+    return response_encoding.compress_response(response, request)
+
+def _snapshot_etag(kind: str, symbol: str, snapshot, *inputs):
+    """Weak ETag for a response derived from snapshot (None without usable data or with RESPONSE_ETAGS off)"""
+    if not response_encoding.etags_enabled() or not snapshot or 'error' in snapshot:
+        return None
+    return response_encoding.fingerprint(kind, symbol, *inputs, snapshot)
+
+def _not_modified(etag: str):
+    """
+    The answer to a request whose If-None-Match already holds etag, else None: 304 for GET/HEAD and,
+    as RFC 9110 13.1.2 requires for other methods, 412 Precondition Failed
+    """
+    if etag is None or not request.if_none_match.contains_weak(etag):
+        return None
+    if request.method not in ('GET', 'HEAD'):
+        return jsonify({'success': False,
+                        'error': 'If-None-Match matched - revalidate with GET instead of POST'}), 412
+    response = app.response_class(status=304)
+    response.set_etag(etag, weak=True)
+    return response
+
+def _request_fields():
+    """The JSON body of a POST, or the query parameters of a GET to an endpoint that takes both"""
+    return request.args.to_dict() if request.method in ('GET', 'HEAD') else request.get_json()
+
+def _with_etag(response, etag: str):
+    if etag is not None:
+        response.set_etag(etag, weak=True)
+    return response
+
+@app.teardown_request
+def finish_request_trace(error=None):
+    profiler = g.pop('profiler', None)
+    if profiler and not g.pop('profile_until_stream_ends', False):
+        profiler.stop()
+    if 'llm_cache_bypass' in g:
+        llm_cache.end_bypass(g.pop('llm_cache_bypass'))
+    tracing.end_trace(g.pop('trace', None), error=error)
+
+def _profile_stream(chunks):
+    """A streamed body that keeps the request's profile (if any) running until the stream's last chunk"""
+    profiler = g.get('profiler')
+    if profiler is None:
+        return chunks
+    # The view returns before the stream is produced, so the profile must outlive the request teardown
+    g.profile_until_stream_ends = True
+
+    def generate():
+        try:
+            yield from chunks
+        finally:
+            profiler.stop()
+    return generate()
+
+def _sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _stream_events(work):
+    """
+    Run work(emit) on a worker thread and stream what it produces as Server-Sent Events.
+    LLM output is streamed token by token as 'token' events (tagged with the current phase,
+    if work reports phases via emit('phase_started', ...)); work's return value is sent as
+    a final 'done' event, or an 'error' event if it raises.
+    """
+    events = queue.Queue()
+    cancelled = threading.Event()
+    state = {'phase': None}
+
+    def emit(event, data):
+        if event == 'phase_started':
+            state['phase'] = data.get('phase')
+        events.put((event, data))
+
+    def on_token(text):
+        if cancelled.is_set():
+            raise StreamCancelled()
+        # Phases can run concurrently, so prefer the phase the token was generated in
+        events.put(('token', {'phase': phase_graph.current_phase() or state['phase'], 'text': text}))
+
+    def run():
+        try:
+            # Someone is watching these tokens arrive, so they go ahead of background LLM work
+            with stream_tokens_to(on_token), llm_scheduler.llm_priority(llm_scheduler.PRIORITY_INTERACTIVE):
+                result = work(emit)
+            events.put(('done', result))
+        except StreamCancelled:
+            logger.info("Client disconnected - stream cancelled")
+        except Exception as e:
+            logger.error(f"❌ Error in streamed request: {str(e)}")
+            events.put(('error', {'success': False, 'error': str(e)}))
+        finally:
+            events.put(None)
+
+    # propagate() keeps LLM calls on the worker thread inside this request's trace
+    threading.Thread(target=tracing.propagate(run), name='sse-worker', daemon=True).start()
+
+    def generate():
+        try:
+            while True:
+                item = events.get()
+                if item is None:
+                    break
+                yield _sse_event(*item)
+        finally:
+            cancelled.set()
+
+    return Response(stream_with_context(_profile_stream(generate())), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def _agent_input(data, run=None, step=None) -> str:
+    """Agent input: the query plus previous agent outputs, taken from the run store or passed as context"""
+    query = data.get('query', '') or (run.query if run else '')
+    context = run.context(before=step) if run else data.get('context', '')
+    return f"{query}\n\nContext from previous analysis:\n{context}" if context else query
+
+def _lookup_run(data):
+    """(run, None) for the request's run_id, (None, None) without one, (None, 404 response) if it is unknown or expired"""
+    run_id = data.get('run_id')
+    if not run_id:
+        return None, None
+    run = run_store.get_run(run_id)
+    if run is None:
+        return None, (jsonify({'success': False, 'error': f"Unknown or expired run_id: {run_id}"}), 404)
+    return run, None
+
+def _prefetched_data(prefetched):
+    """(symbol, snapshot) from a prefetch started for this request, or (None, None)"""
+    if not prefetched:
+        return None, None
+    symbol = prefetched.symbol()
+    return symbol, (prefetched.snapshot() if symbol else None)
+
+def _run_research(query: str, run, prefetched=None) -> str:
+    """Research step; keeps the output and the fetched market data under the run"""
+    symbol, snapshot = _prefetched_data(prefetched)
+    research = orchestrator.research_agent.research_company_with_data(query, symbol=symbol, real_data=snapshot)
+    run_store.record_snapshot(run, research['symbol'], research['data'])
+    run_store.record_output(run, 'research', research['report'])
+    return research['report']
+
+def _run_analysis(data, run, prefetched=None) -> str:
+    """
+    Analysis step; with a run it reuses the research step's symbol and market data, otherwise
+    the symbol comes from the raw query (prefetched) rather than from the research prose
+    """
+    full_input = _agent_input(data, run, 'analysis')
+    if not run:
+        symbol, snapshot = _prefetched_data(prefetched)
+        return orchestrator.analysis_agent.analyze_data(full_input, symbol=symbol, real_data=snapshot)
+    result = orchestrator.analysis_agent.analyze_data(full_input, symbol=run.symbol, real_data=run.snapshot)
+    run_store.record_output(run, 'analysis', result)
+    return result
+
+def _run_recommendation(data, run) -> str:
+    result = orchestrator.recommendation_agent.generate_recommendation(_agent_input(data, run, 'recommendation'))
+    if run:
+        run_store.record_output(run, 'recommendation', result)
+    return result
+
+def _agent_response(result: str, agent_name: str, run) -> dict:
+    response = {
+        'success': True,
+        'result': result,
+        'agent': agent_name,
+        'output_length': len(result)
+    }
+    if run:
+        response['run_id'] = run.run_id
+    return response
+
 @app.route('/api/agents/research', methods=['POST'])
 def research_agent():
     try:
         data = request.get_json()
         query = data.get('query', '')
+        run, error = _lookup_run(data)
+        if error:
+            return error
+        run = run or run_store.create_run(query)
         
         logger.info(f"Research agent request: {query}")
         
-        # Get research agent output directly
-        result = orchestrator.research_agent.research_company(query)
+        # Get research agent output directly; later steps find it under run_id
+        result = _run_research(query, run, g.prefetch)
         
         logger.info(f"✅ Research completed - {len(result)} characters generated")
         
-        return jsonify({
-            'success': True,
-            'result': result,
-            'agent': 'Research Agent',
-            'output_length': len(result)
-        })
+        return jsonify(_agent_response(result, 'Research Agent', run))
         
     except Exception as e:
         logger.error(f"❌ Error in research agent: {str(e)}")
@@ -45,22 +411,18 @@ def analysis_agent():
     try:
         data = request.get_json()
         query = data.get('query', '')
-        context = data.get('context', '')  # Previous agent outputs for context
+        run, error = _lookup_run(data)
+        if error:
+            return error
         
         logger.info(f"📊 Analysis agent request: {query}")
         
         # Get analysis agent output with context
-        full_input = f"{query}\n\nContext from previous analysis:\n{context}" if context else query
-        result = orchestrator.analysis_agent.analyze_data(full_input)
+        result = _run_analysis(data, run, g.prefetch)
         
         logger.info(f"✅ Analysis completed - {len(result)} characters generated")
         
-        return jsonify({
-            'success': True,
-            'result': result,
-            'agent': 'Analysis Agent',
-            'output_length': len(result)
-        })
+        return jsonify(_agent_response(result, 'Analysis Agent', run))
         
     except Exception as e:
         logger.error(f"❌ Error in analysis agent: {str(e)}")
@@ -74,22 +436,18 @@ def recommendation_agent():
     try:
         data = request.get_json()
         query = data.get('query', '')
-        context = data.get('context', '')  # Previous agent outputs for context
+        run, error = _lookup_run(data)
+        if error:
+            return error
         
         logger.info(f"💡 Recommendation agent request: {query}")
         
         # Get recommendation agent output with full context
-        full_input = f"{query}\n\nContext from previous analysis:\n{context}" if context else query
-        result = orchestrator.recommendation_agent.generate_recommendation(full_input)
+        result = _run_recommendation(data, run)
         
         logger.info(f"✅ Recommendations completed - {len(result)} characters generated")
         
-        return jsonify({
-            'success': True,
-            'result': result,
-            'agent': 'Recommendation Agent',
-            'output_length': len(result)
-        })
+        return jsonify(_agent_response(result, 'Recommendation Agent', run))
         
     except Exception as e:
         logger.error(f"❌ Error in recommendation agent: {str(e)}")
@@ -98,10 +456,61 @@ def recommendation_agent():
             'error': str(e)
         }), 500
 
-@app.route('/api/analyze', methods=['POST'])
+def _stream_agent(agent_name: str, run_agent, run=None):
+    """SSE variant of the single-agent endpoints: tokens as they are generated, then the full result"""
+    def work(emit):
+        result = run_agent()
+        logger.info(f"✅ {agent_name} stream completed - {len(result)} characters generated")
+        return _agent_response(result, agent_name, run)
+    return _stream_events(work)
+
+@app.route('/api/agents/research/stream', methods=['POST'])
+def research_agent_stream():
+    data = request.get_json() or {}
+    query = data.get('query', '')
+    run, error = _lookup_run(data)
+    if error:
+        return error
+    run = run or run_store.create_run(query)
+    logger.info(f"Research agent stream request: {query}")
+    prefetched = g.prefetch
+    return _stream_agent('Research Agent', lambda: _run_research(query, run, prefetched), run)
+
+@app.route('/api/agents/analysis/stream', methods=['POST'])
+def analysis_agent_stream():
+    data = request.get_json() or {}
+    run, error = _lookup_run(data)
+    if error:
+        return error
+    logger.info(f"📊 Analysis agent stream request: {data.get('query', '')}")
+    prefetched = g.prefetch
+    return _stream_agent('Analysis Agent', lambda: _run_analysis(data, run, prefetched), run)
+
+@app.route('/api/agents/recommendation/stream', methods=['POST'])
+def recommendation_agent_stream():
+    data = request.get_json() or {}
+    run, error = _lookup_run(data)
+    if error:
+        return error
+    logger.info(f"💡 Recommendation agent stream request: {data.get('query', '')}")
+    return _stream_agent('Recommendation Agent', lambda: _run_recommendation(data, run), run)
+
+@app.route('/api/runs/<run_id>', methods=['GET'])
+def get_run(run_id):
+    run = run_store.get_run(run_id)
+    if run is None:
+        return jsonify({'success': False, 'error': f"Unknown or expired run_id: {run_id}"}), 404
+    return jsonify({'success': True, **run.to_dict()})
+
+@app.route('/api/analyze', methods=['GET', 'POST'])
 def analyze_financial_data():
+    """
+    Full analysis. POST takes a JSON body and always runs the analysis; GET takes query and company as
+    query parameters, returns an ETag and can be revalidated with If-None-Match (304 while the symbol's
+    data and the models are unchanged)
+    """
     try:
-        data = request.get_json()
+        data = _request_fields()
         
         if not data or 'query' not in data:
             return jsonify({'error': 'Query is required'}), 400
@@ -109,17 +518,33 @@ def analyze_financial_data():
         query = data['query']
         company = data.get('company', '')
         
+        prefetched = g.prefetch
+        etag = None
+        if request.method in ('GET', 'HEAD'):
+            # The ETag is known once the symbol and its snapshot are: a client whose copy is current
+            # gets 304 without running the agents. POST skips this and starts the agents at once.
+            prefetched = prefetched or prefetch.start_for_symbol(
+                query, orchestrator.research_agent.resolve_symbol(query), orchestrator.data_service)
+            etag = _snapshot_etag('analyze', prefetched.symbol(), prefetched.snapshot(),
+                                  section_store.normalize_query(query), company,
+                                  {name: tier['model'] for name, tier in orchestrator.router.tiers.items()})
+            not_modified = _not_modified(etag)
+            if not_modified is not None:
+                logger.info(f"✅ Analysis for {query} not modified ({prefetched.symbol()} data unchanged)")
+                return not_modified
+        
         logger.info(f"🚀 Starting comprehensive financial analysis for: {query}")
         
         # Run the multi-agent analysis with extended processing
-        result = orchestrator.orchestrate_analysis(query, company)
+        result = orchestrator.orchestrate_analysis(query, company, prefetched=prefetched)
         
         if result.get('success', True):  # Default to True if not specified for backward compatibility
             logger.info(f"✅ Analysis completed successfully - Generated {result.get('total_length', 'unknown')} characters")
-            return jsonify({
+            # A result with failure placeholders must not be revalidated as current: the next request retries
+            return _with_etag(jsonify({
                 'success': True,
                 'result': result
-            })
+            }), None if result.get('degraded') else etag)
         else:
             logger.error(f"❌ Analysis failed: {result.get('error', 'Unknown error')}")
             return jsonify({
@@ -134,6 +559,187 @@ def analyze_financial_data():
             'error': str(e)
         }), 500
 
+@app.route('/api/analyze/stream', methods=['POST'])
+def analyze_financial_data_stream():
+    """SSE variant of /api/analyze: phase events and LLM tokens as they are generated, then the full result"""
+    data = request.get_json()
+    if not data or 'query' not in data:
+        return jsonify({'error': 'Query is required'}), 400
+
+    query = data['query']
+    company = data.get('company', '')
+    logger.info(f"🚀 Starting streamed financial analysis for: {query}")
+    prefetched = g.prefetch
+
+    def work(emit):
+        result = orchestrator.orchestrate_analysis(query, company, progress=emit, prefetched=prefetched)
+        if not result.get('success', True):
+            raise RuntimeError(result.get('error', 'Analysis failed'))
+        logger.info(f"✅ Streamed analysis completed - Generated {result.get('total_length', 'unknown')} characters")
+        return {'success': True, 'result': result}
+
+    return _stream_events(work)
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_analysis_job():
+    """Queue an analysis (same body as /api/analyze) and return its job id at once (202)"""
+    data = request.get_json()
+    if not data or 'query' not in data:
+        return jsonify({'error': 'Query is required'}), 400
+
+    query = data['query']
+    company = data.get('company', '')
+    prefetched = g.prefetch
+    # The job runs on a pool thread, outside this request's context
+    fresh = llm_cache.bypassed()
+
+    def work(job):
+        with llm_cache.bypass() if fresh else nullcontext(), \
+                stream_tokens_to(lambda text: job.token(phase_graph.current_phase(), text)):
+            result = orchestrator.orchestrate_analysis(query, company, progress=job.progress, prefetched=prefetched)
+        if not result.get('success', True):
+            raise RuntimeError(result.get('error', 'Analysis failed'))
+        logger.info(f"✅ Analysis job {job.job_id} completed - Generated {result.get('total_length', 'unknown')} characters")
+        return result
+
+    try:
+        job, created = job_manager.submit(query, company, work, phases=ANALYSIS_PHASES)
+    except job_manager.JobQueueFull as e:
+        response = jsonify({'success': False, 'error': str(e)})
+        response.headers['Retry-After'] = str(getattr(config, 'LLM_RETRY_AFTER_SECONDS', 5))
+        return response, 503
+
+    logger.info(f"🚀 {'Queued' if created else 'Attached to'} analysis job {job['job_id']} for: {query}")
+    response = jsonify({'success': True, 'deduplicated': not created, **job})
+    response.headers['Location'] = f"/api/jobs/{job['job_id']}"
+    return response, 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_analysis_job(job_id):
+    """Job status and per-phase progress; ?include=result adds the result once the job has succeeded"""
+    record = job_manager.status(job_id, include_result=request.args.get('include') == 'result')
+    if record is None:
+        return jsonify({'success': False, 'error': f'Job {job_id} not found or expired'}), 404
+    return jsonify({'success': True, **record})
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_analysis_job_result(job_id):
+    """The result of a finished job in the /api/analyze response format (409 while it is unfinished)"""
+    record = job_manager.status(job_id, include_result=True)
+    if record is None:
+        return jsonify({'success': False, 'error': f'Job {job_id} not found or expired'}), 404
+    if record['status'] == job_manager.SUCCEEDED:
+        # A finished job's result never changes
+        etag = response_encoding.fingerprint('job', job_id) if response_encoding.etags_enabled() else None
+        not_modified = _not_modified(etag)
+        if not_modified is not None:
+            return not_modified
+        return _with_etag(jsonify({'success': True, 'result': record['result']}), etag)
+    if record['status'] in job_manager.FINISHED:
+        return jsonify({'success': False, 'status': record['status'],
+                        'error': record.get('error') or f"Job {record['status']}"}), 500
+    return jsonify({'success': False, 'status': record['status'], 'progress': record['progress'],
+                    'error': 'Job has not finished'}), 409
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def stream_analysis_job(job_id):
+    """SSE stream of a job: status and phase events so far, then live phase, token and final events"""
+    if job_manager.status(job_id) is None:
+        return jsonify({'success': False, 'error': f'Job {job_id} not found or expired'}), 404
+
+    def generate():
+        for item in job_manager.events(job_id):
+            # Comment lines keep proxies from closing a connection while a phase runs
+            yield ": keepalive\n\n" if item is None else _sse_event(*item)
+
+    return Response(stream_with_context(_profile_stream(generate())), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_analysis_job(job_id):
+    """Cancel a queued job at once, or a running one at its next phase boundary or LLM token"""
+    if job_manager.cancel(job_id) is None:
+        return jsonify({'success': False, 'error': f'Job {job_id} not found or expired'}), 404
+    return jsonify({'success': True, **job_manager.status(job_id)})
+
+# Query used for each symbol of a batch unless the request supplies its own "query" template
+_BATCH_QUERY = "Comprehensive investment analysis of {symbol}"
+
+@app.route('/api/analyze-batch', methods=['POST'])
+def analyze_batch():
+    """
+    Analyze a list of symbols with bounded concurrency, streaming one NDJSON record per symbol as it
+    finishes and a final summary record. Body: "symbols" (list or comma-separated), optional "mode"
+    ("full" pipeline or rule-based "quick"), "concurrency", "query" (template with {symbol}) and
+    "narrative" (quick mode).
+    """
+    data = request.get_json()
+    if not data or 'symbols' not in data:
+        return jsonify({'error': 'Stock symbols are required'}), 400
+
+    symbols = data['symbols']
+    if isinstance(symbols, str):
+        symbols = symbols.split(',')
+    if not isinstance(symbols, list) or not all(isinstance(symbol, str) for symbol in symbols):
+        return jsonify({'error': 'Invalid symbols format'}), 400
+    # Each symbol once, in request order
+    symbols = list(dict.fromkeys(symbol.strip().upper() for symbol in symbols if symbol.strip()))
+    max_symbols = getattr(config, 'BATCH_MAX_SYMBOLS', 200)
+    if not symbols or len(symbols) > max_symbols:
+        return jsonify({'error': f'Between 1 and {max_symbols} symbols are required'}), 400
+
+    mode = data.get('mode', 'full')
+    if mode not in ('full', 'quick'):
+        return jsonify({'error': 'mode must be "full" or "quick"'}), 400
+    template = data.get('query') or _BATCH_QUERY
+    if '{symbol}' not in template:
+        return jsonify({'error': 'query must contain {symbol}'}), 400
+    narrative = bool(data.get('narrative', False))
+    try:
+        requested = int(data.get('concurrency') or getattr(config, 'BATCH_DEFAULT_CONCURRENCY', 4))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'concurrency must be an integer'}), 400
+    concurrency = max(1, min(requested, getattr(config, 'BATCH_MAX_CONCURRENCY', 8), len(symbols)))
+
+    def analyze_full(symbol):
+        query = template.format(symbol=symbol)
+        # The symbol is known: skip resolution and fetch its data sections in parallel
+        prefetched = prefetch.start_for_symbol(query, symbol, orchestrator.data_service)
+        result = orchestrator.orchestrate_analysis(query, symbol, prefetched=prefetched)
+        if not result.get('success', True):
+            raise RuntimeError(result.get('error', 'Analysis failed'))
+        return result
+
+    def analyze_quick(symbol):
+        result = orchestrator.research_agent.get_quick_analysis_with_data(symbol, narrative=narrative)
+        if result['assessment'] is None:
+            raise RuntimeError(result['report'].strip())
+        if not narrative:
+            result.pop('narrative', None)
+        return result
+
+    logger.info(f"📊 Batch {mode} analysis of {len(symbols)} symbols, {concurrency} at a time")
+
+    def generate():
+        start = time.perf_counter()
+        succeeded = 0
+        # Every symbol's pipeline needs the market context; fetch it once up front
+        orchestrator.data_service.get_market_context()
+        for record in batch.run(symbols, analyze_full if mode == 'full' else analyze_quick, concurrency,
+                                kind=f'analyze_{mode}'):
+            succeeded += record['success']
+            line = {'type': 'result', 'symbol': record.pop('item'), **record}
+            yield json.dumps(line, default=str) + "\n"
+        yield json.dumps({
+            'type': 'summary', 'mode': mode, 'symbols': len(symbols), 'succeeded': succeeded,
+            'failed': len(symbols) - succeeded, 'concurrency': concurrency,
+            'seconds': time.perf_counter() - start
+        }) + "\n"
+        logger.info(f"✅ Batch {mode} analysis completed - {succeeded}/{len(symbols)} symbols succeeded")
+
+    return Response(stream_with_context(_profile_stream(generate())), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/analyze-enhanced', methods=['POST'])
 def analyze_financial_data_enhanced():
     try:
@@ -148,7 +754,7 @@ def analyze_financial_data_enhanced():
         logger.info(f"🚀 Starting ENHANCED financial analysis with REAL data for: {query}")
         
         # Run the enhanced multi-agent analysis with real data
-        result = orchestrator.orchestrate_analysis(query, company)
+        result = orchestrator.orchestrate_analysis(query, company, prefetched=g.prefetch)
         
         if result.get('success', True):
             logger.info(f"✅ Enhanced analysis completed successfully - Generated {result.get('total_length', 'unknown')} characters")
@@ -181,20 +787,26 @@ def quick_stock_analysis():
             return jsonify({'error': 'Stock symbol is required'}), 400
         
         symbol = data['symbol'].upper()
+        # Rule-based and LLM-free by default; "narrative": true adds a short LLM commentary
+        narrative = bool(data.get('narrative', False))
         
         logger.info(f"Quick analysis for: {symbol}")
         
         # Get quick analysis using enhanced research agent
-        result = orchestrator.enhanced_research_agent.get_quick_analysis(symbol)
+        result = orchestrator.research_agent.get_quick_analysis_with_data(symbol, narrative=narrative)
         
         logger.info(f"✅ Quick analysis completed for {symbol}")
         
-        return jsonify({
+        response = {
             'success': True,
-            'result': result,
+            'result': result['report'],
+            'assessment': result['assessment'],
             'symbol': symbol,
             'analysis_type': 'quick'
-        })
+        }
+        if narrative:
+            response['narrative'] = result['narrative']
+        return jsonify(response)
         
     except Exception as e:
         logger.error(f"❌ Error in quick analysis: {str(e)}")
@@ -222,7 +834,7 @@ def compare_stocks():
         logger.info(f"📊 Comparing stocks: {symbols}")
         
         # Get comparison analysis using enhanced analysis agent
-        result = orchestrator.enhanced_analysis_agent.compare_stocks(symbols)
+        result = orchestrator.analysis_agent.compare_stocks(symbols)
         
         logger.info(f"✅ Stock comparison completed for {len(symbols)} stocks")
         
@@ -240,10 +852,11 @@ def compare_stocks():
             'error': str(e)
         }), 500
 
-@app.route('/api/market-data', methods=['POST'])
+@app.route('/api/market-data', methods=['GET', 'POST'])
 def get_market_data():
+    """Market data for a symbol, from a JSON body (POST) or ?symbol= (GET, revalidated with If-None-Match)"""
     try:
-        data = request.get_json()
+        data = _request_fields()
         
         if not data or 'symbol' not in data:
             return jsonify({'error': 'Stock symbol is required'}), 400
@@ -252,17 +865,23 @@ def get_market_data():
         
         logger.info(f"📈 Getting market data for: {symbol}")
         
+        # The snapshot is cached, so reading it here does not fetch it twice
+        etag = _snapshot_etag('market_data', symbol, orchestrator.data_service.get_comprehensive_stock_data(symbol))
+        not_modified = _not_modified(etag)
+        if not_modified is not None:
+            return not_modified
+        
         # Get real-time market data
-        result = orchestrator.enhanced_research_agent.get_market_data(symbol)
+        result = orchestrator.research_agent.get_market_data(symbol)
         
         logger.info(f"✅ Market data retrieved for {symbol}")
         
-        return jsonify({
+        return _with_etag(jsonify({
             'success': True,
             'result': result,
             'symbol': symbol,
             'data_type': 'market_data'
-        })
+        }), etag)
         
     except Exception as e:
         logger.error(f"❌ Error getting market data: {str(e)}")
@@ -275,10 +894,20 @@ def get_market_data():
 def generate_comprehensive_report():
     try:
         data = request.get_json()
-        query = data.get('query', '')
-        research = data.get('research', '')
-        analysis = data.get('analysis', '')
-        recommendations = data.get('recommendations', '')
+        run, error = _lookup_run(data)
+        if error:
+            return error
+        if run:
+            # Agent outputs kept server-side for this run
+            query = data.get('query', '') or run.query
+            research = run.outputs.get('research', '')
+            analysis = run.outputs.get('analysis', '')
+            recommendations = run.outputs.get('recommendation', '')
+        else:
+            query = data.get('query', '')
+            research = data.get('research', '')
+            analysis = data.get('analysis', '')
+            recommendations = data.get('recommendations', '')
         
         logger.info(f"📋 Generating comprehensive report for: {query}")
         
@@ -302,14 +931,136 @@ def generate_comprehensive_report():
             'error': str(e)
         }), 500
 
+@app.route('/api/traces', methods=['GET'])
+def list_traces():
+    """Summaries of the most recent request traces (admin only)"""
+    if not _is_admin():
+        return _admin_forbidden()
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify({'success': True, 'traces': tracing.recent_traces(limit)})
+
+@app.route('/api/traces/<trace_id>', methods=['GET'])
+def get_trace(trace_id):
+    """Full span tree for one request; ?format=otlp returns OTLP/JSON (admin only)"""
+    if not _is_admin():
+        return _admin_forbidden()
+    trace = tracing.get_trace(trace_id, request.args.get('format', 'json'))
+    if trace is None:
+        return jsonify({'success': False, 'error': f'Trace {trace_id} not found'}), 404
+    return jsonify(trace)
+
+@app.route('/api/admin/profiles', methods=['GET'])
+def list_profiles():
+    """Recently captured request profiles (admin only)"""
+    if not _is_admin():
+        return _admin_forbidden()
+    return jsonify({'success': True, 'profiles': profiling.list_profiles()})
+
+@app.route('/api/admin/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """Top-N self/inclusive summary and collapsed stacks for one profiled request (admin only)"""
+    if not _is_admin():
+        return _admin_forbidden()
+    profile = profiling.get_profile(profile_id)
+    if profile is None:
+        return jsonify({'success': False, 'error': f'Profile {profile_id} not found'}), 404
+    return jsonify(profile)
+
+@app.route('/api/admin/profiles/<profile_id>/collapsed', methods=['GET'])
+def get_profile_collapsed(profile_id):
+    """Collapsed stacks only, ready for flamegraph.pl or speedscope (admin only)"""
+    if not _is_admin():
+        return _admin_forbidden()
+    profile = profiling.get_profile(profile_id)
+    if profile is None:
+        return jsonify({'success': False, 'error': f'Profile {profile_id} not found'}), 404
+    return Response(profile['collapsed'] + "\n", mimetype='text/plain')
+
+@app.route('/api/admin/memory', methods=['GET'])
+def memory_report():
+    """Approximate memory held by caches, conversation memory and the process (admin only)"""
+    if not _is_admin():
+        return _admin_forbidden()
+    return jsonify(memory_accounting.report())
+
+@app.route('/api/admin/llm-cache', methods=['GET'])
+def llm_cache_stats():
+    """LLM response cache size and hit ratio (admin only)"""
+    if not _is_admin():
+        return _admin_forbidden()
+    return jsonify(llm_cache.stats())
+
+@app.route('/api/admin/llm-latency', methods=['GET'])
+def llm_latency_stats():
+    """
+    LLM latency percentiles, hedge delays, adaptive timeouts and hedge budget per call type
+    (admin only); each worker adapts to the latencies it observes, so these are per worker
+    """
+    if not _is_admin():
+        return _admin_forbidden()
+    return jsonify(llm_hedging.stats())
+
+@app.route('/api/admin/llm-tiers', methods=['GET'])
+def llm_tier_stats():
+    """
+    Configured model, max_tokens and timeout plus calls, tokens and latency per model
+    tier in the worker answering (admin only; /api/metrics has the totals of all workers)
+    """
+    if not _is_admin():
+        return _admin_forbidden()
+    return jsonify(orchestrator.router.stats())
+
+@app.route('/api/admin/report-sections', methods=['GET'])
+def report_section_stats():
+    """Stored report sections and how often sections were reused instead of regenerated (admin only)"""
+    if not _is_admin():
+        return _admin_forbidden()
+    return jsonify(section_store.stats())
+
+@app.route('/api/admin/jobs', methods=['GET'])
+def analysis_job_stats():
+    """Analysis jobs by status and the most recent jobs in this worker (admin only)"""
+    if not _is_admin():
+        return _admin_forbidden()
+    return jsonify(job_manager.stats())
+
+@app.route('/api/admin/shared-cache', methods=['GET'])
+def shared_cache_stats():
+    """Cache backend and entries per cache (shared by all workers with CACHE_BACKEND = "sqlite") (admin only)"""
+    if not _is_admin():
+        return _admin_forbidden()
+    return jsonify(shared_cache.stats())
+
+@app.route('/api/admin/cache-warming', methods=['GET'])
+def cache_warming_stats():
+    """Watchlist warming schedule, last run report and how much of the watchlist is warm now (admin only)"""
+    if not _is_admin():
+        return _admin_forbidden()
+    return jsonify(cache_warmer.stats())
+
+@app.route('/api/admin/cache-warming/run', methods=['POST'])
+def cache_warming_run():
+    """Warm the watchlist now, in the background; poll /api/admin/cache-warming for the report (admin only)"""
+    if not _is_admin():
+        return _admin_forbidden()
+    if not cache_warmer.start(trigger='manual'):
+        return jsonify({'success': False, 'error': 'A cache warming run is already in progress'}), 409
+    return jsonify({'success': True, 'started': True}), 202
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({'status': 'healthy'})
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint (totals over all workers when the caches are shared)"""
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/api/agents', methods=['GET'])
 def get_agents():
     agents_info = orchestrator.get_agents_info()
     return jsonify(agents_info)
 
 if __name__ == '__main__':
+    # Development server; for production run several workers with gunicorn (see gunicorn.conf.py)
     app.run(debug=True, host='0.0.0.0', port=5000)
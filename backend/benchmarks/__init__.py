@@ -0,0 +1 @@
+# Benchmarks for the Multi-Agent Financial Analysis backend
@@ -0,0 +1,166 @@
+"""
+Bytes on the wire of API responses with and without content encoding.
+
+Boots the app in-process with replayed market data and the fake LLM backend,
+requests /api/analyze, /api/market-data and /api/quick-analysis for a set of
+symbols once per encoding (identity, gzip and, when the brotli package is
+installed, br) and reports the body bytes sent, the compression ratio and the
+time spent encoding. Endpoints with a GET form are requested through it and,
+when they returned an ETag, revalidated with the ETag in If-None-Match, which
+should be answered with 304 and no body (POST never returns an /api/analyze
+ETag). The fake model's text repeats more than real reports do, so
+/api/analyze ratios are higher here than in production.
+
+Usage (from the backend directory):
+    python -m benchmarks.compression_bench
+    python -m benchmarks.compression_bench --symbols 10 --gzip-level 9 --output compression.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Endpoint name -> (path, request fields for a symbol, whether it has a GET form)
+ENDPOINTS = {
+    'analyze': ('/api/analyze', lambda symbol: {'query': f"Analyze {symbol} stock"}, True),
+    'market_data': ('/api/market-data', lambda symbol: {'symbol': symbol}, True),
+    'quick_analysis': ('/api/quick-analysis', lambda symbol: {'symbol': symbol}, False)
+}
+
+
+def boot_app(args):
+    """Import app.py with replayed data, the fake LLM and the benchmark's compression settings"""
+    try:
+        import config
+    except ImportError:
+        sys.exit("config.py not found - copy config.py.example to config.py first")
+
+    config.LLM_BACKEND = 'fake'
+    config.FAKE_LLM_TTFT_SECONDS = 0
+    config.FAKE_LLM_TOKENS_PER_SECOND = 0
+    config.RESPONSE_COMPRESSION = True
+    config.RESPONSE_COMPRESSION_MIN_BYTES = 0
+    config.RESPONSE_GZIP_LEVEL = args.gzip_level
+    config.RESPONSE_BROTLI_QUALITY = args.brotli_quality
+    config.RESPONSE_ETAGS = True
+
+    from benchmarks.fixtures import install_replayed_market_data
+    install_replayed_market_data()
+
+    import app as backend_app
+    return backend_app
+
+
+def _encode_ms(response_encoding, body: bytes, encoding: str, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        response_encoding.encode(body, encoding)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def measure(backend_app, name: str, symbols: List[str], repeats: int) -> Dict[str, Any]:
+    """Body bytes per encoding, encode time and revalidation outcome for one endpoint over symbols"""
+    from services import response_encoding
+
+    path, body_for, has_get = ENDPOINTS[name]
+    client = backend_app.app.test_client()
+    encodings = ('identity',) + response_encoding.available_encodings()
+    sent = {encoding: 0 for encoding in encodings}
+    encode_ms = {encoding: [] for encoding in encodings if encoding != 'identity'}
+    revalidated = {'not_modified': 0, 'bytes': 0, 'seconds': [], 'full_seconds': []}
+
+    for symbol in symbols:
+        etag = None
+        for encoding in encodings:
+            start = time.perf_counter()
+            headers = {'Accept-Encoding': encoding}
+            if has_get:
+                response = client.get(path, query_string=body_for(symbol), headers=headers)
+            else:
+                response = client.post(path, json=body_for(symbol), headers=headers)
+            elapsed = time.perf_counter() - start
+            if response.status_code != 200:
+                raise RuntimeError(f"{path} for {symbol} returned {response.status_code}")
+            sent[encoding] += len(response.data)
+            etag = etag or response.headers.get('ETag')
+            if encoding == 'identity':
+                revalidated['full_seconds'].append(elapsed)
+                for coded in encode_ms:
+                    encode_ms[coded].append(_encode_ms(response_encoding, response.data, coded, repeats))
+
+        if etag:
+            start = time.perf_counter()
+            response = client.get(path, query_string=body_for(symbol), headers={'If-None-Match': etag})
+            revalidated['seconds'].append(time.perf_counter() - start)
+            revalidated['not_modified'] += response.status_code == 304
+            revalidated['bytes'] += len(response.data)
+
+    return {
+        'requests': len(symbols),
+        'bytes': sent,
+        'ratio': {encoding: sent['identity'] / max(1, sent[encoding]) for encoding in encodings},
+        'encode_ms_median': {encoding: statistics.median(values) for encoding, values in encode_ms.items()},
+        'revalidation': {
+            'with_etag': len(revalidated['seconds']),
+            'not_modified': revalidated['not_modified'],
+            'bytes': revalidated['bytes'],
+            'median_seconds': statistics.median(revalidated['seconds']) if revalidated['seconds'] else None,
+            'full_median_seconds': statistics.median(revalidated['full_seconds'])
+        }
+    }
+
+
+def print_report(results: Dict[str, Dict[str, Any]]):
+    encodings = list(next(iter(results.values()))['bytes'])
+    header = f"{'endpoint':<16}" + ''.join(f" {encoding + ' B':>11}" for encoding in encodings)
+    header += ''.join(f" {encoding + ' x':>8} {encoding + ' ms':>8}" for encoding in encodings[1:])
+    print(f"\n{header} {'304s':>6} {'304 ms':>8} {'200 ms':>8}")
+    for name, r in results.items():
+        line = f"{name:<16}" + ''.join(f" {r['bytes'][encoding]:>11,}" for encoding in encodings)
+        line += ''.join(f" {r['ratio'][encoding]:>8.1f} {r['encode_ms_median'][encoding]:>8.2f}"
+                        for encoding in encodings[1:])
+        reval = r['revalidation']
+        not_modified = f"{reval['not_modified']}/{reval['with_etag']}"
+        median_304 = f"{reval['median_seconds'] * 1000:.1f}" if reval['median_seconds'] is not None else '-'
+        line += f" {not_modified:>6} {median_304:>8} {reval['full_median_seconds'] * 1000:>8.1f}"
+        print(line)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--symbols', type=int, default=5, help='Symbols to request per endpoint')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help='Comma-separated endpoints to measure')
+    parser.add_argument('--gzip-level', type=int, default=6, help='RESPONSE_GZIP_LEVEL')
+    parser.add_argument('--brotli-quality', type=int, default=5, help='RESPONSE_BROTLI_QUALITY')
+    parser.add_argument('--repeats', type=int, default=5, help='Encodings timed per response')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    backend_app = boot_app(args)
+    from benchmarks.fixtures import BENCHMARK_SYMBOLS
+    from services import response_encoding
+
+    symbols = BENCHMARK_SYMBOLS[:args.symbols]
+    names = [name.strip() for name in args.endpoints.split(',') if name.strip()]
+    results = {name: measure(backend_app, name, symbols, args.repeats) for name in names}
+    if 'br' not in response_encoding.available_encodings():
+        print("brotli is not installed - measuring gzip only (pip install brotli)")
+    print_report(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'symbols': symbols, 'gzip_level': args.gzip_level,
+                       'brotli_quality': args.brotli_quality, 'endpoints': results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,364 @@
+"""
+Replayed market data fixtures for benchmarks.
+
+Every upstream source the data service touches (yfinance tickers, the S&P
+download used for beta, and the scraped HTML pages) is replaced by a
+deterministic replay, so benchmark runs measure our own code instead of
+network latency and produce the same numbers on every machine.
+"""
+import re
+import zlib
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from services.enhanced_financial_data_service import EnhancedFinancialDataService
+
+# Trading days per yfinance period string
+PERIOD_DAYS = {
+    '1mo': 22,
+    '3mo': 66,
+    '6mo': 132,
+    '1y': 252,
+    '2y': 504,
+    '5y': 1260
+}
+
+SECTORS = [
+    'Technology', 'Healthcare', 'Financial Services', 'Consumer Cyclical',
+    'Communication Services', 'Industrial', 'Consumer Defensive', 'Energy',
+    'Utilities', 'Real Estate', 'Materials'
+]
+
+# Symbols used by the multi-stock benchmarks (50 names)
+BENCHMARK_SYMBOLS = [
+    'AAPL', 'MSFT', 'GOOGL', 'AMZN', 'META', 'NVDA', 'TSLA', 'JPM', 'BAC', 'WFC',
+    'GS', 'MS', 'JNJ', 'PFE', 'UNH', 'ABBV', 'TMO', 'HD', 'MCD', 'NKE',
+    'NFLX', 'DIS', 'T', 'BA', 'CAT', 'GE', 'LMT', 'UPS', 'PG', 'KO',
+    'PEP', 'WMT', 'COST', 'XOM', 'CVX', 'COP', 'EOG', 'SLB', 'NEE', 'SO',
+    'DUK', 'AEP', 'EXC', 'AMT', 'PLD', 'CCI', 'EQIX', 'PSA', 'LIN', 'APD'
+]
+
+
+def _seed(symbol: str) -> int:
+    """Stable per-symbol seed (independent of PYTHONHASHSEED)"""
+    return zlib.crc32(symbol.encode('utf-8'))
+
+
+def _trading_days(days: int) -> pd.DatetimeIndex:
+    return pd.bdate_range(end='2025-07-18', periods=days)
+
+
+def make_price_history(symbol: str, period: str = "1y") -> pd.DataFrame:
+    """Generate a deterministic OHLCV history for a symbol"""
+    days = PERIOD_DAYS.get(period, 252)
+    return _full_price_history(symbol).tail(days).copy()
+
+
+@lru_cache(maxsize=None)
+def _full_price_history(symbol: str) -> pd.DataFrame:
+    rng = np.random.default_rng(_seed(symbol))
+
+    # Generate the full 5y path once so shorter periods are suffixes of longer ones
+    full_days = PERIOD_DAYS['5y']
+    start_price = 20 + (_seed(symbol) % 400)
+    daily_returns = rng.normal(0.0004, 0.018, full_days)
+    close = start_price * np.cumprod(1 + daily_returns)
+    spread = np.abs(rng.normal(0, 0.01, full_days))
+    volume = rng.integers(1_000_000, 80_000_000, full_days)
+
+    frame = pd.DataFrame({
+        'Open': close * (1 - spread / 2),
+        'High': close * (1 + spread),
+        'Low': close * (1 - spread),
+        'Close': close,
+        'Volume': volume
+    }, index=_trading_days(full_days))
+    return frame
+
+
+def make_info(symbol: str) -> Dict[str, Any]:
+    """Generate a deterministic ticker.info payload"""
+    return dict(_info(symbol))
+
+
+@lru_cache(maxsize=None)
+def _info(symbol: str) -> Dict[str, Any]:
+    seed = _seed(symbol)
+    rng = np.random.default_rng(seed)
+    hist = make_price_history(symbol, '1y')
+    price = float(hist['Close'].iloc[-1])
+    shares = float(rng.integers(200_000_000, 16_000_000_000))
+
+    return {
+        'symbol': symbol,
+        'shortName': f"{symbol} Corp",
+        'longName': f"{symbol} Corporation",
+        'sector': SECTORS[seed % len(SECTORS)],
+        'industry': 'Replay Industry',
+        'country': 'United States',
+        'website': f"https://www.{symbol.lower()}.example.com",
+        'longBusinessSummary': (f"{symbol} Corporation designs, manufactures and markets products "
+                                "and services worldwide. " * 12),
+        'fullTimeEmployees': int(rng.integers(5_000, 400_000)),
+        'marketCap': int(price * shares),
+        'enterpriseValue': int(price * shares * 1.05),
+        'regularMarketPrice': price,
+        'trailingPE': float(rng.uniform(8, 45)),
+        'forwardPE': float(rng.uniform(8, 40)),
+        'pegRatio': float(rng.uniform(0.5, 3)),
+        'priceToBook': float(rng.uniform(1, 40)),
+        'priceToSalesTrailing12Months': float(rng.uniform(1, 12)),
+        'enterpriseToEbitda': float(rng.uniform(6, 30)),
+        'bookValue': float(rng.uniform(5, 80)),
+        'dividendYield': float(rng.uniform(0, 0.04)),
+        'dividendRate': float(rng.uniform(0, 4)),
+        'payoutRatio': float(rng.uniform(0, 0.7)),
+        'beta': float(rng.uniform(0.5, 1.8)),
+        'currentRatio': float(rng.uniform(0.6, 3)),
+        'debtToEquity': float(rng.uniform(0.1, 2.5)),
+        'returnOnEquity': float(rng.uniform(-0.05, 0.9)),
+        'revenueGrowth': float(rng.uniform(-0.1, 0.35)),
+        'profitMargins': float(rng.uniform(-0.05, 0.35)),
+        'operatingMargins': float(rng.uniform(0, 0.45)),
+        'fiftyTwoWeekHigh': float(hist['High'].max()),
+        'fiftyTwoWeekLow': float(hist['Low'].min()),
+        'dayLow': price * 0.99,
+        'dayHigh': price * 1.01,
+        'previousClose': float(hist['Close'].iloc[-2]),
+        'open': float(hist['Open'].iloc[-1])
+    }
+
+
+def _make_statement(symbol: str, rows: Dict[str, float]) -> pd.DataFrame:
+    columns = pd.to_datetime(['2024-12-31', '2023-12-31', '2022-12-31', '2021-12-31'])
+    data = {row: [value * (1 - 0.06 * i) for i in range(len(columns))] for row, value in rows.items()}
+    return pd.DataFrame(data, index=columns).T
+
+
+def make_statements(symbol: str) -> Dict[str, pd.DataFrame]:
+    """Generate deterministic income, balance sheet and cash flow statements"""
+    rng = np.random.default_rng(_seed(symbol) + 1)
+    revenue = float(rng.uniform(5e9, 4e11))
+    return {
+        'financials': _make_statement(symbol, {
+            'Total Revenue': revenue,
+            'Gross Profit': revenue * 0.42,
+            'Operating Income': revenue * 0.27,
+            'Net Income': revenue * 0.21,
+            'EBITDA': revenue * 0.33
+        }),
+        'balance_sheet': _make_statement(symbol, {
+            'Total Assets': revenue * 1.3,
+            'Total Debt': revenue * 0.3,
+            'Cash And Cash Equivalents': revenue * 0.15,
+            'Total Equity Gross Minority Interest': revenue * 0.5,
+            'Working Capital': revenue * 0.05
+        }),
+        'cashflow': _make_statement(symbol, {
+            'Operating Cash Flow': revenue * 0.28,
+            'Free Cash Flow': revenue * 0.24,
+            'Capital Expenditure': -revenue * 0.04
+        })
+    }
+
+
+def make_recommendations(symbol: str) -> pd.DataFrame:
+    grades = ['Buy', 'Hold', 'Overweight', 'Outperform', 'Neutral', 'Strong Buy']
+    rng = np.random.default_rng(_seed(symbol) + 2)
+    return pd.DataFrame({
+        'Firm': [f"Broker {i}" for i in range(20)],
+        'To Grade': [grades[i] for i in rng.integers(0, len(grades), 20)]
+    }, index=pd.bdate_range(end='2025-07-18', periods=20))
+
+
+def make_news(symbol: str) -> List[Dict[str, Any]]:
+    return [{
+        'title': f"{symbol} headline number {i} moves the market",
+        'publisher': 'Replay Wire',
+        'providerPublishTime': 1752800000 - i * 3600
+    } for i in range(8)]
+
+
+class ReplayTicker:
+    """Drop-in replacement for yfinance.Ticker backed by generated fixtures"""
+
+    def __init__(self, ticker: str, *args, **kwargs):
+        self.ticker = ticker.upper()
+        self._info = None
+        self._statements = None
+
+    @property
+    def info(self) -> Dict[str, Any]:
+        # yfinance fetches info once per Ticker object and reuses it
+        if self._info is None:
+            self._info = make_info(self.ticker)
+        return self._info
+
+    def history(self, period: str = "1mo", **kwargs) -> pd.DataFrame:
+        return make_price_history(self.ticker, period)
+
+    def _statement(self, name: str) -> pd.DataFrame:
+        if self._statements is None:
+            self._statements = make_statements(self.ticker)
+        return self._statements[name]
+
+    @property
+    def financials(self) -> pd.DataFrame:
+        return self._statement('financials')
+
+    @property
+    def balance_sheet(self) -> pd.DataFrame:
+        return self._statement('balance_sheet')
+
+    @property
+    def cashflow(self) -> pd.DataFrame:
+        return self._statement('cashflow')
+
+    @property
+    def recommendations(self) -> pd.DataFrame:
+        return make_recommendations(self.ticker)
+
+    @property
+    def news(self) -> List[Dict[str, Any]]:
+        return make_news(self.ticker)
+
+
+def replay_download(tickers, period: str = "1mo", **kwargs) -> pd.DataFrame:
+    """Replacement for yfinance.download returning a single-symbol history"""
+    symbol = tickers if isinstance(tickers, str) else tickers[0]
+    return make_price_history(symbol, period)
+
+
+# =============================================================================
+# SCRAPED PAGE FIXTURES
+# =============================================================================
+
+def finviz_html(symbol: str) -> str:
+    pairs = [
+        ('P/E', '28.41'), ('Forward P/E', '25.10'), ('PEG', '2.31'), ('P/B', '45.12'),
+        ('P/S', '7.55'), ('ROE', '147.25%'), ('ROA', '28.30%'), ('Debt/Eq', '1.87'),
+        ('Current Ratio', '0.99'), ('Gross Margin', '45.62%'), ('Profit Margin', '24.30%'),
+        ('Insider Own', '0.07%'), ('Inst Own', '61.15%'), ('Short Float', '0.71%'),
+        ('Recom', '2.00'), ('Target Price', '210.50'), ('Market Cap', '2950.12B'),
+        ('Income', '97.15B'), ('Sales', '383.29B'), ('Employees', '161000')
+    ]
+    rows = []
+    for i in range(0, len(pairs), 4):
+        cells = ''.join(f"<td>{k}</td><td><b>{v}</b></td>" for k, v in pairs[i:i + 4])
+        rows.append(f"<tr>{cells}</tr>")
+    filler = ''.join(f"<div class='nav-item'><a href='/x{i}'>Link {i}</a></div>" for i in range(200))
+    return (f"<html><head><title>{symbol} Stock Quote</title></head><body>{filler}"
+            f"<table class='snapshot-table2'>{''.join(rows)}</table></body></html>")
+
+
+def marketwatch_html(symbol: str) -> str:
+    articles = ''.join(
+        f"<div class='element--article'><h3><a href='/story/{symbol.lower()}-{i}'>"
+        f"{symbol} shares rise after quarterly update {i}</a></h3>"
+        f"<time>Jul {18 - i % 10}, 2025</time></div>"
+        for i in range(25)
+    )
+    return f"<html><body><div class='collection__elements'>{articles}</div></body></html>"
+
+
+def seeking_alpha_html(symbol: str) -> str:
+    links = ''.join(
+        f"<a data-test-id='post-list-item-title' href='/article/{i}-{symbol.lower()}'>"
+        f"{symbol}: Valuation check after the rally, part {i}</a>"
+        for i in range(12)
+    )
+    return f"<html><body><section>{links}</section><div>Quant Rating: Buy</div></body></html>"
+
+
+def yahoo_news_html(symbol: str) -> str:
+    headlines = ''.join(
+        f"<li class='js-stream-content'><h3><a href='/news/{symbol.lower()}-{i}.html'>"
+        f"{symbol} earnings preview: what analysts expect this quarter {i}</a></h3></li>"
+        for i in range(20)
+    )
+    return f"<html><body><ul>{headlines}</ul></body></html>"
+
+
+def sec_filings_xml(symbol: str) -> str:
+    entries = ''.join(
+        f"<entry><title>10-Q Quarterly report {i}</title>"
+        f"<link href='https://www.sec.gov/Archives/edgar/data/{i}/index.htm'/>"
+        f"<updated>2025-0{1 + i % 9}-15T16:30:00-04:00</updated></entry>"
+        for i in range(15)
+    )
+    return f"<?xml version='1.0' encoding='UTF-8'?><feed xmlns='http://www.w3.org/2005/Atom'>{entries}</feed>"
+
+
+def insider_trading_html(symbol: str) -> str:
+    rows = ''.join(
+        f"<tr><td>Insider {i}</td><td>{'Sale' if i % 2 else 'Purchase'}</td>"
+        f"<td>{(i + 1) * 1000:,}</td><td>2025-07-{10 + i % 9:02d}</td></tr>"
+        for i in range(15)
+    )
+    return (f"<html><body><table class='tinytable'><tr><th>Insider</th><th>Type</th>"
+            f"<th>Shares</th><th>Date</th></tr>{rows}</table></body></html>")
+
+
+# Map of URL fragment -> page fixture
+PAGE_FIXTURES = [
+    ('finviz.com', finviz_html),
+    ('marketwatch.com', marketwatch_html),
+    ('seekingalpha.com', seeking_alpha_html),
+    ('finance.yahoo.com', yahoo_news_html),
+    ('sec.gov', sec_filings_xml),
+    ('secform4.com', insider_trading_html)
+]
+
+
+class ReplayResponse:
+    """Minimal stand-in for requests.Response"""
+
+    def __init__(self, url: str, text: str):
+        self.url = url
+        self.status_code = 200
+        self.text = text
+        self.content = text.encode('utf-8')
+
+
+def _symbol_from_url(url: str) -> str:
+    match = re.search(r'(?:t=|CIK=|stock/|symbol/|quote/|trading/)([A-Za-z\-]+)', url)
+    return match.group(1).upper() if match else 'UNKNOWN'
+
+
+def replay_request(self, url: str, retries: int = None):
+    """Replacement for EnhancedFinancialDataService._safe_request"""
+    for fragment, page in PAGE_FIXTURES:
+        if fragment in url:
+            return ReplayResponse(url, page(_symbol_from_url(url)))
+    return None
+
+
+@contextmanager
+def replayed_market_data():
+    """Route yfinance and scraper traffic to the deterministic fixtures"""
+    original_ticker = yf.Ticker
+    original_download = yf.download
+    original_request = EnhancedFinancialDataService._safe_request
+
+    yf.Ticker = ReplayTicker
+    yf.download = replay_download
+    EnhancedFinancialDataService._safe_request = replay_request
+    try:
+        yield
+    finally:
+        yf.Ticker = original_ticker
+        yf.download = original_download
+        EnhancedFinancialDataService._safe_request = original_request
+
+
+def install_replayed_market_data():
+    """Permanently install the replay (for long-running harnesses)"""
+    yf.Ticker = ReplayTicker
+    yf.download = replay_download
+    EnhancedFinancialDataService._safe_request = replay_request
+
@@ -0,0 +1,119 @@
+"""
+Tail latency of LLM calls with and without hedging.
+
+Sends a stream of calls through the shared LLM client (scheduler, hedging,
+adaptive timeouts) to the fake chat model with injected stragglers: a fraction
+of calls stalls for a fixed delay before the first token. The same workload
+runs once with hedging disabled and once enabled, and the latency percentiles
+and hedge counts of both runs are printed side by side. Hedges only go out
+while a scheduler slot is free, so the scheduler gets --max-concurrency slots
+(by default twice the callers) and hedges skipped for lack of one are counted.
+
+Usage (from the backend directory):
+    python -m benchmarks.hedging_bench
+    python -m benchmarks.hedging_bench --calls 400 --straggler-probability 0.02 --straggler-delay 5 --stream
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.fake_chat_model import FakeChatModel
+from agents.llm_client import call_llm, stream_tokens_to
+from services import llm_cache, llm_hedging, llm_scheduler
+from services.metrics import LLM_HEDGES
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_workload(args, hedging: bool) -> Dict[str, Any]:
+    """Send args.calls calls from args.concurrency threads and summarize their latencies"""
+    llm_hedging.configure(enabled=hedging, min_samples=args.min_samples, budget_ratio=args.budget_ratio,
+                          max_timeout=args.straggler_delay * 4)
+    llm = FakeChatModel(ttft_seconds=args.ttft, tokens_per_second=args.tokens_per_second,
+                        output_tokens=args.output_tokens, straggler_probability=args.straggler_probability,
+                        straggler_delay_seconds=args.straggler_delay, seed=args.seed)
+    call_type = f"bench_{'hedged' if hedging else 'plain'}"
+
+    def one_call(index: int) -> float:
+        start = time.perf_counter()
+        prompt = f"# HEDGING BENCHMARK\nCall {index}"
+        if args.stream:
+            with stream_tokens_to(lambda text: None):
+                call_llm(llm, prompt, 'Hedging Benchmark', call_type)
+        else:
+            call_llm(llm, prompt, 'Hedging Benchmark', call_type)
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        # Unmeasured warm-up so the latency distribution is known before hedging can start
+        list(pool.map(one_call, range(args.warmup)))
+        hedges_before = LLM_HEDGES.value(call_type=call_type, outcome='sent')
+        no_capacity_before = LLM_HEDGES.value(call_type=call_type, outcome='no_capacity')
+        latencies = list(pool.map(one_call, range(args.warmup, args.warmup + args.calls)))
+
+    return {
+        'hedging': hedging,
+        'calls': len(latencies),
+        'mean': statistics.mean(latencies),
+        'p50': _percentile(latencies, 0.5),
+        'p95': _percentile(latencies, 0.95),
+        'p99': _percentile(latencies, 0.99),
+        'max': max(latencies),
+        'hedges_sent': LLM_HEDGES.value(call_type=call_type, outcome='sent') - hedges_before,
+        'hedges_no_capacity': LLM_HEDGES.value(call_type=call_type, outcome='no_capacity') - no_capacity_before
+    }
+
+
+def print_report(results: List[Dict[str, Any]]):
+    print(f"\n{'mode':<10} {'calls':>6} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'hedges':>7} "
+          f"{'no slot':>8}")
+    for r in results:
+        mode = 'hedged' if r['hedging'] else 'plain'
+        print(f"{mode:<10} {r['calls']:>6} {r['mean']:>8.3f} {r['p50']:>8.3f} {r['p95']:>8.3f} "
+              f"{r['p99']:>8.3f} {r['max']:>8.3f} {r['hedges_sent']:>7} {r['hedges_no_capacity']:>8}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=200, help='LLM calls per run')
+    parser.add_argument('--warmup', type=int, default=50, help='Unmeasured calls before each run')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent callers')
+    parser.add_argument('--max-concurrency', type=int, help='Scheduler slots (LLM_MAX_CONCURRENCY; default 2x callers)')
+    parser.add_argument('--ttft', type=float, default=0.05, help='Fake model time to first token (s)')
+    parser.add_argument('--tokens-per-second', type=float, default=2000, help='Fake model generation speed')
+    parser.add_argument('--output-tokens', type=int, default=100, help='Fake model response length')
+    parser.add_argument('--straggler-probability', type=float, default=0.03,
+                        help='Fraction of calls that stall (hedging only catches stragglers beyond the p95)')
+    parser.add_argument('--straggler-delay', type=float, default=2.0, help='Stall of a straggler (s)')
+    parser.add_argument('--min-samples', type=int, default=20, help='Calls observed before hedging starts')
+    parser.add_argument('--budget-ratio', type=float, default=0.1, help='Hedge budget as a fraction of calls')
+    parser.add_argument('--stream', action='store_true', help='Stream responses (hedge on time to first token)')
+    parser.add_argument('--seed', type=int, default=42, help='Fake model seed')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    # Every call must reach the fake model
+    llm_cache.configure(enabled=False)
+    llm_scheduler.configure(max_concurrency=args.max_concurrency or args.concurrency * 2)
+    results = [run_workload(args, hedging=False), run_workload(args, hedging=True)]
+    print_report(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
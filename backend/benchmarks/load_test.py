@@ -0,0 +1,299 @@
+"""
+End-to-end load generator for the Flask API.
+
+By default the harness boots app.py in-process on a threaded WSGI server with
+replayed market data (benchmarks/fixtures.py) and the fake LLM backend, so a
+run measures our own orchestration and concurrency behaviour rather than
+Yahoo Finance or OpenAI. Point --url at a running instance to test a real
+deployment instead.
+
+Two arrival models are supported:
+  closed loop (--concurrency N): N virtual users send requests back to back
+  open loop   (--rate R):        requests arrive at R/s regardless of completions,
+                                 which exposes queueing once the server saturates
+
+Usage (from the backend directory):
+    python -m benchmarks.load_test --profile mixed --concurrency 8 --duration 30
+    python -m benchmarks.load_test --profile quick --rate 20 --duration 60 --output load.json
+    python -m benchmarks.load_test --url http://localhost:5000 --profile analyze --concurrency 2
+"""
+import argparse
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import BENCHMARK_SYMBOLS
+
+# Endpoint name -> (path, request body factory)
+ENDPOINTS: Dict[str, Tuple[str, Callable[[int], Dict[str, Any]]]] = {
+    'analyze': ('/api/analyze', lambda i: {
+        'query': f"Analyze {BENCHMARK_SYMBOLS[i % len(BENCHMARK_SYMBOLS)]}"
+    }),
+    'quick-analysis': ('/api/quick-analysis', lambda i: {
+        'symbol': BENCHMARK_SYMBOLS[i % len(BENCHMARK_SYMBOLS)]
+    }),
+    'compare-stocks': ('/api/compare-stocks', lambda i: {
+        'symbols': [BENCHMARK_SYMBOLS[(i + k) % len(BENCHMARK_SYMBOLS)] for k in range(3)]
+    })
+}
+
+# Traffic profiles: endpoint name -> relative weight
+PROFILES: Dict[str, Dict[str, float]] = {
+    'mixed': {'analyze': 0.1, 'quick-analysis': 0.6, 'compare-stocks': 0.3},
+    'analyze': {'analyze': 1.0},
+    'quick': {'quick-analysis': 1.0},
+    'compare': {'compare-stocks': 1.0}
+}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class LoadRecorder:
+    """Thread-safe collection of per-request samples"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples: List[Dict[str, Any]] = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def start(self):
+        with self.lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def finish(self, sample: Dict[str, Any]):
+        with self.lock:
+            self.in_flight -= 1
+            self.samples.append(sample)
+
+
+def send_request(session: requests.Session, base_url: str, endpoint: str, index: int,
+                 recorder: LoadRecorder, timeout: float, scheduled_at: Optional[float] = None):
+    """Send one request and record latency, status and queueing delay"""
+    path, body_factory = ENDPOINTS[endpoint]
+    started_at = time.perf_counter()
+    recorder.start()
+    status = None
+    error = None
+    try:
+        response = session.post(base_url + path, json=body_factory(index), timeout=timeout)
+        status = response.status_code
+        if status >= 400:
+            error = f"HTTP {status}"
+    except requests.exceptions.RequestException as e:
+        error = type(e).__name__
+    finished_at = time.perf_counter()
+
+    recorder.finish({
+        'endpoint': endpoint,
+        'latency': finished_at - started_at,
+        'queue_delay': (started_at - scheduled_at) if scheduled_at is not None else 0.0,
+        'status': status,
+        'error': error,
+        'finished_at': finished_at
+    })
+
+
+def choose_endpoint(profile: Dict[str, float], rng: random.Random) -> str:
+    endpoints = list(profile.keys())
+    return rng.choices(endpoints, weights=[profile[e] for e in endpoints])[0]
+
+
+def run_closed_loop(base_url: str, profile: Dict[str, float], concurrency: int, duration: float,
+                    timeout: float, seed: int, recorder: LoadRecorder):
+    """N virtual users, each sending its next request as soon as the last completes"""
+    deadline = time.perf_counter() + duration
+    counter = itertools.count()
+
+    def user(user_id: int):
+        rng = random.Random(seed + user_id)
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            send_request(session, base_url, choose_endpoint(profile, rng), next(counter), recorder, timeout)
+
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run_open_loop(base_url: str, profile: Dict[str, float], rate: float, duration: float,
+                  timeout: float, seed: int, max_workers: int, recorder: LoadRecorder):
+    """Poisson arrivals at a fixed rate; queue_delay records how late each request started"""
+    rng = random.Random(seed)
+    local = threading.local()
+
+    def session() -> requests.Session:
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        return local.session
+
+    start = time.perf_counter()
+    next_arrival = start
+    index = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while next_arrival < start + duration:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            endpoint = choose_endpoint(profile, rng)
+            pool.submit(lambda e=endpoint, i=index, t=next_arrival:
+                        send_request(session(), base_url, e, i, recorder, timeout, scheduled_at=t))
+            index += 1
+            next_arrival += rng.expovariate(rate)
+
+
+def summarize(samples: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    """Throughput, latency percentiles, error rates and queueing per endpoint"""
+    def stats(group: List[Dict[str, Any]]) -> Dict[str, Any]:
+        latencies = sorted(s['latency'] for s in group)
+        queue_delays = sorted(s['queue_delay'] for s in group)
+        errors = [s for s in group if s['error']]
+        error_kinds: Dict[str, int] = {}
+        for sample in errors:
+            error_kinds[sample['error']] = error_kinds.get(sample['error'], 0) + 1
+        return {
+            'requests': len(group),
+            'throughput_rps': len(group) / elapsed if elapsed > 0 else 0.0,
+            'errors': len(errors),
+            'error_rate': len(errors) / len(group) if group else 0.0,
+            'error_kinds': error_kinds,
+            'latency': {
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'max': latencies[-1] if latencies else 0.0,
+                'mean': sum(latencies) / len(latencies) if latencies else 0.0
+            },
+            'queue_delay': {
+                'p50': percentile(queue_delays, 50),
+                'p95': percentile(queue_delays, 95),
+                'max': queue_delays[-1] if queue_delays else 0.0
+            }
+        }
+
+    endpoints = sorted({s['endpoint'] for s in samples})
+    return {
+        'overall': stats(samples),
+        'endpoints': {name: stats([s for s in samples if s['endpoint'] == name]) for name in endpoints}
+    }
+
+
+def start_local_server(llm_ttft: float, llm_tps: float, port: int) -> str:
+    """Boot app.py in-process with replayed data and the fake LLM"""
+    try:
+        import config
+    except ImportError:
+        sys.exit("config.py not found - copy config.py.example to config.py first")
+
+    config.LLM_BACKEND = 'fake'
+    config.FAKE_LLM_TTFT_SECONDS = llm_ttft
+    config.FAKE_LLM_TOKENS_PER_SECOND = llm_tps
+    # Every request should pay for its LLM calls, not replay them from the response cache
+    config.LLM_CACHE_ENABLED = False
+
+    from benchmarks.fixtures import install_replayed_market_data
+    install_replayed_market_data()
+
+    from werkzeug.serving import make_server
+    import app as backend_app
+
+    server = make_server('127.0.0.1', port, backend_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def print_report(report: Dict[str, Any]):
+    def row(name: str, s: Dict[str, Any]) -> str:
+        lat = s['latency']
+        return (f"{name:<16} {s['requests']:>7} {s['throughput_rps']:>8.2f} "
+                f"{lat['p50'] * 1000:>9.1f} {lat['p95'] * 1000:>9.1f} {lat['p99'] * 1000:>9.1f} "
+                f"{s['error_rate']:>7.1%} {s['queue_delay']['p95'] * 1000:>10.1f}")
+
+    print(f"\n{'endpoint':<16} {'reqs':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'errors':>7} {'queue p95':>10}")
+    for name, stats in report['results']['endpoints'].items():
+        print(row(name, stats))
+    print(row('TOTAL', report['results']['overall']))
+    print(f"\nPeak in-flight requests: {report['peak_in_flight']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the financial analysis API")
+    parser.add_argument('--url', default='', help="Target a running server instead of booting app.py in-process")
+    parser.add_argument('--profile', default='mixed', choices=sorted(PROFILES.keys()))
+    parser.add_argument('--duration', type=float, default=30.0, help="Seconds of traffic to generate")
+    parser.add_argument('--concurrency', type=int, default=4, help="Closed-loop virtual users")
+    parser.add_argument('--rate', type=float, default=0.0, help="Open-loop arrival rate (req/s); overrides --concurrency")
+    parser.add_argument('--max-workers', type=int, default=256, help="Client threads for open-loop mode")
+    parser.add_argument('--timeout', type=float, default=300.0, help="Per-request timeout in seconds")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--llm-ttft', type=float, default=0.5, help="Fake LLM time to first token (in-process only)")
+    parser.add_argument('--llm-tps', type=float, default=50.0, help="Fake LLM tokens/sec (in-process only)")
+    parser.add_argument('--port', type=int, default=0, help="Port for the in-process server (0 = any free port)")
+    parser.add_argument('--output', default='', help="Write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        base_url = args.url.rstrip('/')
+    else:
+        logging.disable(logging.WARNING)
+        base_url = start_local_server(args.llm_ttft, args.llm_tps, args.port)
+
+    profile = PROFILES[args.profile]
+    recorder = LoadRecorder()
+    mode = 'open' if args.rate > 0 else 'closed'
+    print(f"Running {args.profile} profile ({mode} loop) against {base_url} for {args.duration:.0f}s...")
+
+    started = time.perf_counter()
+    if mode == 'open':
+        run_open_loop(base_url, profile, args.rate, args.duration, args.timeout, args.seed,
+                      args.max_workers, recorder)
+    else:
+        run_closed_loop(base_url, profile, args.concurrency, args.duration, args.timeout, args.seed, recorder)
+    elapsed = time.perf_counter() - started
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'target': base_url,
+        'profile': args.profile,
+        'mode': mode,
+        'concurrency': args.concurrency if mode == 'closed' else None,
+        'rate': args.rate if mode == 'open' else None,
+        'duration': elapsed,
+        'peak_in_flight': recorder.peak_in_flight,
+        'results': summarize(recorder.samples, elapsed)
+    }
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
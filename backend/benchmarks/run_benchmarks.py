@@ -0,0 +1,301 @@
+"""
+Benchmark suite for the data service and analytics hot paths.
+
+Runs every benchmark against replayed fixtures (see benchmarks/fixtures.py),
+writes the timings to a JSON file and optionally compares them against a
+baseline, failing when any benchmark regresses past the threshold.
+
+Usage (from the backend directory):
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --baseline benchmarks/baseline.json --threshold 0.25
+    python -m benchmarks.run_benchmarks --save-baseline
+    python -m benchmarks.run_benchmarks --filter scrape
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import (
+    BENCHMARK_SYMBOLS, ReplayTicker, replayed_market_data,
+    finviz_html, marketwatch_html, seeking_alpha_html, yahoo_news_html,
+    sec_filings_xml, insider_trading_html
+)
+from services.enhanced_financial_data_service import EnhancedFinancialDataService
+from services.prompt_encoding import encode_snapshot
+from agents.enhanced_analysis_agent import EnhancedAnalysisAgent
+from agents.enhanced_research_agent import EnhancedResearchAgent
+from agents.fake_chat_model import FakeChatModel
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BENCHMARK_DIR, 'results', 'latest.json')
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+DEFAULT_THRESHOLD = 0.25  # 25% slower than baseline counts as a regression
+
+
+def instant_llm() -> FakeChatModel:
+    """Zero-latency fake model for benchmarks that cross an LLM call"""
+    return FakeChatModel(ttft_seconds=0, tokens_per_second=0, jitter="none", output_tokens=200)
+
+
+class Benchmark:
+    """A named, repeatable timing with optional per-round setup"""
+
+    def __init__(self, name: str, func: Callable[[Any], Any], rounds: int,
+                 setup: Optional[Callable[[], Any]] = None):
+        self.name = name
+        self.func = func
+        self.rounds = rounds
+        self.setup = setup
+
+    def run(self, rounds_scale: float = 1.0) -> Dict[str, Any]:
+        rounds = max(1, int(self.rounds * rounds_scale))
+        timings = []
+
+        # One untimed warm-up round so import/JIT-style one-off costs are excluded
+        self.func(self.setup() if self.setup else None)
+
+        for _ in range(rounds):
+            state = self.setup() if self.setup else None
+            start = time.perf_counter()
+            self.func(state)
+            timings.append(time.perf_counter() - start)
+
+        timings.sort()
+        return {
+            'rounds': rounds,
+            'min': timings[0],
+            'max': timings[-1],
+            'mean': statistics.fmean(timings),
+            'median': statistics.median(timings),
+            'p95': timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))],
+            'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0
+        }
+
+
+def build_benchmarks() -> List[Benchmark]:
+    """Define the benchmark catalogue"""
+    symbol = 'AAPL'
+    benchmarks = []
+
+    # get_comprehensive_stock_data: cold (fresh service) and warm (cache hit)
+    benchmarks.append(Benchmark(
+        'data.comprehensive.cold',
+        lambda service: service.get_comprehensive_stock_data(symbol),
+        rounds=10,
+        setup=EnhancedFinancialDataService
+    ))
+
+    warm_service = EnhancedFinancialDataService()
+    benchmarks.append(Benchmark(
+        'data.comprehensive.warm',
+        lambda _: warm_service.get_comprehensive_stock_data(symbol),
+        rounds=2000
+    ))
+
+    # Each _get_* section against a ticker whose info has already been fetched,
+    # as it is inside get_comprehensive_stock_data
+    section_service = EnhancedFinancialDataService()
+
+    def ticker_setup():
+        ticker = ReplayTicker(symbol)
+        ticker.info
+        return ticker
+
+    sections = [
+        ('basic_info', section_service._get_basic_info, 500),
+        ('price_data', section_service._get_price_data, 100),
+        ('financial_statements', section_service._get_financial_statements, 100),
+        ('valuation_metrics', section_service._get_valuation_metrics, 500),
+        ('risk_metrics', section_service._get_risk_metrics, 50),
+        ('analyst_data', section_service._get_analyst_data, 100),
+        ('news_data', section_service._get_news_data, 500),
+        ('peer_comparison', section_service._get_peer_comparison, 500)
+    ]
+    for name, method, rounds in sections:
+        benchmarks.append(Benchmark(f"data.section.{name}", method, rounds=rounds, setup=ticker_setup))
+
+    benchmarks.append(Benchmark(
+        'data.section.market_context',
+        lambda _: section_service._fetch_market_context(),
+        rounds=50
+    ))
+
+    # Scraper parse step on recorded pages
+    parsers = [
+        ('finviz', section_service._parse_finviz_html, finviz_html),
+        ('marketwatch', section_service._parse_marketwatch_html, marketwatch_html),
+        ('seeking_alpha', section_service._parse_seeking_alpha_html, seeking_alpha_html),
+        ('yahoo_news', section_service._parse_yahoo_news_html, yahoo_news_html),
+        ('sec_filings', section_service._parse_sec_filings_xml, sec_filings_xml),
+        ('insider_trading', section_service._parse_insider_trading_html, insider_trading_html)
+    ]
+    for name, parser, page in parsers:
+        content = page(symbol).encode('utf-8')
+        benchmarks.append(Benchmark(
+            f"scrape.parse.{name}",
+            lambda _, parser=parser, content=content: parser(content),
+            rounds=100
+        ))
+
+    benchmarks.append(Benchmark(
+        'data.technical_indicators',
+        lambda _: section_service._fetch_technical_indicators(symbol, '1y'),
+        rounds=100
+    ))
+
+    # Analytics on a fully populated snapshot
+    analysis_agent = EnhancedAnalysisAgent(instant_llm())
+    snapshot = EnhancedFinancialDataService().get_comprehensive_stock_data(symbol)
+    benchmarks.append(Benchmark(
+        'analysis.investment_score',
+        lambda _: analysis_agent._calculate_investment_score(snapshot),
+        rounds=5000
+    ))
+    benchmarks.append(Benchmark(
+        'analysis.risk_assessment',
+        lambda _: analysis_agent._perform_risk_assessment(snapshot),
+        rounds=5000
+    ))
+    benchmarks.append(Benchmark(
+        'prompt.encode_snapshot',
+        lambda _: encode_snapshot(snapshot),
+        rounds=1000
+    ))
+
+    # Rule-based quick analysis: cold (fresh data service) and warm (fundamentals and technicals cached)
+    def quick_agent():
+        return EnhancedResearchAgent(instant_llm())
+
+    benchmarks.append(Benchmark(
+        'analysis.quick_analysis.cold',
+        lambda agent: agent.get_quick_analysis_with_data(symbol),
+        rounds=20,
+        setup=quick_agent
+    ))
+    warm_quick_agent = quick_agent()
+    benchmarks.append(Benchmark(
+        'analysis.quick_analysis.warm',
+        lambda _: warm_quick_agent.get_quick_analysis_with_data(symbol),
+        rounds=2000
+    ))
+
+    # compare_stocks with a cold data cache at increasing basket sizes
+    def comparison_agent():
+        return EnhancedAnalysisAgent(instant_llm())
+
+    for size, rounds in [(2, 10), (10, 5), (50, 3)]:
+        basket = BENCHMARK_SYMBOLS[:size]
+        benchmarks.append(Benchmark(
+            f"analysis.compare_stocks.{size}",
+            lambda agent, basket=basket: agent.compare_stocks(basket),
+            rounds=rounds,
+            setup=comparison_agent
+        ))
+
+    return benchmarks
+
+
+def compare_to_baseline(results: Dict[str, Dict], baseline: Dict[str, Dict],
+                        threshold: float) -> List[Dict[str, Any]]:
+    """Return the benchmarks whose median regressed past the threshold"""
+    regressions = []
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        base_median = baseline[name]['median']
+        if base_median <= 0:
+            continue
+        ratio = stats['median'] / base_median
+        if ratio > 1 + threshold:
+            regressions.append({
+                'benchmark': name,
+                'baseline_median': base_median,
+                'median': stats['median'],
+                'ratio': ratio
+            })
+    return regressions
+
+
+def _format_seconds(value: float) -> str:
+    if value < 1e-3:
+        return f"{value * 1e6:.1f}us"
+    if value < 1:
+        return f"{value * 1e3:.2f}ms"
+    return f"{value:.3f}s"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the backend benchmark suite on replayed fixtures")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Where to write the JSON results")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline results to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed relative slowdown of the median before failing (0.25 = 25%%)")
+    parser.add_argument('--save-baseline', action='store_true', help="Also write the results as the new baseline")
+    parser.add_argument('--filter', default='', help="Only run benchmarks whose name contains this string")
+    parser.add_argument('--rounds-scale', type=float, default=1.0, help="Multiply every benchmark's round count")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.CRITICAL)  # The data service logs every fetch
+
+    results = {}
+    with replayed_market_data():
+        for benchmark in build_benchmarks():
+            if args.filter and args.filter not in benchmark.name:
+                continue
+            # Agents print progress lines; keep the benchmark output readable
+            with contextlib.redirect_stdout(io.StringIO()):
+                stats = benchmark.run(args.rounds_scale)
+            results[benchmark.name] = stats
+            print(f"{benchmark.name:<40} median {_format_seconds(stats['median']):>10}  "
+                  f"p95 {_format_seconds(stats['p95']):>10}  ({stats['rounds']} rounds)")
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'benchmarks': results
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found - skipping regression check")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f).get('benchmarks', {})
+
+    regressions = compare_to_baseline(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed more than {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression['benchmark']}: {_format_seconds(regression['baseline_median'])} -> "
+                  f"{_format_seconds(regression['median'])} ({regression['ratio']:.2f}x)")
+        return 1
+
+    print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Cold-start time of the API server.
+
+Each run starts a fresh interpreter that imports app (building the
+orchestrator, agents and data service) and serves a first GET /api/health
+through the Flask test client, and reports how long importing and the first
+response took. Startup must not touch the network or import the heavy
+libraries (LangChain agents, yfinance, pandas) that are only needed once a
+request actually uses them; the run fails if the median time to the first
+response exceeds the target or any of those modules was already loaded.
+
+Usage (from the backend directory):
+    python -m benchmarks.startup_bench
+    python -m benchmarks.startup_bench --runs 10 --backend openai --top 15 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that startup is expected to defer until first use
+DEFERRED_MODULES = ('langchain.agents', 'langchain_openai', 'yfinance', 'pandas', 'numpy')
+
+_CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import config
+config.LLM_BACKEND = {backend!r}
+import app
+imported = time.perf_counter() - start
+response = app.app.test_client().get('/api/health')
+ready = time.perf_counter() - start
+print(json.dumps({{'import': imported, 'ready': ready, 'status': response.status_code,
+                  'loaded': [name for name in {deferred!r} if name in sys.modules]}}))
+"""
+
+
+def run_once(backend: str, importtime: bool = False) -> Dict[str, Any]:
+    """Start one interpreter, returning its timings (and -X importtime output when asked)"""
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + \
+        ['-c', _CHILD.format(backend=backend, deferred=DEFERRED_MODULES)]
+    completed = subprocess.run(command, cwd=BACKEND_DIR, capture_output=True, text=True, timeout=120)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Startup failed:\n{completed.stderr[-2000:]}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    if importtime:
+        result['importtime'] = completed.stderr
+    return result
+
+
+def slowest_imports(importtime: str, top: int) -> List[Dict[str, Any]]:
+    """Top-level imports (as imported by app and its modules) by cumulative time"""
+    rows = []
+    for line in importtime.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace('import time:', '|').split('|')]
+        rows.append({'module': name, 'self_ms': int(self_us) / 1000, 'cumulative_ms': int(cumulative_us) / 1000})
+    rows = [row for row in rows if row['module'] != 'app']
+    return sorted(rows, key=lambda row: row['cumulative_ms'], reverse=True)[:top]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to start')
+    parser.add_argument('--backend', choices=('fake', 'openai'), default='fake', help='LLM_BACKEND to start with')
+    parser.add_argument('--target', type=float, default=1.0, help='Median seconds to the first response')
+    parser.add_argument('--top', type=int, default=10, help='Slowest imports to list (0 to skip)')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    runs = [run_once(args.backend) for _ in range(args.runs)]
+    imports = [run['import'] for run in runs]
+    ready = [run['ready'] for run in runs]
+    loaded = sorted({name for run in runs for name in run['loaded']})
+    results = {
+        'backend': args.backend,
+        'runs': args.runs,
+        'import': {'median': statistics.median(imports), 'max': max(imports)},
+        'ready': {'median': statistics.median(ready), 'max': max(ready)},
+        'target': args.target,
+        'deferred_modules_loaded': loaded
+    }
+
+    print(f"\n{'phase':<22} {'median':>8} {'max':>8}")
+    print(f"{'import app':<22} {results['import']['median']:>8.3f} {results['import']['max']:>8.3f}")
+    print(f"{'first /api/health':<22} {results['ready']['median']:>8.3f} {results['ready']['max']:>8.3f}")
+
+    if args.top:
+        results['slowest_imports'] = slowest_imports(run_once(args.backend, importtime=True)['importtime'], args.top)
+        print(f"\n{'module':<50} {'cumulative ms':>14}")
+        for row in results['slowest_imports']:
+            print(f"{row['module']:<50} {row['cumulative_ms']:>14.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    failed = False
+    if loaded:
+        print(f"\nFAIL: loaded at startup: {', '.join(loaded)}")
+        failed = True
+    if results['ready']['median'] > args.target:
+        print(f"\nFAIL: median time to first response {results['ready']['median']:.3f}s exceeds {args.target:.1f}s")
+        failed = True
+    if not failed:
+        print(f"\nOK: ready in {results['ready']['median']:.3f}s (target {args.target:.1f}s)")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
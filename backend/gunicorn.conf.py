@@ -0,0 +1,33 @@
+"""
+gunicorn settings for the API server (values come from config.py).
+
+The app is imported once in the master process (preload_app) and the workers
+are forked from it, so they start at once and share the imported code's
+memory pages. Startup opens no network connections and starts no threads that
+workers need: the LLM scheduler, trace exporter, prefetch pool and cache
+connections are created per process on first use, and the memory log restarts
+in each worker. Use CACHE_BACKEND = "sqlite" so the workers share one market
+data cache, run store, report section store, trace and profile store and the
+metrics served by /api/metrics (each worker publishes its own; see
+services/metrics.py).
+"""
+import logging
+import multiprocessing
+
+# Not imported as "config": gunicorn reads every module-level name here as a setting
+import config as app_config
+
+bind = getattr(app_config, 'SERVER_BIND', '0.0.0.0:5000')
+workers = getattr(app_config, 'SERVER_WORKERS', 0) or multiprocessing.cpu_count()
+worker_class = 'gthread'
+threads = getattr(app_config, 'SERVER_THREADS', 8)
+timeout = getattr(app_config, 'SERVER_TIMEOUT_SECONDS', 300)
+preload_app = True
+accesslog = '-'
+
+
+def on_starting(server):
+    if workers > 1 and getattr(app_config, 'CACHE_BACKEND', 'memory') != 'sqlite':
+        logging.getLogger('gunicorn.error').warning(
+            'CACHE_BACKEND is "memory": each of the %d workers keeps its own caches, runs, traces and metrics; '
+            'set CACHE_BACKEND = "sqlite" to share them', workers)
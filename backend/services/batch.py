@@ -0,0 +1,56 @@
+"""
+Bounded-concurrency batch execution.
+
+run() applies work to every item of a batch (e.g. every symbol of a
+watchlist) on its own pool of `concurrency` threads and yields each item's
+outcome as soon as it finishes, in completion order. An item that raises is
+reported as a failure and the rest carry on. LLM calls made by batch work run
+at background priority, so interactive requests are served ahead of them.
+Closing the generator (e.g. when the client disconnects) cancels the items
+that have not started yet.
+"""
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, Sequence
+
+from .llm_scheduler import PRIORITY_BACKGROUND, llm_priority
+from .metrics import BATCH_ITEMS, BATCH_ITEM_SECONDS
+from .tracing import propagate, span
+
+logger = logging.getLogger(__name__)
+
+
+def run(items: Sequence[Any], work: Callable[[Any], Any], concurrency: int,
+        kind: str = 'batch') -> Iterator[Dict[str, Any]]:
+    """
+    Yield {'index', 'item', 'success', 'result' | 'error', 'seconds'} for each item as it finishes.
+    kind labels the metrics and spans (e.g. 'analyze_full').
+    """
+    def one(index: int, item: Any) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            with span(f'batch.{kind}', item=str(item)), llm_priority(PRIORITY_BACKGROUND):
+                outcome = {'success': True, 'result': work(item)}
+        except Exception as e:
+            logger.warning(f"Batch {kind} failed for {item}: {str(e)}")
+            outcome = {'success': False, 'error': str(e)}
+        seconds = time.perf_counter() - start
+        BATCH_ITEMS.inc(kind=kind, outcome='success' if outcome['success'] else 'error')
+        BATCH_ITEM_SECONDS.observe(seconds, kind=kind)
+        return dict(outcome, index=index, item=item, seconds=seconds)
+
+    pool = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix=f'batch-{kind}')
+    pending = set()
+    try:
+        # Bounded by the pool; items queue in order and start as workers free up
+        pending = {pool.submit(propagate(one), index, item) for index, item in enumerate(items)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        if pending:
+            cancelled = sum(future.cancel() for future in pending)
+            logger.info(f"Batch {kind} closed early - {cancelled} items not started")
+        pool.shutdown(wait=False)
@@ -0,0 +1,337 @@
+"""
+Scheduled cache warming for a watchlist.
+
+Traffic peaks at predictable times (around the market open and close) and most
+of it asks about the same few dozen symbols. The cache warmer fetches their
+data shortly before those times, so the first requests of the peak are served
+from the data cache instead of waiting on Yahoo Finance and the scrapers:
+
+- the market context (index history), once per run
+- per symbol, in watchlist order: the technical indicators (a year of price
+  history), the web scrape, the comprehensive snapshot (which reuses both)
+  and, with WARM_QUICK_ASSESSMENT, the fundamentals that the rule-based quick
+  analysis scores together with the technical indicators
+
+A run counts the upstream requests its fetches really make (each Yahoo Finance
+call and scraped page attempt, see counting_upstream_calls) and starts no
+further section once it has made WARM_MAX_UPSTREAM_CALLS. Sections already in
+flight finish, so a run can exceed the budget by what those sections request.
+Symbols early in the watchlist take priority and the rest are reported as
+over budget. Runs start
+WARM_LEAD_SECONDS before each time in WARM_TIMES (in WARM_TIMEZONE, on
+weekdays only by default); DATA_CACHE_TTL_SECONDS has to be longer than the
+lead or the entries expire before the load arrives. With several worker
+processes and the sqlite cache backend one worker runs each scheduled warm-up
+and the others read its entries. coverage() reports what is warm right now.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, tzinfo
+from typing import Any, Dict, Optional, Sequence
+
+from . import shared_cache
+from .enhanced_financial_data_service import counting_upstream_calls
+from .metrics import CACHE_WARM_COVERAGE, CACHE_WARM_ITEMS
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Sections warmed for each symbol, in order: (name, data cache key, data service method)
+SYMBOL_SECTIONS = (
+    ('technical', 'technical_1y_{symbol}', 'get_technical_indicators'),
+    ('web_data', 'web_data_{symbol}', 'get_enhanced_web_data'),
+    ('snapshot', 'comprehensive_{symbol}', 'get_comprehensive_stock_data'),
+    ('fundamentals', 'fundamentals_{symbol}', 'get_stock_fundamentals')
+)
+MARKET_CONTEXT = ('market_context', 'market_context_indices', 'get_market_context')
+
+_settings = {
+    'enabled': False,
+    'watchlist': [],
+    'times': ['09:30', '16:00'],
+    'timezone': 'America/New_York',
+    'weekdays_only': True,
+    'lead_seconds': 180,
+    'max_upstream_calls': 300,
+    'concurrency': 4,
+    'quick_assessment': True
+}
+
+_data_service = None
+_store = None
+_zone: Optional[tzinfo] = None
+_run_lock = threading.Lock()
+_scheduler_thread: Optional[threading.Thread] = None
+
+
+def configure(data_service, enabled: bool = False, watchlist: Sequence[str] = (),
+              times: Sequence[str] = ('09:30', '16:00'), timezone: str = 'America/New_York',
+              weekdays_only: bool = True, lead_seconds: float = 180, max_upstream_calls: int = 300,
+              concurrency: int = 4, quick_assessment: bool = True):
+    """Apply cache warming settings (called once at startup from config.py values) and start the schedule"""
+    global _data_service, _store, _zone
+    for value in times:
+        _parse_time(value)
+    symbols = []
+    for symbol in watchlist:
+        symbol = symbol.strip().upper()
+        if symbol and symbol not in symbols:
+            symbols.append(symbol)
+    _settings.update(enabled=enabled, watchlist=symbols, times=list(times), timezone=timezone,
+                     weekdays_only=weekdays_only, lead_seconds=max(0, lead_seconds),
+                     max_upstream_calls=max(0, max_upstream_calls), concurrency=max(1, concurrency),
+                     quick_assessment=quick_assessment)
+    _data_service = data_service
+    _store = shared_cache.create('cache_warmer')
+    _zone = _load_zone(timezone)
+
+    if enabled and symbols:
+        if lead_seconds >= data_service.cache_expiry:
+            logger.warning(f"WARM_LEAD_SECONDS ({lead_seconds}) is not below DATA_CACHE_TTL_SECONDS "
+                           f"({data_service.cache_expiry}): warmed data expires before the expected load")
+        if _scheduler_thread is None:
+            _start_scheduler()
+
+
+def _parse_time(value: str):
+    """'HH:MM' -> (hour, minute)"""
+    try:
+        hour, minute = (int(part) for part in value.split(':'))
+    except ValueError:
+        raise ValueError(f"Invalid WARM_TIMES entry '{value}' (expected HH:MM)")
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"Invalid WARM_TIMES entry '{value}' (expected HH:MM)")
+    return hour, minute
+
+
+def _load_zone(name: str) -> Optional[tzinfo]:
+    """The WARM_TIMEZONE zone, or None (local time) when it is unknown to this system"""
+    try:
+        from zoneinfo import ZoneInfo
+        return ZoneInfo(name)
+    except Exception as e:
+        logger.warning(f"Unknown WARM_TIMEZONE '{name}', using local time: {str(e)}")
+        return None
+
+
+def next_run(now: Optional[datetime] = None) -> Optional[datetime]:
+    """When the next scheduled warm-up starts (the lead before the next expected load time)"""
+    if not _settings['times']:
+        return None
+    zone = _zone
+    now = now or datetime.now(zone)
+    lead = timedelta(seconds=_settings['lead_seconds'])
+    candidates = []
+    for days in range(8):
+        day = (now + timedelta(days=days)).date()
+        if _settings['weekdays_only'] and day.weekday() >= 5:
+            continue
+        for value in _settings['times']:
+            hour, minute = _parse_time(value)
+            load_at = datetime(day.year, day.month, day.day, hour, minute, tzinfo=zone)
+            if load_at - lead > now:
+                candidates.append(load_at - lead)
+    return min(candidates) if candidates else None
+
+
+def _sections():
+    return [section for section in SYMBOL_SECTIONS
+            if section[0] != 'fundamentals' or _settings['quick_assessment']]
+
+
+class _Run:
+    """Budget and outcome tally of one warm-up run (shared by its worker threads)"""
+
+    def __init__(self, trigger: str):
+        self.lock = threading.Lock()
+        self.upstream_calls = 0
+        self.report: Dict[str, Any] = {
+            'trigger': trigger,
+            'pid': os.getpid(),
+            'started_at': datetime.now().isoformat(),
+            'budget': _settings['max_upstream_calls'],
+            'upstream_calls_by_kind': {},
+            'sections': {},
+            'over_budget_symbols': [],
+            'failed': []
+        }
+
+    def within_budget(self) -> bool:
+        """Whether another section may start: the upstream requests so far are below the budget"""
+        with self.lock:
+            return self.upstream_calls < _settings['max_upstream_calls']
+
+    def count_upstream_call(self, name: str):
+        with self.lock:
+            self.upstream_calls += 1
+            by_kind = self.report['upstream_calls_by_kind']
+            by_kind[name] = by_kind.get(name, 0) + 1
+
+    def record(self, section: str, symbol: Optional[str], outcome: str):
+        CACHE_WARM_ITEMS.inc(item=section, outcome=outcome)
+        with self.lock:
+            counts = self.report['sections'].setdefault(section, {})
+            counts[outcome] = counts.get(outcome, 0) + 1
+            if outcome == 'over_budget' and symbol and symbol not in self.report['over_budget_symbols']:
+                self.report['over_budget_symbols'].append(symbol)
+            elif outcome == 'failed':
+                self.report['failed'].append({'section': section, 'symbol': symbol})
+
+    def warm(self, section, symbol: Optional[str] = None):
+        name, key_format, method = section
+        if _data_service.is_cached(key_format.format(symbol=symbol)):
+            self.record(name, symbol, 'already_warm')
+            return
+        if not self.within_budget():
+            self.record(name, symbol, 'over_budget')
+            return
+        try:
+            with counting_upstream_calls(self.count_upstream_call), span(f'cache_warm.{name}', symbol=symbol or ''):
+                args = (symbol,) if symbol else ()
+                result = getattr(_data_service, method)(*args)
+            outcome = 'failed' if not result or 'error' in result else 'warmed'
+        except Exception as e:
+            logger.warning(f"Cache warming of {name} for {symbol or 'market'} failed: {str(e)}")
+            outcome = 'failed'
+        self.record(name, symbol, outcome)
+
+
+def run_once(trigger: str = 'manual') -> Optional[Dict[str, Any]]:
+    """Warm the watchlist now and return the run report; None if a run is already in progress"""
+    if not _run_lock.acquire(blocking=False):
+        return None
+    try:
+        return _run(trigger)
+    finally:
+        _run_lock.release()
+
+
+def start(trigger: str = 'manual') -> bool:
+    """Start a run in the background; False if a run is already in progress"""
+    if not _run_lock.acquire(blocking=False):
+        return False
+
+    def run():
+        try:
+            _run(trigger)
+        except Exception as e:
+            logger.error(f"Cache warming failed: {str(e)}")
+        finally:
+            _run_lock.release()
+
+    threading.Thread(target=run, name='cache-warmer-run', daemon=True).start()
+    return True
+
+
+def _run(trigger: str) -> Dict[str, Any]:
+    start_time = time.perf_counter()
+    run = _Run(trigger)
+    sections = _sections()
+    logger.info(f"Warming caches for {len(_settings['watchlist'])} symbols "
+                f"(budget {_settings['max_upstream_calls']} upstream requests, trigger {trigger})")
+
+    def warm_symbol(symbol: str):
+        for section in sections:
+            run.warm(section, symbol)
+
+    with span('cache_warm.run', trigger=trigger):
+        run.warm(MARKET_CONTEXT)
+        # Symbols start in watchlist order, so the budget goes to the earliest ones first
+        with ThreadPoolExecutor(max_workers=_settings['concurrency'], thread_name_prefix='cache-warmer') as pool:
+            list(pool.map(warm_symbol, _settings['watchlist']))
+
+    report = run.report
+    report.update(finished_at=datetime.now().isoformat(), seconds=round(time.perf_counter() - start_time, 3),
+                  upstream_calls=run.upstream_calls, coverage=coverage()['overall'])
+    _store.set('last_run', report)
+    logger.info(f"Cache warming done in {report['seconds']:.1f}s: {run.upstream_calls} upstream requests, "
+                f"coverage {report['coverage']:.0%}, {len(report['over_budget_symbols'])} symbols over budget")
+    return report
+
+
+def coverage() -> Dict[str, Any]:
+    """Share of watchlist sections currently warm in the data cache, per section and overall"""
+    watchlist = _settings['watchlist']
+    if _data_service is None or not watchlist:
+        return {'symbols': 0, 'sections': {}, 'overall': 0.0, 'cold_symbols': []}
+    sections = {}
+    warm_total = 0
+    warm_by_symbol = {symbol: True for symbol in watchlist}
+    for name, key_format, _ in _sections():
+        warm = 0
+        for symbol in watchlist:
+            if _data_service.is_cached(key_format.format(symbol=symbol)):
+                warm += 1
+            else:
+                warm_by_symbol[symbol] = False
+        sections[name] = {'warm': warm, 'total': len(watchlist), 'ratio': warm / len(watchlist)}
+        CACHE_WARM_COVERAGE.set(sections[name]['ratio'], item=name)
+        warm_total += warm
+    market_warm = _data_service.is_cached(MARKET_CONTEXT[1])
+    CACHE_WARM_COVERAGE.set(1.0 if market_warm else 0.0, item=MARKET_CONTEXT[0])
+    cold_symbols = [symbol for symbol, warm in warm_by_symbol.items() if not warm]
+    return {
+        'symbols': len(watchlist),
+        'market_context': market_warm,
+        'sections': sections,
+        'overall': warm_total / (len(watchlist) * len(sections)),
+        'cold_symbols': cold_symbols
+    }
+
+
+def stats() -> Dict[str, Any]:
+    """Settings, next scheduled run, last run report (from any worker process) and current coverage"""
+    upcoming = next_run() if _settings['enabled'] else None
+    return {
+        'enabled': _settings['enabled'],
+        'watchlist': _settings['watchlist'],
+        'times': _settings['times'],
+        'timezone': _settings['timezone'],
+        'weekdays_only': _settings['weekdays_only'],
+        'lead_seconds': _settings['lead_seconds'],
+        'max_upstream_calls': _settings['max_upstream_calls'],
+        'quick_assessment': _settings['quick_assessment'],
+        'data_cache_ttl_seconds': _data_service.cache_expiry if _data_service is not None else None,
+        'running': _run_lock.locked(),
+        'next_run': upcoming.isoformat() if upcoming else None,
+        'last_run': _store.get('last_run') if _store is not None else None,
+        'coverage': coverage()
+    }
+
+
+def _start_scheduler():
+    global _scheduler_thread
+
+    def run():
+        while True:
+            due = next_run()
+            if due is None:
+                return
+            # Sleep in short steps, so clock changes and suspends do not push the run late
+            remaining = (due - datetime.now(due.tzinfo)).total_seconds()
+            while remaining > 0:
+                time.sleep(min(remaining, 60))
+                remaining = (due - datetime.now(due.tzinfo)).total_seconds()
+            # Worker processes wake up together; the one that claims this slot runs it
+            if _store.claim(f"scheduled_{due.isoformat()}"):
+                try:
+                    run_once(trigger='schedule')
+                except Exception as e:
+                    logger.error(f"Scheduled cache warming failed: {str(e)}")
+
+    _scheduler_thread = threading.Thread(target=run, name='cache-warmer', daemon=True)
+    _scheduler_thread.start()
+
+
+def _restart_scheduler_after_fork():
+    """Threads and held locks do not survive fork: a forked worker gets its own schedule"""
+    global _run_lock
+    _run_lock = threading.Lock()
+    if _scheduler_thread is not None:
+        _start_scheduler()
+
+
+os.register_at_fork(after_in_child=_restart_scheduler_after_fork)
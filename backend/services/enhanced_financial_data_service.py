@@ -1,16 +1,52 @@
-import yfinance as yf
-import pandas as pd
-import numpy as np
 import requests
 from bs4 import BeautifulSoup
+import contextvars
 import json
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 import time
 import logging
-from typing import Dict, List, Optional, Any
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple, Any
 import warnings
+from . import shared_cache
+from .metrics import CACHE_REQUESTS, DATA_SECTION_SECONDS, SCRAPER_RESULTS, SCRAPER_SECONDS
+from .tracing import span
+from .lazy_imports import lazy_module
+
+# Imported on first use: together they account for most of the server's import time
+yf = lazy_module('yfinance')
+pd = lazy_module('pandas')
+np = lazy_module('numpy')
+
 warnings.filterwarnings('ignore')
 
+# Listener for the upstream requests made in the calling context (see counting_upstream_calls)
+_upstream_listener: contextvars.ContextVar = contextvars.ContextVar('upstream_call_listener', default=None)
+
+
+@contextmanager
+def counting_upstream_calls(listener: Callable[[str], None]):
+    """
+    Call listener(name) for every upstream request made inside the block: each Yahoo Finance
+    call (yfinance.*) and each scraped page attempt (http.get), including requests made by
+    threads the block hands work to through tracing.propagate
+    """
+    token = _upstream_listener.set(listener)
+    try:
+        yield
+    finally:
+        _upstream_listener.reset(token)
+
+
+def _upstream(name: str, **attributes):
+    """Span of one upstream request, reported to the calling context's listener"""
+    listener = _upstream_listener.get()
+    if listener is not None:
+        listener(name)
+    return span(name, **attributes)
+
 class EnhancedFinancialDataService:
     """
     Enhanced financial data service using only free data sources:
@@ -20,15 +56,19 @@ class EnhancedFinancialDataService:
     - FRED for economic indicators
     """
     
-    def __init__(self):
+    def __init__(self, cache_expiry: float = 300):
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
         
-        # Cache for data to avoid repeated API calls
-        self.cache = {}
-        self.cache_expiry = 300  # 5 minutes
+        # Cache for data to avoid repeated API calls (shared by worker processes with CACHE_BACKEND = "sqlite")
+        self.cache_expiry = cache_expiry  # seconds (DATA_CACHE_TTL_SECONDS, 5 minutes by default)
+        self.cache = shared_cache.create('market_data', ttl_seconds=self.cache_expiry)
+        
+        # Fetches in progress, so concurrent requests for the same data share one fetch
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
         
         # Web scraping configurations
         self.scraping_delay = 1  # Delay between requests to be respectful
@@ -37,30 +77,88 @@ class EnhancedFinancialDataService:
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
     
+    @staticmethod
+    def parse_cache_key(key: str) -> Tuple[str, Optional[str]]:
+        """(entry type, symbol) of a cache key; the symbol is None for data shared by all symbols"""
+        if key == 'market_context_indices':
+            return 'market_context', None
+        if key.startswith('technical_'):
+            # technical_<period>_<SYMBOL>
+            return 'technical', key.rsplit('_', 1)[1]
+        for entry_type in ('comprehensive', 'fundamentals', 'web_data'):
+            if key.startswith(entry_type + '_'):
+                return entry_type, key[len(entry_type) + 1:]
+        return 'other', None
+    
     def _get_cached_data(self, key: str) -> Optional[Dict]:
         """Get cached data if still valid"""
-        if key in self.cache:
-            data, timestamp = self.cache[key]
+        cache_name = key.rsplit('_', 1)[0]
+        entry = self.cache.get(key)
+        if entry is not None:
+            data, timestamp = entry
             if time.time() - timestamp < self.cache_expiry:
+                CACHE_REQUESTS.inc(cache=cache_name, result='hit')
                 return data
+        CACHE_REQUESTS.inc(cache=cache_name, result='miss')
         return None
     
+    def is_cached(self, key: str) -> bool:
+        """Whether key holds valid cached data (a pure lookup: not counted as a cache hit or miss)"""
+        entry = self.cache.get(key)
+        return entry is not None and time.time() - entry[1] < self.cache_expiry
+    
     def _cache_data(self, key: str, data: Dict):
         """Cache data with timestamp"""
-        self.cache[key] = (data, time.time())
+        self.cache.set(key, (data, time.time()))
+    
+    def _single_flight(self, key: str, fetch: Callable[[], Any]) -> Any:
+        """Run fetch for key unless a fetch for the same key is already running, in which case wait for its result"""
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            CACHE_REQUESTS.inc(cache=key.rsplit('_', 1)[0], result='joined')
+            return future.result()
+        try:
+            result = self._fetch_once_across_processes(key, fetch)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+    
+    def _fetch_once_across_processes(self, key: str, fetch: Callable[[], Any]) -> Any:
+        """With a shared cache, let one worker process fetch key while the others wait for its cached result"""
+        if self.cache.claim(key):
+            try:
+                return fetch()
+            finally:
+                self.cache.release(key)
+        CACHE_REQUESTS.inc(cache=key.rsplit('_', 1)[0], result='joined_process')
+        self.cache.wait_released(key, timeout=shared_cache.lease_seconds())
+        cached_data = self._get_cached_data(key)
+        return cached_data if cached_data else fetch()
     
     def get_comprehensive_stock_data(self, symbol: str) -> Dict[str, Any]:
         """
         Get comprehensive stock data from multiple free sources
         """
+        symbol = symbol.upper()
+        # Check cache first
+        cache_key = f"comprehensive_{symbol}"
+        cached_data = self._get_cached_data(cache_key)
+        if cached_data:
+            return cached_data
+        return self._single_flight(cache_key, lambda: self._fetch_comprehensive_stock_data(symbol))
+    
+    def _fetch_comprehensive_stock_data(self, symbol: str) -> Dict[str, Any]:
         try:
-            # Check cache first
             cache_key = f"comprehensive_{symbol}"
-            cached_data = self._get_cached_data(cache_key)
-            if cached_data:
-                return cached_data
-            
-            symbol = symbol.upper()
             self.logger.info(f"Fetching comprehensive data for {symbol}")
             
             # Get Yahoo Finance data
@@ -68,7 +166,8 @@ class EnhancedFinancialDataService:
             
             # Validate that the ticker exists by checking basic info
             try:
-                info = ticker.info
+                with DATA_SECTION_SECONDS.time(section='ticker_info'), _upstream('yfinance.info', symbol=symbol):
+                    info = ticker.info
                 if not info or not any(key in info for key in ['symbol', 'shortName', 'longName', 'regularMarketPrice']):
                     return {"error": f"Invalid or non-existent stock symbol: {symbol}. Please verify the ticker symbol."}
             except Exception as e:
@@ -78,17 +177,17 @@ class EnhancedFinancialDataService:
             result = {
                 'symbol': symbol,
                 'data_timestamp': datetime.now().isoformat(),
-                'basic_info': self._get_basic_info(ticker),
-                'price_data': self._get_price_data(ticker),
-                'financial_statements': self._get_financial_statements(ticker),
-                'valuation_metrics': self._get_valuation_metrics(ticker),
-                'risk_metrics': self._get_risk_metrics(ticker),
-                'analyst_data': self._get_analyst_data(ticker),
-                'news_data': self._get_news_data(ticker),
-                'peer_comparison': self._get_peer_comparison(ticker),
-                'market_data': self._get_market_context(),
-                'web_scraped_data': self.get_enhanced_web_data(symbol),
-                'technical_indicators': self.get_technical_indicators(symbol)
+                'basic_info': self._timed_section('basic_info', self._get_basic_info, ticker),
+                'price_data': self._timed_section('price_data', self._get_price_data, ticker),
+                'financial_statements': self._timed_section('financial_statements', self._get_financial_statements, ticker),
+                'valuation_metrics': self._timed_section('valuation_metrics', self._get_valuation_metrics, ticker),
+                'risk_metrics': self._timed_section('risk_metrics', self._get_risk_metrics, ticker),
+                'analyst_data': self._timed_section('analyst_data', self._get_analyst_data, ticker),
+                'news_data': self._timed_section('news_data', self._get_news_data, ticker),
+                'peer_comparison': self._timed_section('peer_comparison', self._get_peer_comparison, ticker),
+                'market_data': self._timed_section('market_data', self.get_market_context),
+                'web_scraped_data': self._timed_section('web_scraped_data', self.get_enhanced_web_data, symbol),
+                'technical_indicators': self._timed_section('technical_indicators', self.get_technical_indicators, symbol)
             }
             
             # Validate that we got meaningful data
@@ -108,6 +207,11 @@ class EnhancedFinancialDataService:
             self.logger.error(f"Error fetching data for {symbol}: {str(e)}")
             return {"error": f"Failed to fetch data for {symbol}: {str(e)}. Please verify the symbol is correct and active."}
     
+    def _timed_section(self, section: str, fetch, *args) -> Dict[str, Any]:
+        """Run one data section, recording its latency and a trace span"""
+        with DATA_SECTION_SECONDS.time(section=section), span(f'data.{section}'):
+            return fetch(*args)
+    
     def _get_basic_info(self, ticker) -> Dict[str, Any]:
         """Get basic company information"""
         try:
@@ -132,7 +236,8 @@ class EnhancedFinancialDataService:
         """Get comprehensive price and performance data"""
         try:
             info = ticker.info
-            hist = ticker.history(period="2y")
+            with _upstream('yfinance.history', symbol=ticker.ticker, period='2y'):
+                hist = ticker.history(period="2y")
             
             if hist.empty:
                 return {}
@@ -185,9 +290,12 @@ class EnhancedFinancialDataService:
         """Get financial statement data"""
         try:
             # Get financial data
-            financials = ticker.financials
-            balance_sheet = ticker.balance_sheet
-            cash_flow = ticker.cashflow
+            with _upstream('yfinance.financials', symbol=ticker.ticker):
+                financials = ticker.financials
+            with _upstream('yfinance.balance_sheet', symbol=ticker.ticker):
+                balance_sheet = ticker.balance_sheet
+            with _upstream('yfinance.cashflow', symbol=ticker.ticker):
+                cash_flow = ticker.cashflow
             
             result = {}
             
@@ -281,7 +389,8 @@ class EnhancedFinancialDataService:
         """Calculate risk metrics"""
         try:
             info = ticker.info
-            hist = ticker.history(period="2y")
+            with _upstream('yfinance.history', symbol=ticker.ticker, period='2y'):
+                hist = ticker.history(period="2y")
             
             if hist.empty:
                 return {}
@@ -290,7 +399,8 @@ class EnhancedFinancialDataService:
             daily_returns = hist['Close'].pct_change().dropna()
             
             # Beta calculation (vs S&P 500)
-            spy_data = yf.download("^GSPC", period="2y", progress=False)
+            with _upstream('yfinance.download', symbol='^GSPC', period='2y'):
+                spy_data = yf.download("^GSPC", period="2y", progress=False)
             if not spy_data.empty:
                 spy_returns = spy_data['Close'].pct_change().dropna()
                 
@@ -338,7 +448,8 @@ class EnhancedFinancialDataService:
     def _get_analyst_data(self, ticker) -> Dict[str, Any]:
         """Get analyst recommendations and estimates"""
         try:
-            recommendations = ticker.recommendations
+            with _upstream('yfinance.recommendations', symbol=ticker.ticker):
+                recommendations = ticker.recommendations
             if recommendations is not None and not recommendations.empty:
                 latest_recs = recommendations.tail(10)  # Last 10 recommendations
                 
@@ -360,7 +471,8 @@ class EnhancedFinancialDataService:
     def _get_news_data(self, ticker) -> Dict[str, Any]:
         """Get recent news data"""
         try:
-            news = ticker.news
+            with _upstream('yfinance.news', symbol=ticker.ticker):
+                news = ticker.news
             if news:
                 recent_news = []
                 for article in news[:5]:  # Top 5 news items
@@ -418,8 +530,15 @@ class EnhancedFinancialDataService:
             self.logger.error(f"Error getting peer comparison: {str(e)}")
             return {}
     
-    def _get_market_context(self) -> Dict[str, Any]:
-        """Get broader market context"""
+    def get_market_context(self) -> Dict[str, Any]:
+        """Get broader market context (the same for every symbol, so cached once for all of them)"""
+        cache_key = "market_context_indices"
+        cached_data = self._get_cached_data(cache_key)
+        if cached_data:
+            return cached_data
+        return self._single_flight(cache_key, self._fetch_market_context)
+    
+    def _fetch_market_context(self) -> Dict[str, Any]:
         try:
             # Get major indices
             indices = {
@@ -434,7 +553,8 @@ class EnhancedFinancialDataService:
             for symbol, name in indices.items():
                 try:
                     ticker = yf.Ticker(symbol)
-                    hist = ticker.history(period="1y")
+                    with _upstream('yfinance.history', symbol=symbol, period='1y'):
+                        hist = ticker.history(period="1y")
                     
                     if not hist.empty:
                         current_price = hist['Close'].iloc[-1]
@@ -454,6 +574,8 @@ class EnhancedFinancialDataService:
                     self.logger.error(f"Error getting data for {symbol}: {str(idx_error)}")
                     continue
             
+            if market_data:
+                self._cache_data("market_context_indices", market_data)
             return market_data
             
         except Exception as e:
@@ -462,11 +584,20 @@ class EnhancedFinancialDataService:
     
     def get_stock_fundamentals(self, symbol: str) -> Dict[str, Any]:
         """Get focused fundamental analysis data"""
+        symbol = symbol.upper()
+        cache_key = f"fundamentals_{symbol}"
+        cached_data = self._get_cached_data(cache_key)
+        if cached_data:
+            return cached_data
+        return self._single_flight(cache_key, lambda: self._fetch_stock_fundamentals(symbol))
+    
+    def _fetch_stock_fundamentals(self, symbol: str) -> Dict[str, Any]:
         try:
             ticker = yf.Ticker(symbol)
-            info = ticker.info
+            with _upstream('yfinance.info', symbol=symbol):
+                info = ticker.info
             
-            return {
+            fundamentals = {
                 'pe_ratio': info.get('trailingPE', 0),
                 'forward_pe': info.get('forwardPE', 0),
                 'price_to_book': info.get('priceToBook', 0),
@@ -477,15 +608,26 @@ class EnhancedFinancialDataService:
                 'profit_margin': info.get('profitMargins', 0) * 100 if info.get('profitMargins') else 0,
                 'operating_margin': info.get('operatingMargins', 0) * 100 if info.get('operatingMargins') else 0
             }
+            self._cache_data(f"fundamentals_{symbol}", fundamentals)
+            return fundamentals
             
         except Exception as e:
             return {"error": f"Error getting fundamentals for {symbol}: {str(e)}"}
     
     def get_technical_indicators(self, symbol: str, period: str = "1y") -> Dict[str, Any]:
         """Calculate basic technical indicators"""
+        symbol = symbol.upper()
+        cache_key = f"technical_{period}_{symbol}"
+        cached_data = self._get_cached_data(cache_key)
+        if cached_data:
+            return cached_data
+        return self._single_flight(cache_key, lambda: self._fetch_technical_indicators(symbol, period))
+    
+    def _fetch_technical_indicators(self, symbol: str, period: str) -> Dict[str, Any]:
         try:
             ticker = yf.Ticker(symbol)
-            hist = ticker.history(period=period)
+            with _upstream('yfinance.history', symbol=symbol, period=period):
+                hist = ticker.history(period=period)
             
             if hist.empty:
                 return {"error": "No historical data available"}
@@ -506,7 +648,7 @@ class EnhancedFinancialDataService:
             rs = gain / loss
             rsi = 100 - (100 / (1 + rs)).iloc[-1]
             
-            return {
+            indicators = {
                 'current_price': float(current_price),
                 'sma_20': float(sma_20) if pd.notna(sma_20) else 0,
                 'sma_50': float(sma_50) if pd.notna(sma_50) else 0,
@@ -516,6 +658,8 @@ class EnhancedFinancialDataService:
                 'price_vs_sma50': ((current_price - sma_50) / sma_50 * 100) if pd.notna(sma_50) else 0,
                 'price_vs_sma200': ((current_price - sma_200) / sma_200 * 100) if pd.notna(sma_200) else 0
             }
+            self._cache_data(f"technical_{period}_{symbol}", indicators)
+            return indicators
         except Exception as e:
             self.logger.error(f"Error calculating technical indicators for {symbol}: {str(e)}")
             return {"error": f"Error calculating technical indicators for {symbol}: {str(e)}"}
@@ -532,8 +676,11 @@ class EnhancedFinancialDataService:
         for attempt in range(retries):
             try:
                 time.sleep(self.scraping_delay)  # Be respectful with delays
-                response = self.session.get(url, timeout=10)
-                response.raise_for_status()
+                with _upstream('http.get', url=url, attempt=attempt + 1) as request_span:
+                    response = self.session.get(url, timeout=10)
+                    if request_span:
+                        request_span.set_attribute('http.status_code', response.status_code)
+                    response.raise_for_status()
                 return response
             except requests.exceptions.RequestException as e:
                 self.logger.warning(f"Request failed (attempt {attempt + 1}/{retries}): {str(e)}")
@@ -552,7 +699,16 @@ class EnhancedFinancialDataService:
             if not response:
                 return {"error": "Failed to fetch Finviz data"}
             
-            soup = BeautifulSoup(response.content, 'html.parser')
+            return self._parse_finviz_html(response.content)
+            
+        except Exception as e:
+            self.logger.error(f"Error scraping Finviz data for {symbol}: {str(e)}")
+            return {"error": f"Finviz scraping failed: {str(e)}"}
+    
+    def _parse_finviz_html(self, content) -> Dict[str, Any]:
+        """Parse the Finviz quote page into financial metrics"""
+        try:
+            soup = BeautifulSoup(content, 'html.parser')
             
             # Find the fundamental data table
             table = soup.find('table', {'class': 'snapshot-table2'})
@@ -593,7 +749,7 @@ class EnhancedFinancialDataService:
             return parsed_data
             
         except Exception as e:
-            self.logger.error(f"Error scraping Finviz data for {symbol}: {str(e)}")
+            self.logger.error(f"Error parsing Finviz data: {str(e)}")
             return {"error": f"Finviz scraping failed: {str(e)}"}
     
     def scrape_marketwatch_news(self, symbol: str) -> Dict[str, Any]:
@@ -605,7 +761,16 @@ class EnhancedFinancialDataService:
             if not response:
                 return {"error": "Failed to fetch MarketWatch data"}
             
-            soup = BeautifulSoup(response.content, 'html.parser')
+            return self._parse_marketwatch_html(response.content)
+            
+        except Exception as e:
+            self.logger.error(f"Error scraping MarketWatch news for {symbol}: {str(e)}")
+            return {"error": f"MarketWatch news scraping failed: {str(e)}"}
+    
+    def _parse_marketwatch_html(self, content) -> Dict[str, Any]:
+        """Parse news articles from a MarketWatch quote page"""
+        try:
+            soup = BeautifulSoup(content, 'html.parser')
             
             # Find news articles
             news_articles = []
@@ -650,7 +815,7 @@ class EnhancedFinancialDataService:
             }
             
         except Exception as e:
-            self.logger.error(f"Error scraping MarketWatch news for {symbol}: {str(e)}")
+            self.logger.error(f"Error parsing MarketWatch news: {str(e)}")
             return {"error": f"MarketWatch news scraping failed: {str(e)}"}
     
     def scrape_seeking_alpha_analysis(self, symbol: str) -> Dict[str, Any]:
@@ -662,7 +827,16 @@ class EnhancedFinancialDataService:
             if not response:
                 return {"error": "Failed to fetch Seeking Alpha data"}
             
-            soup = BeautifulSoup(response.content, 'html.parser')
+            return self._parse_seeking_alpha_html(response.content)
+            
+        except Exception as e:
+            self.logger.error(f"Error scraping Seeking Alpha for {symbol}: {str(e)}")
+            return {"error": f"Seeking Alpha scraping failed: {str(e)}"}
+    
+    def _parse_seeking_alpha_html(self, content) -> Dict[str, Any]:
+        """Parse articles and analyst sentiment from a Seeking Alpha symbol page"""
+        try:
+            soup = BeautifulSoup(content, 'html.parser')
             
             # Extract analyst ratings and sentiment
             data = {
@@ -696,7 +870,7 @@ class EnhancedFinancialDataService:
             return data
             
         except Exception as e:
-            self.logger.error(f"Error scraping Seeking Alpha for {symbol}: {str(e)}")
+            self.logger.error(f"Error parsing Seeking Alpha data: {str(e)}")
             return {"error": f"Seeking Alpha scraping failed: {str(e)}"}
     
     def scrape_yahoo_finance_news(self, symbol: str) -> Dict[str, Any]:
@@ -708,7 +882,16 @@ class EnhancedFinancialDataService:
             if not response:
                 return {"error": "Failed to fetch Yahoo Finance news"}
             
-            soup = BeautifulSoup(response.content, 'html.parser')
+            return self._parse_yahoo_news_html(response.content)
+            
+        except Exception as e:
+            self.logger.error(f"Error scraping Yahoo Finance news for {symbol}: {str(e)}")
+            return {"error": f"Yahoo Finance news scraping failed: {str(e)}"}
+    
+    def _parse_yahoo_news_html(self, content) -> Dict[str, Any]:
+        """Parse headlines from a Yahoo Finance news page"""
+        try:
+            soup = BeautifulSoup(content, 'html.parser')
             
             news_articles = []
             
@@ -747,7 +930,7 @@ class EnhancedFinancialDataService:
             }
             
         except Exception as e:
-            self.logger.error(f"Error scraping Yahoo Finance news for {symbol}: {str(e)}")
+            self.logger.error(f"Error parsing Yahoo Finance news: {str(e)}")
             return {"error": f"Yahoo Finance news scraping failed: {str(e)}"}
     
     def scrape_sec_filings(self, symbol: str) -> Dict[str, Any]:
@@ -760,7 +943,16 @@ class EnhancedFinancialDataService:
             if not response:
                 return {"error": "Failed to fetch SEC data"}
             
-            soup = BeautifulSoup(response.content, 'xml')
+            return self._parse_sec_filings_xml(response.content)
+            
+        except Exception as e:
+            self.logger.error(f"Error scraping SEC filings for {symbol}: {str(e)}")
+            return {"error": f"SEC filing scraping failed: {str(e)}"}
+    
+    def _parse_sec_filings_xml(self, content) -> Dict[str, Any]:
+        """Parse filings from an SEC EDGAR atom feed"""
+        try:
+            soup = BeautifulSoup(content, 'xml')
             
             filings = []
             entries = soup.find_all('entry')[:10]  # Get last 10 filings
@@ -787,7 +979,7 @@ class EnhancedFinancialDataService:
             }
             
         except Exception as e:
-            self.logger.error(f"Error scraping SEC filings for {symbol}: {str(e)}")
+            self.logger.error(f"Error parsing SEC filings: {str(e)}")
             return {"error": f"SEC filing scraping failed: {str(e)}"}
     
     def scrape_insider_trading(self, symbol: str) -> Dict[str, Any]:
@@ -801,7 +993,16 @@ class EnhancedFinancialDataService:
             if not response:
                 return {"error": "Failed to fetch insider trading data"}
             
-            soup = BeautifulSoup(response.content, 'html.parser')
+            return self._parse_insider_trading_html(response.content)
+            
+        except Exception as e:
+            self.logger.error(f"Error scraping insider trading for {symbol}: {str(e)}")
+            return {"error": f"Insider trading scraping failed: {str(e)}"}
+    
+    def _parse_insider_trading_html(self, content) -> Dict[str, Any]:
+        """Parse insider transactions from a Form 4 summary page"""
+        try:
+            soup = BeautifulSoup(content, 'html.parser')
             
             # Look for insider trading table
             trading_data = []
@@ -826,27 +1027,37 @@ class EnhancedFinancialDataService:
             }
             
         except Exception as e:
-            self.logger.error(f"Error scraping insider trading for {symbol}: {str(e)}")
+            self.logger.error(f"Error parsing insider trading data: {str(e)}")
             return {"error": f"Insider trading scraping failed: {str(e)}"}
     
+    def _timed_scrape(self, source: str, scraper, symbol: str) -> Dict[str, Any]:
+        """Run one scraper, recording its latency and whether it produced data"""
+        with SCRAPER_SECONDS.time(source=source), span(f'scrape.{source}', symbol=symbol):
+            result = scraper(symbol)
+        SCRAPER_RESULTS.inc(source=source, outcome='error' if 'error' in result else 'success')
+        return result
+    
     def get_enhanced_web_data(self, symbol: str) -> Dict[str, Any]:
         """Get enhanced data from web scraping sources"""
+        cache_key = f"web_data_{symbol.upper()}"
+        cached_data = self._get_cached_data(cache_key)
+        if cached_data:
+            return cached_data
+        return self._single_flight(cache_key, lambda: self._fetch_enhanced_web_data(symbol))
+    
+    def _fetch_enhanced_web_data(self, symbol: str) -> Dict[str, Any]:
         try:
-            cache_key = f"web_data_{symbol}"
-            cached_data = self._get_cached_data(cache_key)
-            if cached_data:
-                return cached_data
-            
+            cache_key = f"web_data_{symbol.upper()}"
             # Scrape from multiple sources
             web_data = {
                 'symbol': symbol.upper(),
                 'scraping_timestamp': datetime.now().isoformat(),
-                'finviz_metrics': self.scrape_finviz_data(symbol),
-                'marketwatch_news': self.scrape_marketwatch_news(symbol),
-                'seeking_alpha_analysis': self.scrape_seeking_alpha_analysis(symbol),
-                'yahoo_news': self.scrape_yahoo_finance_news(symbol),
-                'sec_filings': self.scrape_sec_filings(symbol),
-                'insider_trading': self.scrape_insider_trading(symbol)
+                'finviz_metrics': self._timed_scrape('finviz', self.scrape_finviz_data, symbol),
+                'marketwatch_news': self._timed_scrape('marketwatch', self.scrape_marketwatch_news, symbol),
+                'seeking_alpha_analysis': self._timed_scrape('seeking_alpha', self.scrape_seeking_alpha_analysis, symbol),
+                'yahoo_news': self._timed_scrape('yahoo_news', self.scrape_yahoo_finance_news, symbol),
+                'sec_filings': self._timed_scrape('sec_filings', self.scrape_sec_filings, symbol),
+                'insider_trading': self._timed_scrape('insider_trading', self.scrape_insider_trading, symbol)
             }
             
             # Cache the result
@@ -0,0 +1,549 @@
+"""
+Background jobs for long-running analyses.
+
+A full analysis takes minutes; holding an HTTP request open for that long
+runs into proxy timeouts and ties up a server thread. submit() queues the work
+and returns a job at once; a bounded pool of job threads runs the queue in
+order. The job's work reports phase progress through job.progress (the
+orchestrator's progress callback) and LLM tokens through job.token, so clients
+can poll the job's status and per-phase progress or follow its events live
+(events()). cancel() stops a queued job at once and a running one at its next
+phase boundary or LLM token.
+
+Submitting the same query and symbol while an earlier job for them is still
+queued or running attaches to that job instead of starting another.
+
+Every state change is written to a JSON file per job (results_dir), so finished
+results can be fetched after a restart and from any worker process; finished
+job files are deleted ttl_seconds after the job ended.
+
+With several worker processes (CACHE_BACKEND = "sqlite") deduplication and
+cancellation work across them through the 'analysis_jobs' shared cache: each
+unfinished job registers its query and symbol there (submit() claims the key
+while it checks and registers, so two workers cannot both start the job), and
+cancelling a job run by another worker sets a flag there that the job reads
+at its next checkpoint (at most every CANCEL_POLL_SECONDS). A registration is
+a lease that its process renews while the job is unfinished, so the entry of
+a worker that crashed expires even if its pid is reused.
+"""
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from . import shared_cache
+from .metrics import ANALYSIS_JOB_QUEUE_SECONDS, ANALYSIS_JOB_SECONDS, ANALYSIS_JOBS
+from .tracing import begin_trace, end_trace
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = 'queued', 'running', 'succeeded', 'failed', 'cancelled'
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+_JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# How often a running job reads the shared cancel flag that other worker processes may set
+CANCEL_POLL_SECONDS = 1.0
+
+_settings = {
+    'max_workers': 2,
+    'max_queued': 50,
+    'max_stored': 200,
+    'ttl_seconds': 86400,
+    'results_dir': os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'jobs'),
+    'keepalive_seconds': 15
+}
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_lock = threading.Lock()
+_jobs: 'OrderedDict[str, Job]' = OrderedDict()
+_active: Dict[str, 'Job'] = {}
+_shared = None
+_last_prune = 0.0
+_renewer_pid = None
+
+
+def configure(max_workers: int = 2, max_queued: int = 50, max_stored: int = 200, ttl_seconds: float = 86400,
+              results_dir: Optional[str] = None):
+    """Apply job settings (called once at startup from config.py values)"""
+    _settings.update(max_workers=max(1, max_workers), max_queued=max(0, max_queued),
+                     max_stored=max(1, max_stored), ttl_seconds=ttl_seconds)
+    if results_dir:
+        _settings['results_dir'] = results_dir
+
+
+class JobQueueFull(Exception):
+    """Raised by submit() when max_queued jobs are already waiting"""
+
+
+class JobCancelled(BaseException):
+    """Raised inside a job's work when the job is cancelled; like StreamCancelled it derives from
+    BaseException so the agents' broad exception handlers don't swallow it"""
+
+
+def _dedup_key(query: str, symbol: str) -> str:
+    normalized = re.sub(r'\s+', ' ', query or '').strip().lower()
+    return f"{normalized}|{(symbol or '').strip().upper()}"
+
+
+def _shared_jobs():
+    """The cache of unfinished jobs and cancel flags shared by the worker processes, created on first use"""
+    global _shared
+    if _shared is None:
+        with _pool_lock:
+            if _shared is None:
+                _shared = shared_cache.create('analysis_jobs', ttl_seconds=_settings['ttl_seconds'])
+    return _shared
+
+
+class Job:
+    """One queued or running analysis: its status, per-phase progress, events and result"""
+
+    def __init__(self, query: str, symbol: str, phases: Sequence[str]):
+        self.job_id = uuid.uuid4().hex
+        self.query = query
+        self.symbol = symbol
+        self.key = _dedup_key(query, symbol)
+        self.status = QUEUED
+        self.phases: Dict[str, Dict[str, Any]] = {name: {'status': 'pending', 'seconds': None} for name in phases}
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.trace_id: Optional[str] = None
+        self.attached = 0
+        self.future: Optional[Future] = None
+        self._cancel = threading.Event()
+        self._cancel_checked_at = 0.0
+        self._lock = threading.Lock()
+        self._history: List[Tuple[str, Dict[str, Any]]] = []
+        self._subscribers: List[queue.Queue] = []
+        self._closed = False
+
+    # Called from the job's work (possibly from several phase threads at once)
+
+    def progress(self, event: str, details: Dict[str, Any]):
+        """Orchestrator progress callback: records phase starts and completions"""
+        self.check_cancelled()
+        phase = details.get('phase')
+        with self._lock:
+            state = self.phases.setdefault(phase, {'status': 'pending', 'seconds': None})
+            if event == 'phase_started':
+                state['status'] = 'running'
+            elif event == 'phase_completed':
+                state.update(status='completed', seconds=details.get('seconds'))
+        # Phase outputs are part of the result; events only carry the phase and its timing
+        self._publish(event, {key: value for key, value in details.items() if key != 'output'})
+
+    def token(self, phase: Optional[str], text: str):
+        """LLM token sink: passed to live subscribers only (not kept for replay)"""
+        self.check_cancelled()
+        self._publish('token', {'phase': phase, 'text': text}, keep=False)
+
+    def check_cancelled(self):
+        if not self._cancel.is_set() and self._cancel_requested_elsewhere():
+            self._cancel.set()
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def _cancel_requested_elsewhere(self) -> bool:
+        """Whether another worker process set this job's shared cancel flag (read every CANCEL_POLL_SECONDS)"""
+        now = time.monotonic()
+        if now - self._cancel_checked_at < CANCEL_POLL_SECONDS:
+            return False
+        self._cancel_checked_at = now
+        return bool(_shared_jobs().get(f"cancel:{self.job_id}"))
+
+    # Subscribers
+
+    def subscribe(self) -> Tuple[List[Tuple[str, Dict[str, Any]]], Optional[queue.Queue]]:
+        """Events so far plus a queue of the events to come (None once the job has finished)"""
+        with self._lock:
+            if self._closed:
+                return list(self._history), None
+            subscriber: queue.Queue = queue.Queue()
+            self._subscribers.append(subscriber)
+            return list(self._history), subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def _publish(self, event: str, data: Dict[str, Any], keep: bool = True, final: bool = False):
+        with self._lock:
+            if keep:
+                self._history.append((event, data))
+            subscribers = list(self._subscribers)
+            if final:
+                self._subscribers = []
+                self._closed = True
+        for subscriber in subscribers:
+            subscriber.put((event, data))
+            if final:
+                subscriber.put(None)
+        if keep:
+            _persist(self)
+
+    def _set_status(self, status: str, **details):
+        """Record a status change; a finished status also sends the final event and closes subscriptions"""
+        with self._lock:
+            self.status = status
+        self._publish('status', dict(self.to_dict(), **details))
+        if status in FINISHED:
+            event = {SUCCEEDED: 'done', FAILED: 'error', CANCELLED: 'cancelled'}[status]
+            self._publish(event, self.to_dict(include_result=status == SUCCEEDED), final=True)
+
+    def to_dict(self, include_result: bool = False) -> Dict[str, Any]:
+        with self._lock:
+            phases = {name: dict(state) for name, state in self.phases.items()}
+            completed = sum(state['status'] == 'completed' for state in phases.values())
+            record = {
+                'job_id': self.job_id,
+                'status': self.status,
+                'query': self.query,
+                'symbol': self.symbol,
+                'phases': phases,
+                'progress': completed / len(phases) if phases else (1.0 if self.status == SUCCEEDED else 0.0),
+                'cancel_requested': self._cancel.is_set(),
+                'attached_submissions': self.attached,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'trace_id': self.trace_id,
+                'error': self.error
+            }
+            if include_result:
+                record['result'] = self.result
+        return record
+
+
+def _path(job_id: str) -> str:
+    return os.path.join(_settings['results_dir'], f"{job_id}.json")
+
+
+def _persist(job: Job):
+    """Write the job's record (with its result once finished) so any process can read it"""
+    record = job.to_dict(include_result=True)
+    try:
+        os.makedirs(_settings['results_dir'], exist_ok=True)
+        temporary = f"{_path(job.job_id)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump(record, f, default=str)
+        os.replace(temporary, _path(job.job_id))
+    except OSError as e:
+        logger.warning(f"Could not persist job {job.job_id}: {str(e)}")
+
+
+def _load(job_id: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_path(job_id)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _prune(now: float):
+    """Forget finished jobs beyond max_stored and delete job files older than ttl_seconds"""
+    global _last_prune
+    while len(_jobs) > _settings['max_stored']:
+        oldest = next((job_id for job_id, job in _jobs.items() if job.status in FINISHED), None)
+        if oldest is None:
+            break
+        del _jobs[oldest]
+    if now - _last_prune < 600:
+        return
+    _last_prune = now
+    try:
+        for name in os.listdir(_settings['results_dir']):
+            path = os.path.join(_settings['results_dir'], name)
+            if now - os.path.getmtime(path) > _settings['ttl_seconds']:
+                os.remove(path)
+    except OSError:
+        pass
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    """Process-wide job pool, created on first use (and again after a fork)"""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ThreadPoolExecutor(max_workers=_settings['max_workers'], thread_name_prefix='analysis-job')
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _register(job: Job):
+    """Register (or renew) job as the unfinished job for its key for the next lease_seconds"""
+    _shared_jobs().set(f"active:{job.key}", {'job_id': job.job_id, 'pid': os.getpid(),
+                                            'expires_at': time.time() + shared_cache.lease_seconds()})
+
+
+def _renew_registrations():
+    """Keep renewing this process's registrations while their jobs are unfinished"""
+    while True:
+        time.sleep(shared_cache.lease_seconds() / 3)
+        with _lock:
+            jobs = list(_active.values())
+        for job in jobs:
+            entry = _shared_jobs().get(f"active:{job.key}")
+            if job.status not in FINISHED and (entry is None or entry['job_id'] == job.job_id):
+                _register(job)
+
+
+def _start_renewer():
+    """Start this process's registration renewer on first use (and again after a fork)"""
+    global _renewer_pid
+    if _renewer_pid != os.getpid():
+        with _pool_lock:
+            if _renewer_pid != os.getpid():
+                threading.Thread(target=_renew_registrations, name='job-registrations', daemon=True).start()
+                _renewer_pid = os.getpid()
+
+
+def _unfinished_elsewhere(key: str) -> Optional[Dict[str, Any]]:
+    """The record of an unfinished job for key registered by another live worker process, if any"""
+    entry = _shared_jobs().get(f"active:{key}")
+    if not entry or entry['pid'] == os.getpid():
+        return None
+    # An expired lease means the process stopped renewing it; the pid may since belong to another process
+    if entry.get('expires_at', 0) <= time.time() or not _process_alive(entry['pid']):
+        return None
+    record = _load(entry['job_id'])
+    if record is None or record['status'] in FINISHED:
+        return None
+    record.pop('result', None)
+    return record
+
+
+def _deactivate(job: Job):
+    """Stop deduplicating submissions onto job (it has finished or was cancelled before it started)"""
+    with _lock:
+        if _active.get(job.key) is job:
+            del _active[job.key]
+    shared = _shared_jobs()
+    entry = shared.get(f"active:{job.key}")
+    if entry and entry['job_id'] == job.job_id:
+        shared.delete(f"active:{job.key}")
+    shared.delete(f"cancel:{job.job_id}")
+
+
+def _run(job: Job, work: Callable[[Job], Dict[str, Any]]):
+    if job.status in FINISHED:
+        return
+    job.started_at = time.time()
+    ANALYSIS_JOB_QUEUE_SECONDS.observe(job.started_at - job.created_at)
+    handle = begin_trace('analysis job', job_id=job.job_id, query=job.query[:200])
+    job.trace_id = handle['trace'].trace_id if handle else None
+    error: Optional[BaseException] = None
+    try:
+        job.check_cancelled()
+        job._set_status(RUNNING)
+        job.result = work(job)
+        outcome = SUCCEEDED
+    except JobCancelled as e:
+        error, outcome = e, CANCELLED
+    except Exception as e:
+        error, outcome = e, FAILED
+        job.error = str(e)
+        logger.error(f"❌ Analysis job {job.job_id} failed: {str(e)}")
+    finally:
+        job.finished_at = time.time()
+        _deactivate(job)
+        end_trace(handle, error=error if outcome == FAILED else None, status=outcome)
+    ANALYSIS_JOBS.inc(outcome=outcome)
+    ANALYSIS_JOB_SECONDS.observe(job.finished_at - job.started_at, outcome=outcome)
+    job._set_status(outcome)
+
+
+def _attach(key: str) -> Optional[Dict[str, Any]]:
+    """The record of this process's unfinished job for key, counting the submission as attached (hold _lock)"""
+    existing = _active.get(key)
+    if existing is None:
+        return None
+    existing.attached += 1
+    ANALYSIS_JOBS.inc(outcome='attached')
+    return existing.to_dict()
+
+
+def submit(query: str, symbol: str, work: Callable[[Job], Dict[str, Any]],
+           phases: Sequence[str] = ()) -> Tuple[Dict[str, Any], bool]:
+    """
+    Queue work(job) for this query and symbol; returns (the job's record, created). created is False
+    when an unfinished job for the same query and symbol already exists, in this or another worker
+    process, and its record is returned instead. Raises JobQueueFull when max_queued jobs are waiting.
+    """
+    now = time.time()
+    key = _dedup_key(query, symbol)
+    shared = _shared_jobs()
+    with _lock:
+        attached = _attach(key)
+    if attached is not None:
+        return attached, False
+    # Hold the key across processes while checking for and registering the job. _lock is not
+    # held while waiting for another process's claim, so get/status/cancel are not blocked by it
+    while not shared.claim(key):
+        shared.wait_released(key, shared_cache.lease_seconds())
+    try:
+        elsewhere = _unfinished_elsewhere(key)
+        if elsewhere is not None:
+            ANALYSIS_JOBS.inc(outcome='attached')
+            return elsewhere, False
+        with _lock:
+            # Another thread of this process may have registered the job while this one waited
+            attached = _attach(key)
+            if attached is not None:
+                return attached, False
+            if sum(job.status == QUEUED for job in _active.values()) >= _settings['max_queued']:
+                ANALYSIS_JOBS.inc(outcome='rejected')
+                raise JobQueueFull(f"{_settings['max_queued']} analysis jobs are already queued")
+            job = Job(query, symbol, phases)
+            _jobs[job.job_id] = job
+            _active[job.key] = job
+            _prune(now)
+        # Persisted before it is registered, so other processes that find the registration can load it
+        _persist(job)
+        _register(job)
+    finally:
+        shared.release(key)
+    _start_renewer()
+    ANALYSIS_JOBS.inc(outcome='submitted')
+    job._publish('status', job.to_dict())
+    job.future = _get_pool().submit(_run, job, work)
+    return job.to_dict(), True
+
+
+def get(job_id: str) -> Optional[Job]:
+    """The job if this process runs (or ran) it"""
+    if not job_id or not _JOB_ID_PATTERN.match(job_id):
+        return None
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def status(job_id: str, include_result: bool = False) -> Optional[Dict[str, Any]]:
+    """The job's record, from this process or from its persisted file (None if unknown or expired)"""
+    job = get(job_id)
+    if job is not None:
+        return job.to_dict(include_result=include_result)
+    if not job_id or not _JOB_ID_PATTERN.match(job_id):
+        return None
+    record = _load(job_id)
+    if record is not None and not include_result:
+        record.pop('result', None)
+    return record
+
+
+def cancel(job_id: str) -> Optional[str]:
+    """
+    Request cancellation; returns the job's status afterwards, or None if the job is unknown or
+    expired. A queued job is cancelled at once, a running one at its next checkpoint; a job run by
+    another worker process at its next checkpoint after it reads the shared cancel flag.
+    """
+    job = get(job_id)
+    if job is None:
+        record = status(job_id)
+        if record is None:
+            return None
+        if record['status'] not in FINISHED:
+            _shared_jobs().set(f"cancel:{job_id}", True)
+        return record['status']
+    if job.status in FINISHED:
+        return job.status
+    job._cancel.set()
+    if job.future is not None and job.future.cancel():
+        # Never started: finish it here instead of in _run
+        job.finished_at = job.started_at = time.time()
+        _deactivate(job)
+        ANALYSIS_JOBS.inc(outcome=CANCELLED)
+        job._set_status(CANCELLED)
+    else:
+        _persist(job)
+    return job.status
+
+
+def events(job_id: str) -> Iterator[Optional[Tuple[str, Dict[str, Any]]]]:
+    """
+    The job's events so far, then its live events until it finishes. Yields None every
+    keepalive_seconds without events. A job run by another process is followed through its
+    persisted record (status events only, no tokens).
+    """
+    job = get(job_id)
+    if job is None:
+        yield from _follow_persisted(job_id)
+        return
+    history, subscriber = job.subscribe()
+    yield from history
+    if subscriber is None:
+        return
+    try:
+        while True:
+            try:
+                item = subscriber.get(timeout=_settings['keepalive_seconds'])
+            except queue.Empty:
+                yield None
+                continue
+            if item is None:
+                return
+            yield item
+    finally:
+        job.unsubscribe(subscriber)
+
+
+def _follow_persisted(job_id: str) -> Iterator[Optional[Tuple[str, Dict[str, Any]]]]:
+    last = None
+    waited = 0.0
+    while True:
+        record = status(job_id, include_result=True)
+        if record is None:
+            return
+        result = record.pop('result', None)
+        if record != last:
+            yield 'status', record
+            last = record
+            waited = 0.0
+        if record['status'] in FINISHED:
+            event = {SUCCEEDED: 'done', FAILED: 'error', CANCELLED: 'cancelled'}[record['status']]
+            yield event, dict(record, result=result) if record['status'] == SUCCEEDED else record
+            return
+        time.sleep(1.0)
+        waited += 1.0
+        if waited >= _settings['keepalive_seconds']:
+            waited = 0.0
+            yield None
+
+
+def stats() -> Dict[str, Any]:
+    """Jobs in this process by status, plus the pool and queue limits"""
+    with _lock:
+        jobs = list(_jobs.values())
+    by_status: Dict[str, int] = {}
+    for job in jobs:
+        by_status[job.status] = by_status.get(job.status, 0) + 1
+    return {
+        'max_workers': _settings['max_workers'],
+        'max_queued': _settings['max_queued'],
+        'jobs': by_status,
+        'recent': [job.to_dict() for job in reversed(jobs[-20:])]
+    }
@@ -0,0 +1,41 @@
+"""
+Deferred imports of heavy modules.
+
+yfinance and pandas take most of a second to import between them and are only
+needed once market data is actually fetched. lazy_module() returns a stand-in
+that imports the real module on first attribute access, so the importing
+module can keep writing yf.Ticker(...) / pd.notna(...) while the server starts
+without loading them. Attribute lookups go to the real module every time, so
+patches applied to it (such as the replayed fixtures in benchmarks) are seen.
+"""
+import importlib
+import threading
+from types import ModuleType
+from typing import Optional
+
+
+class LazyModule:
+    """Imports the named module on first attribute access (thread-safe)"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module: Optional[ModuleType] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> ModuleType:
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_module(name: str) -> LazyModule:
+    return LazyModule(name)
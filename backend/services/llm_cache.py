@@ -0,0 +1,204 @@
+"""
+Persistent cache of LLM responses.
+
+Responses are keyed on model name, temperature, max_tokens and a hash of the
+normalized prompt: tiers can share a model with different token budgets, and a
+response cut short by a small budget must not answer a call with a larger one. Normalization collapses whitespace and masks embedded timestamps, so
+the same analysis requested a minute later still hits. Entries live in a local
+SQLite database with a TTL and entry/byte limits (least recently used entries
+are evicted first), which also lets several worker processes share one cache.
+
+A request can bypass the cache (see bypass()); the fresh response then
+replaces the cached one.
+"""
+import contextvars
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from .metrics import LLM_CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+_settings = {
+    'enabled': False,
+    'path': os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'llm_cache.sqlite3'),
+    'ttl_seconds': 3600,
+    'max_entries': 5000,
+    'max_bytes': 200 * 1024 * 1024
+}
+
+_bypass: contextvars.ContextVar = contextvars.ContextVar('llm_cache_bypass', default=False)
+
+_TIMESTAMP_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?')
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+_local = threading.local()
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'bypassed': 0, 'stores': 0, 'evictions': 0}
+
+
+def configure(enabled: bool = True, path: Optional[str] = None, ttl_seconds: float = 3600,
+              max_entries: int = 5000, max_bytes: int = 200 * 1024 * 1024):
+    """Apply cache settings (called once at startup from config.py values)"""
+    _settings.update(enabled=enabled, ttl_seconds=ttl_seconds, max_entries=max_entries, max_bytes=max_bytes)
+    if path:
+        _settings['path'] = path
+
+
+def _connection() -> sqlite3.Connection:
+    """One connection per thread (and per process, so forked workers reconnect)"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or getattr(_local, 'pid', None) != os.getpid() or getattr(_local, 'path', None) != _settings['path']:
+        os.makedirs(os.path.dirname(_settings['path']), exist_ok=True)
+        conn = sqlite3.connect(_settings['path'], timeout=10)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('''CREATE TABLE IF NOT EXISTS llm_responses (
+            key TEXT PRIMARY KEY,
+            model TEXT,
+            call_type TEXT,
+            response TEXT,
+            size INTEGER,
+            created_at REAL,
+            last_access REAL
+        )''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_responses_last_access ON llm_responses (last_access)')
+        conn.commit()
+        _local.conn, _local.pid, _local.path = conn, os.getpid(), _settings['path']
+    return conn
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Mask timestamps and collapse whitespace so cosmetically different prompts share a key"""
+    return _WHITESPACE_PATTERN.sub(' ', _TIMESTAMP_PATTERN.sub('<timestamp>', prompt)).strip()
+
+
+def model_identity(llm) -> Dict[str, Any]:
+    return {
+        'model': getattr(llm, 'model_name', None) or getattr(llm, 'model', None) or type(llm).__name__,
+        'temperature': getattr(llm, 'temperature', None),
+        'max_tokens': getattr(llm, 'max_tokens', None)
+    }
+
+
+def cache_key(llm, prompt: str) -> str:
+    identity = model_identity(llm)
+    digest = hashlib.sha256(normalize_prompt(prompt).encode('utf-8')).hexdigest()
+    return hashlib.sha256(
+        f"{identity['model']}|{identity['temperature']}|{identity['max_tokens']}|{digest}".encode('utf-8')
+    ).hexdigest()
+
+
+def _count(stat: str, call_type: str, result: str):
+    with _stats_lock:
+        _stats[stat] += 1
+    LLM_CACHE_REQUESTS.inc(call_type=call_type, result=result)
+
+
+def lookup(llm, prompt: str, call_type: str) -> Optional[str]:
+    """Cached response for this model/temperature/max_tokens/prompt, or None on a miss, bypass or when disabled"""
+    if not _settings['enabled']:
+        return None
+    if _bypass.get():
+        _count('bypassed', call_type, 'bypass')
+        return None
+
+    key = cache_key(llm, prompt)
+    now = time.time()
+    try:
+        conn = _connection()
+        row = conn.execute('SELECT response, created_at FROM llm_responses WHERE key = ?', (key,)).fetchone()
+        if row and now - row[1] < _settings['ttl_seconds']:
+            conn.execute('UPDATE llm_responses SET last_access = ? WHERE key = ?', (now, key))
+            conn.commit()
+            _count('hits', call_type, 'hit')
+            return row[0]
+    except sqlite3.Error as e:
+        logger.warning(f"LLM cache lookup failed: {str(e)}")
+    _count('misses', call_type, 'miss')
+    return None
+
+
+def store(llm, prompt: str, call_type: str, response: str):
+    """Save a successful response and evict expired / least recently used entries over the limits"""
+    if not _settings['enabled']:
+        return
+
+    key = cache_key(llm, prompt)
+    now = time.time()
+    try:
+        conn = _connection()
+        conn.execute('INSERT OR REPLACE INTO llm_responses VALUES (?, ?, ?, ?, ?, ?, ?)',
+                     (key, model_identity(llm)['model'], call_type, response,
+                      len(response.encode('utf-8')), now, now))
+        evicted = conn.execute('DELETE FROM llm_responses WHERE created_at < ?',
+                               (now - _settings['ttl_seconds'],)).rowcount
+        entries, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_responses').fetchone()
+        while entries > _settings['max_entries'] or size > _settings['max_bytes']:
+            row = conn.execute('SELECT key, size FROM llm_responses ORDER BY last_access LIMIT 1').fetchone()
+            if row is None:
+                break
+            conn.execute('DELETE FROM llm_responses WHERE key = ?', (row[0],))
+            entries, size, evicted = entries - 1, size - row[1], evicted + 1
+        conn.commit()
+        with _stats_lock:
+            _stats['stores'] += 1
+            _stats['evictions'] += evicted
+    except sqlite3.Error as e:
+        logger.warning(f"LLM cache store failed: {str(e)}")
+
+
+@contextmanager
+def bypass():
+    """Skip cache reads for LLM calls made inside this block (responses are still stored)"""
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def bypassed() -> bool:
+    """Whether this context asked for fresh LLM responses (bypass() or begin_bypass())"""
+    return _bypass.get()
+
+
+def begin_bypass():
+    """Non-context-manager form of bypass() for request hooks; pass the token to end_bypass"""
+    return _bypass.set(True)
+
+
+def end_bypass(token):
+    try:
+        _bypass.reset(token)
+    except ValueError:
+        pass
+
+
+def stats() -> Dict[str, Any]:
+    """Hit ratio for this process plus the size of the shared cache"""
+    with _stats_lock:
+        counts = dict(_stats)
+    lookups = counts['hits'] + counts['misses']
+    result = {
+        'enabled': _settings['enabled'],
+        'path': _settings['path'],
+        'ttl_seconds': _settings['ttl_seconds'],
+        **counts,
+        'hit_ratio': counts['hits'] / lookups if lookups else 0.0
+    }
+    if _settings['enabled']:
+        try:
+            entries, size = _connection().execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_responses').fetchone()
+            result.update(entries=entries, bytes=size)
+        except sqlite3.Error as e:
+            result['error'] = str(e)
+    return result
@@ -0,0 +1,263 @@
+"""
+Hedged LLM requests and adaptive timeouts.
+
+The latency of every LLM call is recorded per call type (and, for streamed
+calls, the time to first token). Once a call type has enough samples, a call
+that is still running after that type's p95 gets a hedged duplicate request:
+whichever attempt finishes first (or, when streaming, produces the first
+token) wins and the other is cancelled. Hedges draw from a token bucket that
+refills by budget_ratio per call, so at most roughly that fraction of calls
+are duplicated even when the provider is slow across the board. A hedge also
+needs a free concurrency slot of the scheduler it runs on, so hedging never
+takes the number of requests in flight above LLM_MAX_CONCURRENCY.
+
+Each call also gets an adaptive timeout: a multiple of its call type's p99,
+clamped to [min_timeout, max_timeout]; until there are enough samples the
+timeout is max_timeout. Calls that time out or fail are recorded too, a timed
+out one at its elapsed time (a censored sample: it would have taken at least
+that long), so a run of slow calls raises the percentiles and with them the
+timeout instead of timing out forever at a stale p99.
+"""
+import asyncio
+import os
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from .metrics import LLM_HEDGES, LLM_TIMEOUTS
+
+_settings = {
+    'enabled': True,
+    'percentile': 0.95,
+    'min_samples': 20,
+    'window': 200,
+    'budget_ratio': 0.1,
+    'budget_burst': 3,
+    'timeout_multiplier': 3.0,
+    'min_timeout': 10.0,
+    'max_timeout': 120.0
+}
+
+
+class LLMTimeout(Exception):
+    """Raised when an LLM call (including any hedge) exceeds its adaptive timeout"""
+
+
+def configure(enabled: bool = True, percentile: float = 0.95, min_samples: int = 20, window: int = 200,
+              budget_ratio: float = 0.1, budget_burst: int = 3, timeout_multiplier: float = 3.0,
+              min_timeout: float = 10.0, max_timeout: float = 120.0):
+    """Apply hedging settings (called once at startup from config.py values)"""
+    _settings.update(enabled=enabled, percentile=percentile, min_samples=max(1, min_samples),
+                     window=max(min_samples, window), budget_ratio=budget_ratio, budget_burst=budget_burst,
+                     timeout_multiplier=timeout_multiplier, min_timeout=min_timeout, max_timeout=max_timeout)
+    _budget.reset()
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LatencyTracker:
+    """Sliding window of recent latencies per key"""
+
+    def __init__(self):
+        self.samples: Dict[str, Deque[float]] = {}
+        self.lock = threading.Lock()
+
+    def record(self, key: str, seconds: float):
+        with self.lock:
+            window = self.samples.get(key)
+            if window is None or window.maxlen != _settings['window']:
+                window = self.samples[key] = deque(window or (), maxlen=_settings['window'])
+            window.append(seconds)
+
+    def percentile(self, key: str, q: float) -> Optional[float]:
+        """The q-quantile of key's recent latencies, or None with fewer than min_samples"""
+        with self.lock:
+            values = list(self.samples.get(key, ()))
+        if len(values) < _settings['min_samples']:
+            return None
+        return _percentile(values, q)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        with self.lock:
+            samples = {key: list(values) for key, values in self.samples.items()}
+        return {
+            key: {
+                'samples': len(values),
+                'p50': _percentile(values, 0.5),
+                'p95': _percentile(values, 0.95),
+                'p99': _percentile(values, 0.99)
+            }
+            for key, values in samples.items() if values
+        }
+
+
+class HedgeBudget:
+    """Token bucket: every call adds budget_ratio tokens (up to budget_burst), every hedge spends one"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tokens = 0.0
+        self.calls = 0
+        self.hedges = 0
+
+    def reset(self):
+        with self.lock:
+            self.tokens = float(_settings['budget_burst'])
+
+    def on_call(self):
+        with self.lock:
+            self.calls += 1
+            self.tokens = min(float(_settings['budget_burst']), self.tokens + _settings['budget_ratio'])
+
+    def try_acquire(self) -> bool:
+        with self.lock:
+            if self.tokens < 1.0:
+                return False
+            self.tokens -= 1.0
+            self.hedges += 1
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'calls': self.calls,
+                'hedges': self.hedges,
+                'hedge_ratio': self.hedges / self.calls if self.calls else 0.0,
+                'tokens': self.tokens
+            }
+
+
+_tracker = LatencyTracker()
+_budget = HedgeBudget()
+_budget.reset()
+
+
+def hedge_delay(key: str) -> Optional[float]:
+    """Seconds after which a call of this kind gets a hedge, or None if hedging is off or undecided"""
+    if not _settings['enabled']:
+        return None
+    return _tracker.percentile(key, _settings['percentile'])
+
+
+def timeout_for(key: str, max_timeout: Optional[float] = None) -> float:
+    """Adaptive timeout for a call of this kind; max_timeout lowers the configured ceiling"""
+    ceiling = _settings['max_timeout'] if max_timeout is None else min(max_timeout, _settings['max_timeout'])
+    p99 = _tracker.percentile(key, 0.99)
+    if p99 is None:
+        return ceiling
+    return min(ceiling, max(min(_settings['min_timeout'], ceiling), p99 * _settings['timeout_multiplier']))
+
+
+async def run_hedged(call_type: str, make_attempt: Callable[[Callable[[], bool]], Awaitable[Any]],
+                     streaming: bool = False, max_timeout: Optional[float] = None, slots=None) -> Any:
+    """
+    Run make_attempt(claim) with hedging and an adaptive timeout and return the winning result.
+    Streaming attempts call claim() before passing on each chunk: the first attempt to claim wins
+    (the others are cancelled) and claim() returns False to any attempt that has lost.
+    max_timeout, when given, caps the adaptive timeout for this call. slots, when given, is the
+    LLMScheduler running the call: a hedge is only sent if it can take one of its concurrency slots.
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    first_token_key = f"{call_type}:first_token"
+    delay = hedge_delay(first_token_key if streaming else call_type)
+    deadline = start + timeout_for(call_type, max_timeout)
+    state = {'winner': None}
+    tasks: List[asyncio.Task] = []
+
+    def claimer(task_index: int) -> Callable[[], bool]:
+        def claim() -> bool:
+            if state['winner'] is None:
+                state['winner'] = task_index
+                _tracker.record(first_token_key, loop.time() - start)
+                for index, task in enumerate(tasks):
+                    if index != task_index:
+                        task.cancel()
+            return state['winner'] == task_index
+        return claim
+
+    def record_unfinished():
+        # Censored samples: the call (or its first token) took at least this long
+        elapsed = loop.time() - start
+        _tracker.record(call_type, elapsed)
+        if streaming and state['winner'] is None:
+            _tracker.record(first_token_key, elapsed)
+
+    async def hedged_attempt(claim):
+        try:
+            return await make_attempt(claim)
+        finally:
+            slots.release_slot()
+
+    def launch(reserved: bool = False):
+        attempt = hedged_attempt if reserved else make_attempt
+        task = asyncio.ensure_future(attempt(claimer(len(tasks))))
+        # Losing attempts are cancelled or fail unobserved; retrieve their outcome so asyncio doesn't log it
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        tasks.append(task)
+
+    _budget.on_call()
+    launch()
+    hedge_decided = delay is None
+    try:
+        while True:
+            succeeded = [task for task in tasks if task.done() and not task.cancelled() and task.exception() is None]
+            if succeeded:
+                winner = succeeded[0]
+                break
+            pending = [task for task in tasks if not task.done()]
+            if not pending:
+                failed = next((task for task in tasks if not task.cancelled()), tasks[0])
+                record_unfinished()
+                return failed.result()  # Re-raises the attempt's error
+
+            now = loop.time()
+            if now >= deadline:
+                LLM_TIMEOUTS.inc(call_type=call_type)
+                record_unfinished()
+                raise LLMTimeout(f"{call_type} LLM call timed out after {now - start:.1f}s")
+            wake_at = deadline if hedge_decided else min(deadline, start + delay)
+            await asyncio.wait(pending, timeout=max(0.0, wake_at - now), return_when=asyncio.FIRST_COMPLETED)
+
+            if not hedge_decided and loop.time() >= start + delay and not any(task.done() for task in tasks):
+                hedge_decided = True
+                if state['winner'] is not None:
+                    continue  # Already streaming; a duplicate could not catch up
+                if slots is not None and not await slots.reserve_slot():
+                    LLM_HEDGES.inc(call_type=call_type, outcome='no_capacity')
+                elif _budget.try_acquire():
+                    LLM_HEDGES.inc(call_type=call_type, outcome='sent')
+                    launch(reserved=slots is not None)
+                else:
+                    if slots is not None:
+                        slots.release_slot()
+                    LLM_HEDGES.inc(call_type=call_type, outcome='over_budget')
+
+        if len(tasks) > 1:
+            LLM_HEDGES.inc(call_type=call_type, outcome='hedge_won' if winner is not tasks[0] else 'primary_won')
+        _tracker.record(call_type, loop.time() - start)
+        return winner.result()
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+def stats() -> Dict[str, Any]:
+    """Latency percentiles, current hedge delay and timeout per call type, and hedge budget usage"""
+    latencies = _tracker.summary()
+    for key, summary in latencies.items():
+        summary['hedge_after'] = hedge_delay(key)
+        if not key.endswith(':first_token'):
+            summary['timeout'] = timeout_for(key)
+    return {
+        'pid': os.getpid(),
+        'enabled': _settings['enabled'],
+        'percentile': _settings['percentile'],
+        'budget_ratio': _settings['budget_ratio'],
+        'budget': _budget.stats(),
+        'call_types': latencies
+    }
@@ -0,0 +1,190 @@
+"""
+Asynchronous LLM call scheduler.
+
+All LLM calls run as coroutines (ainvoke / astream) on one background event
+loop per process. A fixed number of worker tasks pull calls from a priority
+queue, which caps how many requests hit the model provider at once and lets
+interactive calls overtake background work. A worker takes one of
+max_concurrency slots for each call, and so does a hedged duplicate of a slow
+call (see services/llm_hedging.py) while one is free; a worker whose slot a
+hedge holds waits for it before starting its next call. The queue is bounded:
+when it is full new calls are rejected with LLMQueueFull, and the API layer
+sheds load (503) before starting work it could not finish.
+
+Synchronous code submits with run(); async code awaits submit_async().
+"""
+import asyncio
+import contextvars
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Optional
+
+from .metrics import LLM_IN_FLIGHT, LLM_QUEUE_DEPTH, LLM_QUEUE_REJECTED, LLM_QUEUE_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Lower numbers are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_DEFAULT = 1
+PRIORITY_BACKGROUND = 2
+
+_settings = {
+    'max_concurrency': 8,
+    'max_queue': 64
+}
+
+_priority: contextvars.ContextVar = contextvars.ContextVar('llm_priority', default=PRIORITY_DEFAULT)
+
+
+class LLMQueueFull(Exception):
+    """Raised when the LLM queue is at capacity and a call cannot be accepted"""
+
+
+def configure(max_concurrency: int = 8, max_queue: int = 64):
+    """Apply scheduler settings (called once at startup from config.py values)"""
+    _settings.update(max_concurrency=max(1, max_concurrency), max_queue=max(0, max_queue))
+
+
+@contextmanager
+def llm_priority(priority: int):
+    """Run LLM calls made inside this block at the given priority"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+class LLMScheduler:
+    """Priority queue plus a fixed pool of worker coroutines on a dedicated event loop thread"""
+
+    def __init__(self, max_concurrency: int, max_queue: int):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.loop = asyncio.new_event_loop()
+        self.queue: Optional[asyncio.PriorityQueue] = None
+        self.slots: Optional[asyncio.Semaphore] = None
+        self.sequence = itertools.count()
+        self.pending = 0
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        ready = threading.Event()
+        self.thread = threading.Thread(target=self._run_loop, args=(ready,), name='llm-scheduler', daemon=True)
+        self.thread.start()
+        ready.wait()
+
+    def _run_loop(self, ready: threading.Event):
+        asyncio.set_event_loop(self.loop)
+        self.queue = asyncio.PriorityQueue()
+        self.slots = asyncio.Semaphore(self.max_concurrency)
+        for index in range(self.max_concurrency):
+            self.loop.create_task(self._worker(index))
+        self.loop.call_soon(ready.set)
+        self.loop.run_forever()
+
+    async def _worker(self, index: int):
+        while True:
+            priority, _, job = await self.queue.get()
+            coro_factory, future, label, enqueued_at = job
+            # Idle workers hold no slot, so a hedge can take one; this worker then waits for it back
+            async with self.slots:
+                with self.lock:
+                    self.pending -= 1
+                    self.in_flight += 1
+                    LLM_QUEUE_DEPTH.set(self.pending)
+                    LLM_IN_FLIGHT.set(self.in_flight)
+                LLM_QUEUE_WAIT_SECONDS.observe(time.perf_counter() - enqueued_at, call_type=label)
+                try:
+                    if future.set_running_or_notify_cancel():
+                        try:
+                            future.set_result(await coro_factory())
+                        except BaseException as e:  # Deliver every failure (including cancellation) to the caller
+                            future.set_exception(e)
+                finally:
+                    with self.lock:
+                        self.in_flight -= 1
+                        LLM_IN_FLIGHT.set(self.in_flight)
+
+    async def reserve_slot(self) -> bool:
+        """
+        Take a concurrency slot for a call started on the loop outside the queue (a hedge) if one
+        is free right now; a reserved slot must be given back with release_slot()
+        """
+        if self.slots.locked():
+            return False
+        await self.slots.acquire()  # Free, so this returns without suspending
+        with self.lock:
+            self.in_flight += 1
+            LLM_IN_FLIGHT.set(self.in_flight)
+        return True
+
+    def release_slot(self):
+        with self.lock:
+            self.in_flight -= 1
+            LLM_IN_FLIGHT.set(self.in_flight)
+        self.slots.release()
+
+    def saturated(self) -> bool:
+        """True when the queue is full and new work should be shed"""
+        return self.pending >= self.max_queue
+
+    def submit(self, coro_factory: Callable[[], Awaitable[Any]], priority: Optional[int] = None,
+               label: str = '') -> Future:
+        """Queue a coroutine factory; returns a concurrent.futures.Future for its result"""
+        with self.lock:
+            if self.pending >= self.max_queue:
+                LLM_QUEUE_REJECTED.inc(call_type=label)
+                raise LLMQueueFull(f"LLM queue is full ({self.pending} waiting, {self.in_flight} running)")
+            self.pending += 1
+            LLM_QUEUE_DEPTH.set(self.pending)
+
+        future: Future = Future()
+        priority = current_priority() if priority is None else priority
+        job = (coro_factory, future, label, time.perf_counter())
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, (priority, next(self.sequence), job))
+        return future
+
+    def run(self, coro_factory: Callable[[], Awaitable[Any]], priority: Optional[int] = None,
+            label: str = '') -> Any:
+        """Submit and block the calling thread until the call completes"""
+        if threading.current_thread() is self.thread:
+            raise RuntimeError("LLMScheduler.run() called from the scheduler loop; await submit_async() instead")
+        return self.submit(coro_factory, priority, label).result()
+
+    async def submit_async(self, coro_factory: Callable[[], Awaitable[Any]], priority: Optional[int] = None,
+                           label: str = '') -> Any:
+        """Submit from any event loop and await the result"""
+        return await asyncio.wrap_future(self.submit(coro_factory, priority, label))
+
+    def stats(self):
+        return {
+            'max_concurrency': self.max_concurrency,
+            'max_queue': self.max_queue,
+            'queued': self.pending,
+            'in_flight': self.in_flight
+        }
+
+
+_scheduler: Optional[LLMScheduler] = None
+_scheduler_pid = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    """Process-wide scheduler, created on first use (and again after a fork)"""
+    global _scheduler, _scheduler_pid
+    if _scheduler is None or _scheduler_pid != os.getpid():
+        with _scheduler_lock:
+            if _scheduler is None or _scheduler_pid != os.getpid():
+                _scheduler = LLMScheduler(_settings['max_concurrency'], _settings['max_queue'])
+                _scheduler_pid = os.getpid()
+    return _scheduler
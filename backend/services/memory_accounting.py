@@ -0,0 +1,260 @@
+"""
+Memory accounting for caches, conversation memory and the process as a whole.
+
+Caches and conversation memories register themselves here by name; report()
+walks them to estimate bytes per cache and entry type, the symbols currently
+cached and how conversation memory has grown since startup. tracemalloc top
+allocators are included when enabled. The same numbers are published as
+gauges for /api/metrics and can be logged periodically so leaks are visible
+long before the process is OOM-killed.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime
+from types import FunctionType, MethodType, ModuleType
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .metrics import (MEMORY_CACHE_BYTES, MEMORY_CACHE_ENTRIES, MEMORY_CONVERSATION_BYTES,
+                      PROCESS_RESIDENT_MEMORY_BYTES)
+
+logger = logging.getLogger(__name__)
+
+_settings = {
+    'tracemalloc_top_n': 15,
+    'log_interval_seconds': 0
+}
+
+_caches: Dict[str, Tuple[Callable[[], Dict], Callable[[str], Tuple[str, Optional[str]]]]] = {}
+_conversations: Dict[str, Any] = {}
+_conversation_history: Dict[str, deque] = {}
+_lock = threading.Lock()
+_logger_thread = None
+
+# Objects deep_sizeof does not descend into (shared, not owned by the container)
+_OPAQUE_TYPES = (type, ModuleType, FunctionType, MethodType)
+
+
+def deep_sizeof(obj: Any) -> int:
+    """Approximate retained size of obj and everything it references, counting shared objects once"""
+    seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, _OPAQUE_TYPES):
+            continue
+        seen.add(id(current))
+
+        # pandas and numpy know their own buffer sizes far better than getsizeof does
+        if hasattr(current, 'memory_usage') and hasattr(current, 'index'):
+            try:
+                usage = current.memory_usage(deep=True)
+                total += int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+                continue
+            except Exception:
+                pass
+        if hasattr(current, 'nbytes') and hasattr(current, 'dtype'):
+            total += int(current.nbytes)
+            continue
+
+        try:
+            total += sys.getsizeof(current)
+        except TypeError:
+            continue
+
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset, deque)):
+            stack.extend(current)
+        elif hasattr(current, '__dict__') and not isinstance(current, (str, bytes)):
+            stack.append(vars(current))
+    return total
+
+
+def _split_key(key: str) -> Tuple[str, Optional[str]]:
+    """Default key layout: <entry_type>_<SYMBOL>"""
+    entry_type, _, symbol = key.rpartition('_')
+    return (entry_type, symbol.upper()) if entry_type and symbol else ('other', None)
+
+
+def track_cache(name: str, cache: Dict[str, Any],
+                parse_key: Optional[Callable[[str], Tuple[str, Optional[str]]]] = None):
+    """
+    Account for a cache of (data, timestamp) entries (a dict or shared_cache). parse_key maps a key to
+    (entry type, symbol or None for data not tied to a symbol); "<entry_type>_<SYMBOL>" by default.
+    """
+    with _lock:
+        _caches[name] = (lambda: cache, parse_key or _split_key)
+
+
+def track_conversation(name: str, memory: Any):
+    """
+    Account for a LangChain conversation memory (anything with chat_memory.messages), or a
+    zero-argument callable returning it (None while it hasn't been created)
+    """
+    with _lock:
+        _conversations[name] = memory
+        _conversation_history[name] = deque(maxlen=48)
+
+
+def _cache_report(cache: Dict[str, Any], parse_key: Callable[[str], Tuple[str, Optional[str]]]) -> Dict[str, Any]:
+    entry_types: Dict[str, Dict[str, Any]] = {}
+    symbols = set()
+    for key, entry in list(cache.items()):
+        entry_type, symbol = parse_key(str(key))
+        stats = entry_types.setdefault(entry_type, {'entries': 0, 'bytes': 0})
+        stats['entries'] += 1
+        stats['bytes'] += deep_sizeof(entry)
+        if symbol:
+            symbols.add(symbol)
+    return {
+        'entries': sum(s['entries'] for s in entry_types.values()),
+        'bytes': sum(s['bytes'] for s in entry_types.values()),
+        'symbols': sorted(symbols),
+        'entry_types': entry_types
+    }
+
+
+def _conversation_report(name: str, memory: Any) -> Dict[str, Any]:
+    messages = list(getattr(getattr(memory, 'chat_memory', None), 'messages', []) or [])
+    size = deep_sizeof(messages)
+    history = _conversation_history[name]
+    history.append({'timestamp': datetime.now().isoformat(), 'messages': len(messages), 'bytes': size})
+    first = history[0]
+    return {
+        'messages': len(messages),
+        'bytes': size,
+        'content_chars': sum(len(str(getattr(m, 'content', ''))) for m in messages),
+        'growth_bytes': size - first['bytes'],
+        'growth_since': first['timestamp'],
+        'history': list(history)
+    }
+
+
+def process_memory() -> Dict[str, Any]:
+    """Current and peak resident set size (Linux /proc, falling back to getrusage)"""
+    report = {'rss_bytes': None, 'peak_rss_bytes': None}
+    try:
+        with open('/proc/self/statm') as f:
+            report['rss_bytes'] = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        report['peak_rss_bytes'] = peak if sys.platform == 'darwin' else peak * 1024
+    except (ImportError, OSError):
+        pass
+    return report
+
+
+def tracemalloc_top(limit: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """Top allocating source lines, or None when tracemalloc is not tracing"""
+    if not tracemalloc.is_tracing():
+        return None
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>')
+    ))
+    stats = snapshot.statistics('lineno')[:limit or _settings['tracemalloc_top_n']]
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        'traced_bytes': current,
+        'traced_peak_bytes': peak,
+        'top': [{
+            'location': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            'bytes': stat.size,
+            'blocks': stat.count
+        } for stat in stats]
+    }
+
+
+def report(include_tracemalloc: bool = True) -> Dict[str, Any]:
+    """Full memory report; also refreshes the memory gauges"""
+    with _lock:
+        caches = dict(_caches)
+        conversations = dict(_conversations)
+
+    cache_reports = {name: _cache_report(get_cache(), parse_key) for name, (get_cache, parse_key) in caches.items()}
+    conversation_reports = {
+        name: _conversation_report(name, memory() if callable(memory) else memory)
+        for name, memory in conversations.items()
+    }
+    process = process_memory()
+
+    for name, cache in cache_reports.items():
+        for entry_type, stats in cache['entry_types'].items():
+            MEMORY_CACHE_BYTES.set(stats['bytes'], cache=name, entry_type=entry_type)
+            MEMORY_CACHE_ENTRIES.set(stats['entries'], cache=name, entry_type=entry_type)
+    for name, conversation in conversation_reports.items():
+        MEMORY_CONVERSATION_BYTES.set(conversation['bytes'], memory=name)
+    if process['rss_bytes'] is not None:
+        PROCESS_RESIDENT_MEMORY_BYTES.set(process['rss_bytes'])
+
+    all_symbols = set()
+    for cache in cache_reports.values():
+        all_symbols.update(cache['symbols'])
+
+    result = {
+        'timestamp': datetime.now().isoformat(),
+        'process': process,
+        'caches': cache_reports,
+        'cached_symbols': len(all_symbols),
+        'cache_bytes_total': sum(c['bytes'] for c in cache_reports.values()),
+        'conversations': conversation_reports
+    }
+    if include_tracemalloc:
+        result['tracemalloc'] = tracemalloc_top()
+    return result
+
+
+def _log_summary():
+    summary = report(include_tracemalloc=False)
+    conversations = ", ".join(f"{name}={c['messages']} msgs/{c['bytes']} B"
+                              for name, c in summary['conversations'].items()) or "none"
+    logger.info("Memory: rss=%s B, caches=%s B across %d symbols, conversations: %s",
+                summary['process']['rss_bytes'], summary['cache_bytes_total'],
+                summary['cached_symbols'], conversations)
+
+
+def _start_logger(log_interval_seconds: float):
+    global _logger_thread
+
+    def run():
+        while True:
+            time.sleep(log_interval_seconds)
+            try:
+                _log_summary()
+            except Exception as e:
+                logger.warning(f"Memory accounting failed: {str(e)}")
+
+    _logger_thread = threading.Thread(target=run, name='memory-accounting', daemon=True)
+    _logger_thread.start()
+
+
+def _restart_logger_after_fork():
+    """Threads do not survive fork: a worker forked from a preloaded app starts its own memory log"""
+    global _logger_thread
+    if _logger_thread is not None:
+        _start_logger(_settings['log_interval_seconds'])
+
+
+os.register_at_fork(after_in_child=_restart_logger_after_fork)
+
+
+def configure(tracemalloc_enabled: bool = False, tracemalloc_frames: int = 1, tracemalloc_top_n: int = 15,
+              log_interval_seconds: float = 0):
+    """Apply settings: optionally start tracemalloc and the periodic memory log"""
+    _settings.update(tracemalloc_top_n=tracemalloc_top_n, log_interval_seconds=log_interval_seconds)
+    if tracemalloc_enabled and not tracemalloc.is_tracing():
+        tracemalloc.start(tracemalloc_frames)
+
+    if log_interval_seconds > 0 and _logger_thread is None:
+        _start_logger(log_interval_seconds)
@@ -0,0 +1,412 @@
+"""
+Minimal in-process metrics registry with Prometheus text exposition.
+
+Counters and histograms are labelled, thread-safe and cheap enough to sit on
+every hot path. The whole registry is rendered by render_prometheus() for the
+/api/metrics endpoint.
+
+Each worker process has its own registry. When the caches are shared between
+workers (CACHE_BACKEND = "sqlite", see services/shared_cache.py) every worker
+publishes a snapshot of its registry every PUBLISH_INTERVAL_SECONDS, and the
+worker answering a scrape renders the sum over all live workers' snapshots
+(gauges use their multiprocess_mode), so the scrape does not depend on which
+worker answers it. A worker's last snapshot is dropped SNAPSHOT_TTL_SECONDS
+after it stops publishing, after which its counts leave the totals (seen by
+Prometheus as a counter reset).
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from . import shared_cache
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, spanning cache hits up to long LLM generations
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Duration buckets in seconds for background jobs, which run for minutes
+JOB_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+# Size buckets in bytes for prompt payloads
+SIZE_BUCKETS = (1024, 4096, 8192, 16384, 32768, 65536, 131072, 262144, 524288, 1048576)
+
+# Token-count buckets for prompts
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+
+# How often each worker publishes its registry to the shared metrics cache
+PUBLISH_INTERVAL_SECONDS = 5.0
+
+# How long the snapshot of a worker that stopped publishing is still counted
+SNAPSHOT_TTL_SECONDS = 60.0
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple, extra: Optional[Dict[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra.items())
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self, values: Optional[Dict[Tuple, Any]] = None) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples(self.snapshot() if values is None else values))
+        return lines
+
+    def snapshot(self) -> Dict[Tuple, Any]:
+        """Copy of the current values per label set"""
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, snapshots: List[Dict[Tuple, Any]]) -> Dict[Tuple, Any]:
+        """Combine the snapshots of several processes (summed)"""
+        merged: Dict[Tuple, Any] = {}
+        for values in snapshots:
+            for key, value in values.items():
+                merged[key] = merged.get(key, 0) + value
+        return merged
+
+    def _samples(self, values: Dict[Tuple, Any]) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(values.items())]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """
+    Value that can go up and down (sizes, counts of live objects). Across worker
+    processes it is summed (multiprocess_mode='sum') or the largest value is
+    reported ('max', for values every worker measures the same way)
+    """
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 multiprocess_mode: str = 'sum'):
+        super().__init__(name, documentation, labelnames)
+        self.multiprocess_mode = multiprocess_mode
+        self._values: Dict[Tuple, float] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def merge(self, snapshots: List[Dict[Tuple, Any]]) -> Dict[Tuple, Any]:
+        if self.multiprocess_mode != 'max':
+            return super().merge(snapshots)
+        merged: Dict[Tuple, Any] = {}
+        for values in snapshots:
+            for key, value in values.items():
+                merged[key] = max(merged.get(key, value), value)
+        return merged
+
+
+class Histogram(_Metric):
+    """Bucketed distribution of observed values (latencies in seconds)"""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series: Dict[Tuple, Dict] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+                self._series[key] = series
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][index] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the enclosed block, including when it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self) -> Dict[Tuple, Any]:
+        with self._lock:
+            return {key: dict(series, counts=list(series['counts'])) for key, series in self._series.items()}
+
+    def merge(self, snapshots: List[Dict[Tuple, Any]]) -> Dict[Tuple, Any]:
+        merged: Dict[Tuple, Any] = {}
+        for values in snapshots:
+            for key, series in values.items():
+                total = merged.setdefault(key, {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0})
+                total['counts'] = [a + b for a, b in zip(total['counts'], series['counts'])]
+                total['sum'] += series['sum']
+                total['count'] += series['count']
+        return merged
+
+    def _samples(self, values: Dict[Tuple, Any]) -> List[str]:
+        lines = []
+        for key, series in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series['counts']):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, {'le': _format_value(bound)})
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+class Registry:
+    """Collection of all metrics in this process"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric):
+        self._metrics.append(metric)
+
+    def snapshot(self) -> Dict[str, Dict[Tuple, Any]]:
+        """Current values of every metric, by metric name"""
+        return {metric.name: metric.snapshot() for metric in self._metrics}
+
+    def render(self, snapshots: Optional[List[Dict[str, Dict[Tuple, Any]]]] = None) -> str:
+        """Render this registry, or the merge of several processes' registry snapshots"""
+        lines = []
+        for metric in self._metrics:
+            if snapshots is None:
+                lines.extend(metric.render())
+            else:
+                lines.extend(metric.render(metric.merge([s.get(metric.name, {}) for s in snapshots])))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+_snapshots = None
+_publisher_pid = None
+_publisher_lock = threading.Lock()
+
+
+def _shared_snapshots():
+    """Registry snapshots of every worker process, keyed by pid (created on first use, after configuration)"""
+    global _snapshots
+    if _snapshots is None:
+        _snapshots = shared_cache.create('metrics', ttl_seconds=SNAPSHOT_TTL_SECONDS)
+    return _snapshots
+
+
+def publish():
+    """Store this process's registry snapshot for the other workers' scrapes"""
+    _shared_snapshots().set(str(os.getpid()), REGISTRY.snapshot())
+
+
+def _publish_periodically():
+    while True:
+        time.sleep(PUBLISH_INTERVAL_SECONDS)
+        try:
+            publish()
+        except Exception as e:
+            logger.warning(f"Failed to publish metrics snapshot: {str(e)}")
+
+
+def start_publishing():
+    """Start this process's snapshot publisher on first use (and again after a fork); no-op without shared caches"""
+    global _publisher_pid
+    if _publisher_pid == os.getpid() or not shared_cache.is_shared():
+        return
+    with _publisher_lock:
+        if _publisher_pid != os.getpid():
+            threading.Thread(target=_publish_periodically, name='metrics-publisher', daemon=True).start()
+            _publisher_pid = os.getpid()
+
+
+def render_prometheus() -> str:
+    """
+    Render every registered metric in Prometheus text format (version 0.0.4),
+    summed over all worker processes when the caches are shared
+    """
+    if not shared_cache.is_shared():
+        return REGISTRY.render()
+    start_publishing()
+    publish()
+    return REGISTRY.render([snapshot for _, snapshot in _shared_snapshots().items()])
+
+
+# =============================================================================
+# APPLICATION METRICS
+# =============================================================================
+
+HTTP_REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', 'Latency of API requests', ['endpoint', 'method', 'status'])
+
+ORCHESTRATOR_PHASE_SECONDS = Histogram(
+    'orchestrator_phase_duration_seconds', 'Latency of each orchestrate_analysis phase', ['phase'])
+
+SYMBOL_RESOLUTION_SECONDS = Histogram(
+    'symbol_resolution_duration_seconds', 'Time spent extracting and validating stock symbols', ['agent'])
+
+DATA_SECTION_SECONDS = Histogram(
+    'data_section_duration_seconds', 'Latency of each data service section', ['section'])
+
+SCRAPER_SECONDS = Histogram(
+    'scraper_duration_seconds', 'Latency of each web scraper (fetch and parse)', ['source'])
+
+SCRAPER_RESULTS = Counter(
+    'scraper_results_total', 'Web scraper outcomes', ['source', 'outcome'])
+
+LLM_CALL_SECONDS = Histogram(
+    'llm_call_duration_seconds', 'Latency of LLM calls', ['agent', 'call_type'])
+
+LLM_CALLS = Counter(
+    'llm_calls_total', 'LLM calls by outcome', ['agent', 'call_type', 'outcome'])
+
+CACHE_REQUESTS = Counter(
+    'cache_requests_total', 'Data service cache lookups', ['cache', 'result'])
+
+PREFETCH_REQUESTS = Counter(
+    'prefetch_requests_total', 'Speculative data prefetches by outcome (started, no_symbol, and ran_inline: '
+    'a prefetch task the request ran itself because the pool had not started it)', ['outcome'])
+
+LLM_FIRST_TOKEN_SECONDS = Histogram(
+    'llm_first_token_seconds', 'Time to first streamed token of LLM calls', ['agent', 'call_type'])
+
+LLM_CACHE_REQUESTS = Counter(
+    'llm_cache_requests_total', 'LLM response cache lookups', ['call_type', 'result'])
+
+LLM_PROMPT_BYTES = Histogram(
+    'llm_prompt_bytes', 'Size of prompts sent to the LLM', ['agent', 'call_type'], buckets=SIZE_BUCKETS)
+
+LLM_PROMPT_TOKENS = Histogram(
+    'llm_prompt_tokens', 'Token count of prompts sent to the LLM', ['agent', 'call_type'], buckets=TOKEN_BUCKETS)
+
+# With shared caches every worker measures the same market data cache, so the largest report is kept
+MEMORY_CACHE_BYTES = Gauge(
+    'memory_cache_bytes', 'Approximate bytes held per cache and entry type', ['cache', 'entry_type'],
+    multiprocess_mode='max')
+
+MEMORY_CACHE_ENTRIES = Gauge(
+    'memory_cache_entries', 'Entries held per cache and entry type', ['cache', 'entry_type'],
+    multiprocess_mode='max')
+
+MEMORY_CONVERSATION_BYTES = Gauge(
+    'memory_conversation_bytes', 'Approximate bytes held by agent conversation memory', ['memory'])
+
+PROCESS_RESIDENT_MEMORY_BYTES = Gauge(
+    'process_resident_memory_bytes', 'Resident set size of the server processes')
+
+LLM_QUEUE_WAIT_SECONDS = Histogram(
+    'llm_queue_wait_seconds', 'Time LLM calls wait in the scheduler queue', ['call_type'])
+
+LLM_QUEUE_DEPTH = Gauge(
+    'llm_queue_depth', 'LLM calls waiting for a scheduler slot')
+
+LLM_IN_FLIGHT = Gauge(
+    'llm_in_flight', 'LLM calls currently running')
+
+LLM_QUEUE_REJECTED = Counter(
+    'llm_queue_rejected_total', 'LLM calls rejected because the queue was full', ['call_type'])
+
+LLM_HEDGES = Counter(
+    'llm_hedges_total', 'Hedged LLM requests: sent, over_budget and no_capacity (not sent), hedge_won, primary_won',
+    ['call_type', 'outcome'])
+
+LLM_TIMEOUTS = Counter(
+    'llm_timeouts_total', 'LLM calls that exceeded their adaptive timeout', ['call_type'])
+
+LLM_TIER_CALLS = Counter(
+    'llm_tier_calls_total', 'LLM calls per model tier by outcome', ['tier', 'model', 'outcome'])
+
+LLM_TIER_SECONDS = Histogram(
+    'llm_tier_duration_seconds', 'Latency of LLM calls per model tier', ['tier'])
+
+LLM_TIER_TOKENS = Counter(
+    'llm_tier_tokens_total', 'Prompt and completion tokens per model tier', ['tier', 'kind'])
+
+REPORT_SECTION_SECONDS = Histogram(
+    'report_section_duration_seconds', 'Generation time of each report section, including retries', ['section'])
+
+REPORT_SECTION_ATTEMPTS = Counter(
+    'report_section_attempts_total', 'Report section generation attempts by outcome', ['section', 'outcome'])
+
+REPORT_SECTION_REUSE = Counter(
+    'report_section_reuse_total', 'Report sections reused from a previous run with identical inputs, or regenerated',
+    ['section', 'result'])
+
+ANALYSIS_JOBS = Counter(
+    'analysis_jobs_total', 'Analysis jobs: submitted, attached (duplicate), rejected (queue full) and by final status',
+    ['outcome'])
+
+ANALYSIS_JOB_QUEUE_SECONDS = Histogram(
+    'analysis_job_queue_seconds', 'Time analysis jobs wait for a job worker', buckets=JOB_BUCKETS)
+
+ANALYSIS_JOB_SECONDS = Histogram(
+    'analysis_job_duration_seconds', 'Run time of analysis jobs by final status', ['outcome'], buckets=JOB_BUCKETS)
+
+BATCH_ITEMS = Counter(
+    'batch_items_total', 'Batch items (e.g. symbols of /api/analyze-batch) by outcome', ['kind', 'outcome'])
+
+BATCH_ITEM_SECONDS = Histogram(
+    'batch_item_duration_seconds', 'Run time of each batch item', ['kind'], buckets=JOB_BUCKETS)
+
+CACHE_WARM_ITEMS = Counter(
+    'cache_warm_items_total', 'Watchlist data sections visited by the cache warmer by outcome '
+    '(warmed, already_warm, failed, over_budget)', ['item', 'outcome'])
+
+CACHE_WARM_COVERAGE = Gauge(
+    'cache_warm_coverage_ratio', 'Share of watchlist data sections currently warm in the data cache', ['item'],
+    multiprocess_mode='max')
+
+HTTP_RESPONSE_BYTES = Counter(
+    'http_response_bytes_total', 'Response body bytes before (original) and after (sent) content encoding',
+    ['encoding', 'form'])
@@ -0,0 +1,164 @@
+"""
+Dependency-graph executor for orchestration phases.
+
+Each phase names the phases whose results it needs. A phase starts as soon as
+all of its dependencies have finished, on its own worker thread, so data-only
+work overlaps with LLM generation instead of waiting behind it. Worker threads
+run in a copy of the caller's context (request trace, token sink, LLM
+priority), and current_phase() tells code running inside a phase which one it
+is in.
+
+arun() runs the same graph on the caller's event loop: a phase whose func is
+a coroutine function is awaited there, any other phase runs on a worker thread
+through asyncio.to_thread.
+
+After run() or arun(), timings() reports each phase's start/end offsets and
+critical_path() the chain of phases that determined the total duration.
+"""
+import asyncio
+import contextvars
+import inspect
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .tracing import propagate
+
+_current_phase: contextvars.ContextVar = contextvars.ContextVar('current_phase', default=None)
+
+
+def current_phase() -> Optional[str]:
+    """Name of the phase the calling code runs in, if any"""
+    return _current_phase.get()
+
+
+class Phase:
+    """A named unit of work; func receives a dict of its dependencies' results"""
+
+    __slots__ = ('name', 'func', 'deps')
+
+    def __init__(self, name: str, func: Callable[[Dict[str, Any]], Any], deps: Sequence[str] = ()):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+
+
+class PhaseGraph:
+    """Runs phases in dependency order, each as soon as its inputs are ready"""
+
+    def __init__(self, phases: Sequence[Phase]):
+        self.phases = {phase.name: phase for phase in phases}
+        for phase in phases:
+            missing = [dep for dep in phase.deps if dep not in self.phases]
+            if missing:
+                raise ValueError(f"Phase '{phase.name}' depends on unknown phases: {', '.join(missing)}")
+        self._timings: Dict[str, Dict[str, float]] = {}
+
+    def _run_phase(self, phase: Phase, inputs: Dict[str, Any], started_at: float) -> Any:
+        token = _current_phase.set(phase.name)
+        start = time.perf_counter()
+        try:
+            return phase.func(inputs)
+        finally:
+            end = time.perf_counter()
+            self._timings[phase.name] = {
+                'start': start - started_at,
+                'end': end - started_at,
+                'seconds': end - start
+            }
+            _current_phase.reset(token)
+
+    def run(self) -> Dict[str, Any]:
+        """Execute every phase and return their results by name; the first phase error is re-raised"""
+        results: Dict[str, Any] = {}
+        pending = dict(self.phases)
+        running = {}
+        started_at = time.perf_counter()
+        self._timings = {}
+
+        with ThreadPoolExecutor(max_workers=max(len(pending), 1), thread_name_prefix='phase') as pool:
+            while pending or running:
+                for name, phase in list(pending.items()):
+                    if all(dep in results for dep in phase.deps):
+                        inputs = {dep: results[dep] for dep in phase.deps}
+                        future = pool.submit(propagate(self._run_phase), phase, inputs, started_at)
+                        running[future] = name
+                        del pending[name]
+                if not running:
+                    raise ValueError(f"Dependency cycle between phases: {', '.join(pending)}")
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        for other in running:
+                            other.cancel()
+                        raise error
+                    results[name] = future.result()
+
+        return results
+
+    async def _arun_phase(self, phase: Phase, inputs: Dict[str, Any], started_at: float) -> Any:
+        # Runs as its own task, so setting the phase does not leak into sibling phases
+        _current_phase.set(phase.name)
+        start = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(phase.func):
+                return await phase.func(inputs)
+            return await asyncio.to_thread(propagate(phase.func), inputs)
+        finally:
+            end = time.perf_counter()
+            self._timings[phase.name] = {
+                'start': start - started_at,
+                'end': end - started_at,
+                'seconds': end - start
+            }
+
+    async def arun(self) -> Dict[str, Any]:
+        """run() on the caller's event loop; the first phase error is re-raised"""
+        results: Dict[str, Any] = {}
+        pending = dict(self.phases)
+        running = {}
+        started_at = time.perf_counter()
+        self._timings = {}
+
+        while pending or running:
+            for name, phase in list(pending.items()):
+                if all(dep in results for dep in phase.deps):
+                    inputs = {dep: results[dep] for dep in phase.deps}
+                    running[asyncio.ensure_future(self._arun_phase(phase, inputs, started_at))] = name
+                    del pending[name]
+            if not running:
+                raise ValueError(f"Dependency cycle between phases: {', '.join(pending)}")
+
+            finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                name = running.pop(task)
+                error = task.exception()
+                if error is not None:
+                    for other in running:
+                        other.cancel()
+                    raise error
+                results[name] = task.result()
+
+        return results
+
+    def timings(self) -> Dict[str, Dict[str, float]]:
+        """Per-phase start/end offsets from the start of run() and duration, in seconds"""
+        return dict(self._timings)
+
+    def critical_path(self) -> List[str]:
+        """
+        Phases on the critical path, first to last: starting from the phase that finished last,
+        repeatedly step back to the dependency that finished last (the one it was waiting for)
+        """
+        if not self._timings:
+            return []
+        path = [max(self._timings, key=lambda name: self._timings[name]['end'])]
+        while True:
+            deps = [dep for dep in self.phases[path[-1]].deps if dep in self._timings]
+            if not deps:
+                break
+            path.append(max(deps, key=lambda name: self._timings[name]['end']))
+        return list(reversed(path))
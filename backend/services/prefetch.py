@@ -0,0 +1,180 @@
+"""
+Speculative market data prefetch.
+
+An analysis request spends its first seconds resolving the ticker and then
+fetching the data snapshot, one section after another, before any LLM call can
+start. start() begins that work the moment a request arrives: the index
+history behind the market context (which needs no symbol) is fetched while the
+symbol is resolved from the raw query, and once the symbol is known the web
+scrape, technical indicators and full snapshot are warmed in parallel. The
+data service's single-flight fetches mean the request's own calls join these
+instead of repeating them.
+
+Downstream code takes the resolved symbol from Prefetch.symbol() rather than
+parsing it back out of generated text.
+
+The pool is shared by all requests and has PREFETCH_MAX_WORKERS threads. When
+a request needs its symbol or snapshot and the task is still queued behind
+other requests' prefetches, the request thread runs it itself instead of
+waiting for a pool thread, so a saturated pool never delays a request beyond
+doing the work without prefetch.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from .metrics import PREFETCH_REQUESTS
+from .tracing import propagate, span
+
+logger = logging.getLogger(__name__)
+
+_settings = {
+    'enabled': True,
+    'max_workers': 8
+}
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def configure(enabled: bool = True, max_workers: int = 8):
+    """Apply prefetch settings (called once at startup from config.py values)"""
+    _settings.update(enabled=enabled, max_workers=max(1, max_workers))
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    """Process-wide worker pool, created on first use (and again after a fork)"""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ThreadPoolExecutor(max_workers=_settings['max_workers'], thread_name_prefix='prefetch')
+                _pool_pid = os.getpid()
+    return _pool
+
+
+class _Task:
+    """Prefetch work run once, by a pool thread or by the request that needs it first"""
+
+    def __init__(self, name: str, func: Callable, *args):
+        self.future: Future = Future()
+        self._lock = threading.Lock()
+        self._claimed = False
+
+        def execute():
+            with span(f'prefetch.{name}'):
+                return func(*args)
+        self._execute = propagate(execute)
+
+    @classmethod
+    def completed(cls, name: str, value: Any) -> "_Task":
+        """A task whose result is already known"""
+        task = cls(name, lambda: value)
+        task._claimed = True
+        task.future.set_running_or_notify_cancel()
+        task.future.set_result(value)
+        return task
+
+    def run(self) -> bool:
+        """Run the work unless another thread already has; True if this call ran it"""
+        with self._lock:
+            if self._claimed:
+                return False
+            self._claimed = True
+        self.future.set_running_or_notify_cancel()
+        try:
+            result = self._execute()
+        except BaseException as e:
+            self.future.set_exception(e)
+        else:
+            self.future.set_result(result)
+        return True
+
+    def result(self) -> Any:
+        """The work's result; runs it in the calling thread if no pool thread has started it yet"""
+        if self.run():
+            PREFETCH_REQUESTS.inc(outcome='ran_inline')
+        return self.future.result()
+
+
+def _submit(name: str, func: Callable, *args) -> _Task:
+    return _schedule(_Task(name, func, *args))
+
+
+def _schedule(task: _Task) -> _Task:
+    _get_pool().submit(task.run)
+    return task
+
+
+class Prefetch:
+    """Handle on a prefetch started for one query"""
+
+    def __init__(self, query: str, symbol_task: _Task, snapshot_task: _Task):
+        self.query = query
+        self._symbol = symbol_task
+        self._snapshot = snapshot_task
+
+    def symbol(self) -> Optional[str]:
+        """The symbol resolved from the query (None if there is none); waits for resolution"""
+        try:
+            return self._symbol.result()
+        except Exception as e:
+            logger.warning(f"Prefetch symbol resolution failed: {str(e)}")
+            return None
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        """The comprehensive data snapshot for symbol() (None without a symbol); waits for the fetch"""
+        try:
+            return self._snapshot.result()
+        except Exception as e:
+            logger.warning(f"Prefetch snapshot failed: {str(e)}")
+            return None
+
+
+def start(query: str, resolve_symbol: Callable[[str], Optional[str]], data_service) -> Optional[Prefetch]:
+    """Start resolving the symbol for query and warming its data; None when prefetch is disabled"""
+    if not _settings['enabled'] or not query:
+        return None
+
+    # The market context is shared by every symbol, so it can start before the symbol is known
+    _submit('market_context', data_service.get_market_context)
+    symbol_task = _submit('symbol_resolution', resolve_symbol, query)
+    return _warm_when_resolved(query, symbol_task, data_service)
+
+
+def start_for_symbol(query: str, symbol: str, data_service) -> Prefetch:
+    """
+    Warm the data of an already known symbol (e.g. one entry of a batch); not speculative, so
+    this runs even when prefetch is disabled. The analysis then skips symbol resolution.
+    """
+    return _warm_when_resolved(query, _Task.completed('symbol_resolution', symbol), data_service)
+
+
+def _warm_when_resolved(query: str, symbol_task: _Task, data_service) -> Prefetch:
+    """Once symbol_task has a symbol, fetch its data sections in parallel"""
+    def fetch_snapshot() -> Optional[Dict[str, Any]]:
+        symbol = symbol_task.result()
+        return data_service.get_comprehensive_stock_data(symbol) if symbol else None
+
+    # Scheduled once the symbol is known, or run by the request if it asks for the snapshot first
+    snapshot_task = _Task('snapshot', fetch_snapshot)
+
+    def warm(resolved: Future):
+        if resolved.exception() is not None:
+            return
+        symbol = resolved.result()
+        if not symbol:
+            PREFETCH_REQUESTS.inc(outcome='no_symbol')
+            return
+        PREFETCH_REQUESTS.inc(outcome='started')
+        # Slow, independent sections first; the snapshot joins them through the single-flight fetches
+        _submit('web_data', data_service.get_enhanced_web_data, symbol)
+        _submit('technical_indicators', data_service.get_technical_indicators, symbol)
+        _schedule(snapshot_task)
+
+    # The callback runs on the thread that resolved the symbol; keep its fetches inside the request's trace
+    symbol_task.future.add_done_callback(propagate(warm))
+    return Prefetch(query, symbol_task, snapshot_task)
@@ -0,0 +1,228 @@
+"""
+On-demand sampling profiler for individual API requests.
+
+When an admin asks for it, a background thread samples the request thread's
+stack every few milliseconds (sys._current_frames) until the request ends,
+together with every thread the request hands work to: orchestration phases,
+report sections, SSE workers and batch items run through tracing.propagate(),
+which registers the thread with the request's profiler for as long as the
+work runs (sampled_thread()). Each stack is rooted at a "thread:<name>" frame
+so the flamegraph separates the request thread from its workers. The shared
+LLM scheduler thread serves every request and is not sampled; time waiting
+on it shows up as the worker's wait on the scheduler's future.
+
+The samples are kept as flamegraph-ready collapsed stacks ("a;b;c count",
+as consumed by flamegraph.pl / speedscope) together with a top-N self and
+inclusive time summary, stored under a profile id for later retrieval in a
+shared cache (services/shared_cache.py), so with CACHE_BACKEND = "sqlite" any
+worker process can return a profile recorded by another.
+
+Overhead is bounded by the sampling interval and a maximum profile duration,
+and nothing runs at all for requests that did not ask to be profiled.
+"""
+import contextvars
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from . import shared_cache
+
+_settings = {
+    'interval_seconds': 0.005,
+    'max_seconds': 120.0,
+    'max_stored': 20,
+    'top_n': 25
+}
+
+_BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Profiler of the request the calling code belongs to (copied into worker threads by tracing.propagate)
+_active: contextvars.ContextVar = contextvars.ContextVar('active_profiler', default=None)
+
+
+def configure(interval_ms: float = 5.0, max_seconds: float = 120.0, max_stored: int = 20, top_n: int = 25):
+    """Apply profiler settings (called once at startup from config.py values)"""
+    _settings.update(interval_seconds=max(interval_ms, 1.0) / 1000.0, max_seconds=max_seconds,
+                     max_stored=max_stored, top_n=top_n)
+
+
+class SamplingProfiler:
+    """Samples a request thread's call stack, and those of its registered workers, at a fixed interval"""
+
+    def __init__(self, thread_id: int, name: str):
+        self.profile_id = uuid.uuid4().hex[:16]
+        self.thread_id = thread_id
+        self.name = name
+        self.threads: Dict[int, str] = {thread_id: 'request'}
+        self.thread_samples: Counter = Counter()
+        self._threads_lock = threading.Lock()
+        self.interval = _settings['interval_seconds']
+        self.max_seconds = _settings['max_seconds']
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.truncated = False
+        self.started_at = None
+        self.elapsed = 0.0
+        self._labels: Dict[Any, str] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'profiler-{self.profile_id}', daemon=True)
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread.start()
+
+    def attach(self, thread_id: int, label: str) -> bool:
+        """Sample thread_id too until detach(); False if it is sampled already"""
+        with self._threads_lock:
+            if thread_id in self.threads:
+                return False
+            self.threads[thread_id] = label
+            return True
+
+    def detach(self, thread_id: int):
+        with self._threads_lock:
+            self.threads.pop(thread_id, None)
+
+    def stop(self) -> Dict[str, Any]:
+        """Stop sampling, store the profile and return its summary"""
+        if _active.get() is self:
+            _active.set(None)
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self.started_at
+        profile = self._build()
+        _store.put(profile)
+        return profile
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            if 'site-packages' in filename:
+                filename = filename.split('site-packages' + os.sep, 1)[-1]
+            elif filename.startswith(_BACKEND_ROOT):
+                filename = os.path.relpath(filename, _BACKEND_ROOT)
+            # ';' separates frames in collapsed stacks, so it must not appear inside a label
+            label = f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(';', ':')
+            self._labels[code] = label
+        return label
+
+    def _run(self):
+        deadline = time.perf_counter() + self.max_seconds
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if self.thread_id not in frames:
+                break
+            with self._threads_lock:
+                threads = list(self.threads.items())
+            for thread_id, thread_label in threads:
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(f"thread:{thread_label}")
+                self.stacks[';'.join(reversed(stack))] += 1
+                self.thread_samples[thread_label] += 1
+                self.samples += 1
+            if time.perf_counter() > deadline:
+                self.truncated = True
+                break
+
+    def _build(self) -> Dict[str, Any]:
+        self_counts: Counter = Counter()
+        inclusive_counts: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')[1:]  # Without the thread root
+            self_counts[frames[-1]] += count
+            for frame in set(frames):
+                inclusive_counts[frame] += count
+
+        def top(counts: Counter) -> List[Dict[str, Any]]:
+            return [{
+                'function': function,
+                'samples': count,
+                'seconds': round(count * self.interval, 4),
+                'percent': round(100.0 * count / self.samples, 2) if self.samples else 0.0
+            } for function, count in counts.most_common(_settings['top_n'])]
+
+        return {
+            'profile_id': self.profile_id,
+            'name': self.name,
+            'created_at': datetime.now().isoformat(),
+            'duration_seconds': round(self.elapsed, 4),
+            'interval_ms': self.interval * 1000,
+            'samples': self.samples,
+            'threads': dict(self.thread_samples.most_common()),
+            'truncated': self.truncated,
+            'top_self': top(self_counts),
+            'top_inclusive': top(inclusive_counts),
+            'collapsed': "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+        }
+
+
+class _ProfileStore:
+    """Bounded store of finished profiles in the shared cache, least recently used evicted first"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.profiles = None
+
+    def _cache(self):
+        # Created on first use: the cache backend is configured after this module is imported
+        with self.lock:
+            if self.profiles is None:
+                self.profiles = shared_cache.create('profiles', max_entries=_settings['max_stored'])
+            return self.profiles
+
+    def put(self, profile: Dict[str, Any]):
+        self._cache().set(profile['profile_id'], profile)
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        return self._cache().get(profile_id)
+
+    def summaries(self) -> List[Dict[str, Any]]:
+        profiles = sorted((p for _, p in self._cache().items()), key=lambda p: p['created_at'], reverse=True)
+        return [{key: value for key, value in p.items()
+                 if key not in ('collapsed', 'top_self', 'top_inclusive', 'threads')}
+                for p in profiles]
+
+
+_store = _ProfileStore()
+
+
+def start_profile(name: str) -> SamplingProfiler:
+    """Begin sampling the calling thread (and, through sampled_thread(), the threads it hands work to)"""
+    profiler = SamplingProfiler(threading.get_ident(), name)
+    _active.set(profiler)
+    profiler.start()
+    return profiler
+
+
+@contextmanager
+def sampled_thread():
+    """Sample the calling thread while the block runs, if the calling context belongs to a profiled request"""
+    profiler = _active.get()
+    thread_id = threading.get_ident()
+    attached = profiler is not None and profiler.attach(thread_id, threading.current_thread().name)
+    try:
+        yield
+    finally:
+        if attached:
+            profiler.detach(thread_id)
+
+
+def get_profile(profile_id: str) -> Optional[Dict[str, Any]]:
+    return _store.get(profile_id)
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    return _store.summaries()
@@ -0,0 +1,288 @@
+"""
+Compact prompt encoding for financial data snapshots.
+
+json.dumps(..., indent=2) spends most of its tokens on whitespace, quotes,
+braces and repeated keys. encode_snapshot() renders the same data as compact
+key/value tables instead:
+
+  - numbers are rounded to 4 significant digits, with K/M/B/T suffixes for
+    large magnitudes
+  - empty, zero, NaN and "N/A" fields are dropped (the prompts already tell
+    the model to treat missing data as unavailable)
+  - nested dicts collapse onto one "key: a=1, b=2" line and lists of records
+    become a header row plus one "|"-separated row per record
+  - sections are emitted in priority order until the token budget is spent,
+    so the least important data is what gets cut; a section cut short ends
+    with a "(N more fields omitted)" line, which counts against the budget
+
+The encoding is lossy: the model sees rounded values and not every field, so
+prompts must not ask for more precision than 4 significant digits.
+
+count_tokens() uses tiktoken's encoding once it has loaded and a characters/4
+estimate until then. The encoding is loaded in a background thread, and the
+first count waits at most TOKENIZER_LOAD_TIMEOUT_SECONDS for it: when the
+encoding is not cached locally tiktoken downloads it, and offline that
+request can hang or fail, in which case the estimate is used from then on.
+"""
+import logging
+import math
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Snapshot sections, most important first, with their prompt headings
+SECTION_PRIORITY: Sequence[Tuple[str, str]] = (
+    ('basic_info', 'COMPANY INFO'),
+    ('price_data', 'PRICE & PERFORMANCE'),
+    ('valuation_metrics', 'VALUATION'),
+    ('financial_statements', 'FINANCIAL STATEMENTS'),
+    ('risk_metrics', 'RISK'),
+    ('analyst_data', 'ANALYSTS'),
+    ('market_data', 'MARKET CONTEXT'),
+    ('technical_indicators', 'TECHNICALS'),
+    ('peer_comparison', 'PEERS'),
+    ('news_data', 'NEWS'),
+    ('web_scraped_data', 'WEB SOURCES')
+)
+
+# Bookkeeping fields that carry no analytical information
+SKIPPED_KEYS = {'symbol', 'scraping_timestamp', 'data_timestamp', 'error'}
+
+_EMPTY_STRINGS = {'', 'n/a', 'na', 'none', 'null', '-'}
+
+# How long the first token count waits for tiktoken's encoding before estimating
+TOKENIZER_LOAD_TIMEOUT_SECONDS = 2.0
+
+_settings = {
+    'snapshot_token_budget': 1500
+}
+
+_encoding = None
+_encoding_loader: Optional[threading.Thread] = None
+_encoding_lock = threading.Lock()
+
+
+def configure(snapshot_token_budget: int = 1500):
+    """Apply encoding settings (called once at startup from config.py values); 0 disables the budget"""
+    _settings['snapshot_token_budget'] = snapshot_token_budget
+
+
+def snapshot_token_budget() -> int:
+    return _settings['snapshot_token_budget']
+
+
+def _load_encoding():
+    global _encoding
+    try:
+        import tiktoken
+        _encoding = tiktoken.get_encoding('cl100k_base')
+    except Exception as e:
+        logger.info(f"tiktoken unavailable, estimating prompt tokens from length: {str(e)}")
+
+
+def _get_encoding():
+    """tiktoken's cl100k_base encoding; None while it is loading or when unavailable (e.g. offline)"""
+    global _encoding_loader
+    if _encoding_loader is None:
+        with _encoding_lock:
+            if _encoding_loader is None:
+                loader = threading.Thread(target=_load_encoding, name='tiktoken-loader', daemon=True)
+                loader.start()
+                loader.join(TOKENIZER_LOAD_TIMEOUT_SECONDS)
+                if loader.is_alive():
+                    logger.info("tiktoken encoding still loading, estimating prompt tokens from length meanwhile")
+                _encoding_loader = loader
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Token count of text (exact once tiktoken has loaded, otherwise ~4 characters per token)"""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def _is_empty(value: Any) -> bool:
+    if value is None:
+        return True
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return value == 0 or (isinstance(value, float) and math.isnan(value))
+    if isinstance(value, str):
+        return value.strip().lower() in _EMPTY_STRINGS
+    if isinstance(value, (dict, list, tuple)):
+        return len(value) == 0
+    return False
+
+
+def format_number(value: float) -> str:
+    """Round to 4 significant digits, abbreviating thousands and above (1234567 -> 1.235M)"""
+    if isinstance(value, bool):
+        return str(value)
+    if isinstance(value, float) and math.isinf(value):
+        return 'inf' if value > 0 else '-inf'
+    magnitude = abs(value)
+    for threshold, suffix in ((1e12, 'T'), (1e9, 'B'), (1e6, 'M'), (1e4, 'K')):
+        if magnitude >= threshold:
+            return f"{value / threshold:.4g}{suffix}"
+    if isinstance(value, int):
+        return str(value)
+    return f"{value:.4g}"
+
+
+def format_value(value: Any, max_chars: int = 200) -> str:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return format_number(value)
+    text = " ".join(str(value).split())
+    return text if len(text) <= max_chars else text[:max_chars - 3] + "..."
+
+
+def _compact(value: Any) -> Any:
+    """Recursively drop empty fields and bookkeeping keys"""
+    if isinstance(value, dict):
+        cleaned = {}
+        for key, item in value.items():
+            if key in SKIPPED_KEYS:
+                continue
+            item = _compact(item)
+            if not _is_empty(item):
+                cleaned[key] = item
+        return cleaned
+    if isinstance(value, (list, tuple)):
+        return [item for item in (_compact(v) for v in value) if not _is_empty(item)]
+    return value
+
+
+def _inline(value: Any) -> str:
+    """Render a value on a single line"""
+    if isinstance(value, dict):
+        return ", ".join(f"{key}={_inline(item)}" for key, item in value.items())
+    if isinstance(value, list):
+        return ", ".join(_inline(item) for item in value)
+    return format_value(value)
+
+
+def _table(records: List[Dict[str, Any]]) -> List[str]:
+    """A list of records as a header row plus one row per record"""
+    columns: List[str] = []
+    for record in records:
+        for key in record:
+            if key not in columns:
+                columns.append(key)
+    rows = [" | ".join(columns)]
+    for record in records:
+        rows.append(" | ".join(_inline(record[c]) if c in record else "" for c in columns))
+    return rows
+
+
+def _render_lines(data: Dict[str, Any], prefix: str = "") -> List[str]:
+    lines = []
+    for key, value in data.items():
+        label = f"{prefix}{key}"
+        if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+            lines.append(f"{label}:")
+            lines.extend(f"  {row}" for row in _table(value))
+        elif isinstance(value, dict) and any(isinstance(item, (dict, list)) for item in value.values()):
+            lines.extend(_render_lines(value, prefix=f"{label}."))
+        else:
+            lines.append(f"{label}: {_inline(value)}")
+    return lines
+
+
+def _omitted_line(count: int) -> str:
+    return f"({count} more fields omitted)"
+
+
+def _omitted_tokens(most: int) -> int:
+    """Budget to keep for the omitted-fields line (the count has at most as many digits as most)"""
+    return count_tokens(_omitted_line(most)) + 1
+
+
+def encode_section(title: str, data: Any) -> str:
+    """One section as a heading followed by compact key/value lines"""
+    data = _compact(data)
+    if _is_empty(data):
+        return ""
+    if not isinstance(data, dict):
+        return f"[{title}]\n{_inline(data)}"
+    return "\n".join([f"[{title}]"] + _render_lines(data))
+
+
+def encode_snapshot(data: Dict[str, Any], token_budget: Optional[int] = None,
+                    sections: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """
+    Encode a comprehensive data snapshot section by section in priority order, within
+    token_budget (default: the configured snapshot budget; 0 means unlimited).
+    Returns the text plus its token count and which sections were included, truncated or dropped.
+    """
+    if token_budget is None:
+        token_budget = _settings['snapshot_token_budget']
+    if not token_budget:
+        token_budget = None
+    parts = []
+    used = 0
+    included, truncated, dropped = [], [], []
+
+    for key, title in SECTION_PRIORITY:
+        if sections is not None and key not in sections:
+            continue
+        if key not in data:
+            continue
+        text = encode_section(title, data[key])
+        if not text:
+            continue
+
+        tokens = count_tokens(text) + 1
+        if token_budget is None or used + tokens <= token_budget:
+            parts.append(text)
+            used += tokens
+            included.append(key)
+            continue
+
+        # Fit as many whole lines of this section as the remaining budget allows, keeping room
+        # for the line that says how many were left out
+        lines = text.split("\n")
+        reserved = _omitted_tokens(len(lines) - 1)
+        kept = [lines[0]]
+        kept_tokens = count_tokens(lines[0]) + 1
+        for line in lines[1:]:
+            line_tokens = count_tokens(line) + 1
+            if used + kept_tokens + line_tokens + reserved > token_budget:
+                break
+            kept.append(line)
+            kept_tokens += line_tokens
+        if len(kept) > 1:
+            kept.append(_omitted_line(len(lines) - len(kept)))
+            parts.append("\n".join(kept))
+            used += kept_tokens + count_tokens(kept[-1]) + 1
+            truncated.append(key)
+        else:
+            dropped.append(key)
+
+    text = "\n\n".join(parts)
+    return {
+        'text': text,
+        'tokens': count_tokens(text),
+        'included': included,
+        'truncated': truncated,
+        'dropped': dropped
+    }
+
+
+def encode_data(title: str, data: Any, token_budget: Optional[int] = None) -> str:
+    """Encode an arbitrary dict (calculated metrics, comparison tables) as a compact section"""
+    text = encode_section(title, data)
+    if token_budget is None or count_tokens(text) <= token_budget:
+        return text
+    lines = text.split("\n")
+    kept, used = [], _omitted_tokens(len(lines))
+    for line in lines:
+        line_tokens = count_tokens(line) + 1
+        if used + line_tokens > token_budget:
+            break
+        kept.append(line)
+        used += line_tokens
+    return "\n".join(kept + [_omitted_line(len(lines) - len(kept))])
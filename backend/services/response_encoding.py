@@ -0,0 +1,126 @@
+"""
+Compressed and conditional API responses.
+
+Analysis results carry reports of tens of kilobytes plus the agent outputs
+they were built from, and JSON of that kind compresses several times over.
+compress_response() encodes a finished response with the best encoding the
+client accepts (Accept-Encoding): brotli when the optional brotli package is
+installed, else gzip. Small responses, non-JSON/text bodies and streams (SSE,
+NDJSON) are sent as they are; streams must reach the client event by event.
+
+Responses derived from a market data snapshot also get a weak ETag: the
+fingerprint() of the request's inputs (query, symbol, model tiers) and of the
+snapshot, leaving out the fetch timestamps. A client that sends the ETag back
+in If-None-Match on the endpoint's GET form gets 304 Not Modified without a
+body while the data is unchanged; for /api/analyze that also skips the whole
+agent pipeline, since the ETag is known as soon as the snapshot is. An
+/api/analyze POST always runs the analysis and gets no ETag, so it never waits
+for the snapshot before the agents start; a /api/market-data POST with a
+matching If-None-Match is answered with 412 Precondition Failed (RFC 9110
+13.1.2). Analyses in which an agent step or
+report section failed get no ETag, so their placeholders are never
+revalidated as current.
+"""
+import gzip
+import hashlib
+import json
+from typing import Any, Optional
+
+from .metrics import HTTP_RESPONSE_BYTES
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip only
+    brotli = None
+
+_settings = {
+    'enabled': True,
+    'min_bytes': 1024,
+    'gzip_level': 6,
+    'brotli_quality': 5,
+    'etags': True
+}
+
+# Body types worth compressing (images and archives are compressed already)
+_COMPRESSIBLE_MIMETYPES = ('application/json', 'text/')
+
+
+def configure(enabled: bool = True, min_bytes: int = 1024, gzip_level: int = 6, brotli_quality: int = 5,
+              etags: bool = True):
+    """Apply response compression settings (called once at startup from config.py values)"""
+    _settings.update(enabled=enabled, min_bytes=max(0, min_bytes), gzip_level=gzip_level,
+                     brotli_quality=brotli_quality, etags=etags)
+
+
+def available_encodings():
+    """Supported encodings in order of preference"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encodings) -> Optional[str]:
+    """The accepted encoding with the highest quality (werkzeug Accept; ties go to brotli), or None for identity"""
+    best, best_quality = None, 0
+    for encoding in available_encodings():
+        quality = accept_encodings.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def encode(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=_settings['brotli_quality'])
+    return gzip.compress(body, compresslevel=_settings['gzip_level'])
+
+
+def compress_response(response, request):
+    """Compress response for request's Accept-Encoding when that is worthwhile; returns response"""
+    if not _settings['enabled'] or request.method == 'HEAD':
+        return response
+    if response.is_streamed or response.direct_passthrough or response.status_code != 200:
+        return response
+    if 'Content-Encoding' in response.headers:
+        return response
+    if not (response.mimetype or '').startswith(_COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    encoding = choose_encoding(request.accept_encodings) if len(body) >= _settings['min_bytes'] else None
+    if encoding is None:
+        HTTP_RESPONSE_BYTES.inc(len(body), encoding='identity', form='original')
+        HTTP_RESPONSE_BYTES.inc(len(body), encoding='identity', form='sent')
+        return response
+
+    encoded = encode(body, encoding)
+    response.set_data(encoded)
+    # Any ETag stays as it is: it is weak, so it identifies the content whatever its encoding
+    response.headers['Content-Encoding'] = encoding
+    HTTP_RESPONSE_BYTES.inc(len(body), encoding=encoding, form='original')
+    HTTP_RESPONSE_BYTES.inc(len(encoded), encoding=encoding, form='sent')
+    return response
+
+
+def etags_enabled() -> bool:
+    return _settings['etags']
+
+
+# Snapshot fields that record when the data was fetched rather than what it is
+VOLATILE_FIELDS = ('data_timestamp', 'scraping_timestamp')
+
+
+def _without_volatile(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _without_volatile(item) for key, item in value.items() if key not in VOLATILE_FIELDS}
+    if isinstance(value, (list, tuple)):
+        return [_without_volatile(item) for item in value]
+    return value
+
+
+def fingerprint(*parts: Any) -> str:
+    """Stable hash of JSON-serializable parts, ignoring dict key order and VOLATILE_FIELDS"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(json.dumps(_without_volatile(part), sort_keys=True, default=str).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:32]
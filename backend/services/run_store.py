@@ -0,0 +1,149 @@
+"""
+Server-side store for step-by-step analysis runs.
+
+The frontend runs the research, analysis and recommendation agents one request
+at a time. Instead of sending every previous agent output back with each
+request, the research step opens a run and later steps pass its run id: the
+store keeps each agent's output plus the structured market data snapshot the
+research agent fetched, so the analysis step can reuse it instead of
+re-extracting the symbol and fetching the data again.
+
+Runs expire ttl_seconds after their last update and at most max_runs are kept
+(least recently used evicted first). With CACHE_BACKEND = "sqlite" runs are
+shared by all worker processes, so each step may be served by a different one.
+"""
+import re
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from . import shared_cache
+
+# Agent steps in the order they run, with the labels used in their context blocks
+AGENT_STEPS = (
+    ('research', 'Research Agent'),
+    ('analysis', 'Analysis Agent'),
+    ('recommendation', 'Recommendation Agent')
+)
+
+_RUN_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+_settings = {
+    'ttl_seconds': 1800,
+    'max_runs': 200
+}
+
+
+def configure(ttl_seconds: float = 1800, max_runs: int = 200):
+    """Apply run store settings (called once at startup from config.py values)"""
+    _settings.update(ttl_seconds=ttl_seconds, max_runs=max(1, max_runs))
+    _store.reset()
+
+
+class Run:
+    """One analysis run: the query, each agent's output and the research data snapshot"""
+
+    __slots__ = ('run_id', 'query', 'symbol', 'snapshot', 'outputs', 'created_at', 'updated_at')
+
+    def __init__(self, run_id: str, query: str):
+        self.run_id = run_id
+        self.query = query
+        self.symbol: Optional[str] = None
+        self.snapshot: Optional[Dict[str, Any]] = None
+        self.outputs: Dict[str, str] = {}
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+
+    def context(self, before: Optional[str] = None) -> str:
+        """Outputs of the steps that ran before step `before` (all steps if None), one block per agent"""
+        blocks = []
+        for step, label in AGENT_STEPS:
+            if step == before:
+                break
+            if step in self.outputs:
+                blocks.append(f"\n\n=== {label} Output ===\n{self.outputs[step]}")
+        return "".join(blocks)
+
+    def to_dict(self, include_outputs: bool = True) -> Dict[str, Any]:
+        result = {
+            'run_id': self.run_id,
+            'query': self.query,
+            'symbol': self.symbol,
+            'has_snapshot': self.snapshot is not None,
+            'steps_completed': [step for step, _ in AGENT_STEPS if step in self.outputs],
+            'created_at': self.created_at,
+            'expires_at': self.updated_at + _settings['ttl_seconds']
+        }
+        if include_outputs:
+            result['outputs'] = dict(self.outputs)
+        return result
+
+
+class _RunStore:
+    """Bounded, expiring map of run id -> Run"""
+
+    def __init__(self):
+        self._runs = None
+        self.lock = threading.Lock()
+
+    @property
+    def runs(self):
+        """The shared cache of runs, created with the configured limits on first use"""
+        if self._runs is None:
+            with self.lock:
+                if self._runs is None:
+                    self._runs = shared_cache.create('runs', max_entries=_settings['max_runs'],
+                                                     ttl_seconds=_settings['ttl_seconds'])
+        return self._runs
+
+    def reset(self):
+        with self.lock:
+            self._runs = None
+
+    def create(self, query: str) -> Run:
+        run = Run(uuid.uuid4().hex, query)
+        self.runs.set(run.run_id, run)
+        return run
+
+    def get(self, run_id: str) -> Optional[Run]:
+        if not run_id or not _RUN_ID_PATTERN.match(run_id):
+            return None
+        return self.runs.get(run_id)
+
+    def touch(self, run: Run):
+        """Save the run's changes (other worker processes see them with a shared cache backend)"""
+        run.updated_at = time.time()
+        self.runs.set(run.run_id, run)
+
+    def summaries(self) -> List[Dict[str, Any]]:
+        runs = [run for _, run in self.runs.items()]
+        return [run.to_dict(include_outputs=False) for run in reversed(runs)]
+
+
+_store = _RunStore()
+
+
+def create_run(query: str) -> Run:
+    return _store.create(query)
+
+
+def get_run(run_id: str) -> Optional[Run]:
+    """The run with this id, or None if it never existed or has expired"""
+    return _store.get(run_id)
+
+
+def record_output(run: Run, step: str, output: str):
+    run.outputs[step] = output
+    _store.touch(run)
+
+
+def record_snapshot(run: Run, symbol: Optional[str], snapshot: Optional[Dict[str, Any]]):
+    """Keep the research step's market data so later steps don't fetch it again"""
+    run.symbol = symbol
+    run.snapshot = snapshot
+    _store.touch(run)
+
+
+def list_runs() -> List[Dict[str, Any]]:
+    return _store.summaries()
@@ -0,0 +1,140 @@
+"""
+Input-fingerprinted store of generated report sections.
+
+The fingerprint of a section is a hash of the snapshot fields it consumes,
+encoded the way they are encoded into prompts (numbers rounded to 4
+significant digits, empty fields dropped), plus the query, the section's
+prompt and the other inputs the caller names (the agent output text the
+prompt carries). When a symbol is analyzed again
+and a section's fingerprint matches the one stored for it, the stored text is
+reused instead of regenerated, so while a symbol's data is unchanged only the
+sections that failed last time are written again.
+
+One entry (the latest) is kept per symbol and section; entries expire
+ttl_seconds after they were generated and at most max_entries are kept (least
+recently used evicted first). With CACHE_BACKEND = "sqlite" the entries are
+shared by all worker processes.
+"""
+import hashlib
+import re
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence
+
+from . import shared_cache
+from .metrics import REPORT_SECTION_REUSE
+from .prompt_encoding import encode_section
+
+_settings = {
+    'enabled': True,
+    'ttl_seconds': 86400,
+    'max_entries': 2000
+}
+
+_MISSING = object()
+
+
+def configure(enabled: bool = True, ttl_seconds: float = 86400, max_entries: int = 2000):
+    """Apply report section reuse settings (called once at startup from config.py values)"""
+    _settings.update(enabled=enabled, ttl_seconds=ttl_seconds, max_entries=max(1, max_entries))
+    _store.reset()
+
+
+def enabled() -> bool:
+    return _settings['enabled']
+
+
+def _field(snapshot: Dict[str, Any], path: str) -> Any:
+    """Value at a dotted path such as 'price_data.current_price'"""
+    value: Any = snapshot
+    for part in path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def fingerprint(snapshot: Dict[str, Any], fields: Sequence[str], *salt: str) -> str:
+    """Hash of the given snapshot fields (as encoded into prompts) and any extra strings"""
+    digest = hashlib.sha256()
+    for part in salt:
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    for path in fields:
+        value = _field(snapshot, path)
+        encoded = '<missing>' if value is _MISSING else encode_section(path, value)
+        digest.update(encoded.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r'\s+', ' ', query or '').strip().lower()
+
+
+class _SectionStore:
+    """Bounded, expiring map of (symbol, section) -> (fingerprint, text, generated_at)"""
+
+    def __init__(self):
+        self._entries = None
+        self.lock = threading.Lock()
+        self.reused = 0
+        self.regenerated = 0
+
+    @property
+    def entries(self):
+        """The shared cache of sections, created with the configured limits on first use"""
+        if self._entries is None:
+            with self.lock:
+                if self._entries is None:
+                    self._entries = shared_cache.create('report_sections', max_entries=_settings['max_entries'],
+                                                        ttl_seconds=_settings['ttl_seconds'])
+        return self._entries
+
+    def reset(self):
+        with self.lock:
+            self._entries = None
+
+    def lookup(self, symbol: str, section: str, section_fingerprint: str) -> Optional[str]:
+        entry = self.entries.get(f"{symbol}:{section}")
+        if entry and entry[0] == section_fingerprint and time.time() - entry[2] < _settings['ttl_seconds']:
+            with self.lock:
+                self.reused += 1
+            REPORT_SECTION_REUSE.inc(section=section, result='reused')
+            return entry[1]
+        with self.lock:
+            self.regenerated += 1
+        REPORT_SECTION_REUSE.inc(section=section, result='regenerated')
+        return None
+
+    def store(self, symbol: str, section: str, section_fingerprint: str, text: str):
+        self.entries.set(f"{symbol}:{section}", (section_fingerprint, text, time.time()))
+
+    def stats(self) -> Dict[str, Any]:
+        keys = self.entries.keys()
+        with self.lock:
+            lookups = self.reused + self.regenerated
+            return {
+                'enabled': _settings['enabled'],
+                'entries': len(keys),
+                'symbols': len({key.split(':', 1)[0] for key in keys}),
+                'reused': self.reused,
+                'regenerated': self.regenerated,
+                'reused_fraction': self.reused / lookups if lookups else 0.0
+            }
+
+
+_store = _SectionStore()
+
+
+def lookup(symbol: str, section: str, section_fingerprint: str) -> Optional[str]:
+    """The stored text of this section if it was generated from the same inputs, else None"""
+    return _store.lookup(symbol.upper(), section, section_fingerprint)
+
+
+def store(symbol: str, section: str, section_fingerprint: str, text: str):
+    _store.store(symbol.upper(), section, section_fingerprint, text)
+
+
+def stats() -> Dict[str, Any]:
+    return _store.stats()
@@ -0,0 +1,308 @@
+"""
+Caches that can be shared by the worker processes of one server.
+
+Under the development server every cache is a dict in the one process. With
+several worker processes (see gunicorn.conf.py) each worker would keep its own
+copy and fetch the same market data again, and a run opened on one worker
+would be unknown to the others. create() returns the cache selected by
+CACHE_BACKEND:
+
+- memory: an in-process LRU map (the default, for a single process)
+- sqlite: a table in a local SQLite database in WAL mode, shared by every
+  process on the host; values are pickled
+
+Both evict least recently used entries beyond max_entries and drop entries
+ttl_seconds after they were last written. The sqlite backend refreshes an
+entry's access time at most every ACCESS_WRITE_INTERVAL_SECONDS, so reads of
+hot entries do not each take the database write lock; its LRU order is only
+that precise. The sqlite backend also lets one
+process claim a key while it fetches the value, so the other processes wait
+for its result instead of fetching it again (claim / wait_released).
+"""
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('memory', 'sqlite')
+
+_settings = {
+    'backend': 'memory',
+    'path': os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'shared_cache.sqlite3'),
+    'lease_seconds': 60
+}
+
+# How stale a sqlite entry's last_access may get before a read refreshes it
+ACCESS_WRITE_INTERVAL_SECONDS = 30
+
+_caches: Dict[str, Any] = {}
+_lock = threading.Lock()
+
+
+def configure(backend: str = 'memory', path: Optional[str] = None, lease_seconds: float = 60):
+    """Apply cache backend settings (called once at startup from config.py values, before any cache is created)"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown CACHE_BACKEND '{backend}' (expected {', '.join(BACKENDS)})")
+    _settings.update(backend=backend, lease_seconds=lease_seconds)
+    if path:
+        _settings['path'] = path
+
+
+def is_shared() -> bool:
+    """True when caches are shared by every process on the host (the sqlite backend)"""
+    return _settings['backend'] == 'sqlite'
+
+
+def lease_seconds() -> float:
+    """How long a claim on a key is held at most (claims of crashed processes expire)"""
+    return _settings['lease_seconds']
+
+
+class MemoryCache:
+    """In-process LRU map with optional entry limit and TTL"""
+
+    def __init__(self, name: str, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries: 'OrderedDict[str, Tuple[Any, float]]' = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if self.ttl_seconds is not None and time.time() - entry[1] >= self.ttl_seconds:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, value: Any):
+        with self.lock:
+            self.entries[key] = (value, time.time())
+            self.entries.move_to_end(key)
+            while self.max_entries is not None and len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def items(self) -> List[Tuple[str, Any]]:
+        """Entries from least to most recently used"""
+        with self.lock:
+            return [(key, value) for key, (value, _) in self.entries.items()]
+
+    def keys(self) -> List[str]:
+        with self.lock:
+            return list(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    # A single process already shares fetches between its threads (single flight)
+    def claim(self, key: str) -> bool:
+        return True
+
+    def release(self, key: str):
+        pass
+
+    def wait_released(self, key: str, timeout: float):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {'entries': len(self.entries), 'max_entries': self.max_entries, 'ttl_seconds': self.ttl_seconds}
+
+
+class SQLiteCache:
+    """Cache table in a SQLite database shared by every process using the same path"""
+
+    def __init__(self, name: str, path: str, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self.name = name
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread (and per process, so forked workers reconnect)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('''CREATE TABLE IF NOT EXISTS cache_entries (
+                cache TEXT,
+                key TEXT,
+                value BLOB,
+                size INTEGER,
+                updated_at REAL,
+                last_access REAL,
+                PRIMARY KEY (cache, key)
+            )''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_cache_entries_last_access ON cache_entries (cache, last_access)')
+            conn.execute('''CREATE TABLE IF NOT EXISTS cache_claims (
+                cache TEXT,
+                key TEXT,
+                pid INTEGER,
+                expires_at REAL,
+                PRIMARY KEY (cache, key)
+            )''')
+            conn.commit()
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _expired_before(self, now: float) -> float:
+        return now - self.ttl_seconds if self.ttl_seconds is not None else float('-inf')
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                'SELECT value, last_access FROM cache_entries WHERE cache = ? AND key = ? AND updated_at > ?',
+                (self.name, key, self._expired_before(now))).fetchone()
+            if row is None:
+                return None
+            if now - row[1] >= ACCESS_WRITE_INTERVAL_SECONDS:
+                conn.execute('UPDATE cache_entries SET last_access = ? WHERE cache = ? AND key = ?',
+                             (now, self.name, key))
+                conn.commit()
+            return pickle.loads(row[0])
+        except (sqlite3.Error, pickle.UnpicklingError) as e:
+            logger.warning(f"Shared cache {self.name} lookup failed: {str(e)}")
+            return None
+
+    def set(self, key: str, value: Any):
+        now = time.time()
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            conn = self._connection()
+            conn.execute('INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?, ?, ?, ?)',
+                         (self.name, key, blob, len(blob), now, now))
+            conn.execute('DELETE FROM cache_entries WHERE cache = ? AND updated_at <= ?',
+                         (self.name, self._expired_before(now)))
+            if self.max_entries is not None:
+                conn.execute('''DELETE FROM cache_entries WHERE cache = ? AND key IN (
+                    SELECT key FROM cache_entries WHERE cache = ? ORDER BY last_access DESC LIMIT -1 OFFSET ?)''',
+                             (self.name, self.name, self.max_entries))
+            conn.commit()
+        except (sqlite3.Error, pickle.PicklingError, TypeError, AttributeError) as e:
+            logger.warning(f"Shared cache {self.name} store failed: {str(e)}")
+
+    def delete(self, key: str):
+        try:
+            conn = self._connection()
+            conn.execute('DELETE FROM cache_entries WHERE cache = ? AND key = ?', (self.name, key))
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache {self.name} delete failed: {str(e)}")
+
+    def items(self) -> List[Tuple[str, Any]]:
+        """Entries from least to most recently used"""
+        try:
+            rows = self._connection().execute(
+                'SELECT key, value FROM cache_entries WHERE cache = ? AND updated_at > ? ORDER BY last_access',
+                (self.name, self._expired_before(time.time()))).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache {self.name} scan failed: {str(e)}")
+            return []
+        items = []
+        for key, blob in rows:
+            try:
+                items.append((key, pickle.loads(blob)))
+            except pickle.UnpicklingError:
+                continue
+        return items
+
+    def keys(self) -> List[str]:
+        try:
+            rows = self._connection().execute(
+                'SELECT key FROM cache_entries WHERE cache = ? AND updated_at > ? ORDER BY last_access',
+                (self.name, self._expired_before(time.time()))).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache {self.name} scan failed: {str(e)}")
+            return []
+        return [row[0] for row in rows]
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def claim(self, key: str) -> bool:
+        """Claim key for this process while it fetches the value; False if another live process holds it"""
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute('DELETE FROM cache_claims WHERE cache = ? AND key = ? AND expires_at <= ?',
+                         (self.name, key, now))
+            conn.execute('INSERT OR IGNORE INTO cache_claims VALUES (?, ?, ?, ?)',
+                         (self.name, key, os.getpid(), now + _settings['lease_seconds']))
+            conn.commit()
+            row = conn.execute('SELECT pid FROM cache_claims WHERE cache = ? AND key = ?', (self.name, key)).fetchone()
+            return row is None or row[0] == os.getpid()
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache {self.name} claim failed: {str(e)}")
+            return True
+
+    def release(self, key: str):
+        try:
+            conn = self._connection()
+            conn.execute('DELETE FROM cache_claims WHERE cache = ? AND key = ? AND pid = ?',
+                         (self.name, key, os.getpid()))
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache {self.name} release failed: {str(e)}")
+
+    def wait_released(self, key: str, timeout: float):
+        """Wait until the claim on key is released or expires (at most timeout seconds)"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                row = self._connection().execute(
+                    'SELECT 1 FROM cache_claims WHERE cache = ? AND key = ? AND expires_at > ?',
+                    (self.name, key, time.time())).fetchone()
+            except sqlite3.Error:
+                return
+            if row is None:
+                return
+            time.sleep(0.05)
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            entries, size = self._connection().execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries WHERE cache = ? AND updated_at > ?',
+                (self.name, self._expired_before(time.time()))).fetchone()
+        except sqlite3.Error as e:
+            return {'error': str(e)}
+        return {'entries': entries, 'bytes': size, 'max_entries': self.max_entries, 'ttl_seconds': self.ttl_seconds}
+
+
+def create(name: str, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None):
+    """A cache on the configured backend; caches with the same name in different processes share entries"""
+    if _settings['backend'] == 'sqlite':
+        cache = SQLiteCache(name, _settings['path'], max_entries=max_entries, ttl_seconds=ttl_seconds)
+    else:
+        cache = MemoryCache(name, max_entries=max_entries, ttl_seconds=ttl_seconds)
+    with _lock:
+        _caches[name] = cache
+    return cache
+
+
+def stats() -> Dict[str, Any]:
+    """Backend plus entries (and bytes, for sqlite) per cache"""
+    with _lock:
+        caches = dict(_caches)
+    result = {'backend': _settings['backend'], 'pid': os.getpid()}
+    if _settings['backend'] == 'sqlite':
+        result['path'] = _settings['path']
+    result['caches'] = {name: cache.stats() for name, cache in caches.items()}
+    return result
@@ -0,0 +1,345 @@
+"""
+Lightweight request-scoped tracing.
+
+A trace is started per API request (its id is generated by the server; a
+client's X-Request-ID is only recorded as an attribute) and every
+instrumented block inside it - orchestrator phases, data sections, yfinance
+calls, scraper requests, LLM calls - records a nested span. The current span
+travels in a contextvar, so nesting works across function boundaries; work
+handed to other threads must be wrapped with propagate() to stay attached.
+
+Finished traces are kept in a bounded store for retrieval by id - a shared
+cache (services/shared_cache.py), so with CACHE_BACKEND = "sqlite" any worker
+process can return a trace recorded by another - and can be exported as
+plain JSON or OTLP/JSON, optionally pushed to a local collector (e.g.
+http://localhost:4318/v1/traces).
+"""
+import contextvars
+import hashlib
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+from . import shared_cache
+from .profiling import sampled_thread
+
+logger = logging.getLogger(__name__)
+
+_settings = {
+    'enabled': True,
+    'max_traces': 200,
+    'otlp_endpoint': '',
+    'service_name': 'financial-analysis-backend'
+}
+
+_TRACE_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+_OTLP_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    """One timed operation inside a trace"""
+
+    __slots__ = ('trace', 'span_id', 'parent_id', 'name', 'attributes', 'start_ns', 'end_ns', 'status', 'error')
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = dict(attributes)
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = 'ok'
+        self.error = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.status = 'error'
+            self.error = f"{type(error).__name__}: {error}"
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start_time': self.start_ns / 1e9,
+            'duration_ms': round(self.duration_ms, 3),
+            'status': self.status,
+            'error': self.error,
+            'attributes': self.attributes
+        }
+
+
+class Trace:
+    """All spans recorded for one request"""
+
+    def __init__(self, trace_id: str, name: str):
+        self.trace_id = trace_id
+        self.name = name
+        self.spans: List[Span] = []
+        self.lock = threading.Lock()
+        self.root: Optional[Span] = None
+
+    def add(self, span: Span):
+        with self.lock:
+            self.spans.append(span)
+
+    # Stored traces are pickled into the shared trace cache; the lock is recreated on load
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            spans = list(self.spans)
+        spans.sort(key=lambda s: s.start_ns)
+        return {
+            'trace_id': self.trace_id,
+            'name': self.name,
+            'duration_ms': round(self.root.duration_ms, 3) if self.root else None,
+            'status': self.root.status if self.root else None,
+            'span_count': len(spans),
+            'spans': [span.to_dict() for span in spans]
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Encode as an OTLP/JSON ExportTraceServiceRequest"""
+        def attribute(key: str, value: Any) -> Dict[str, Any]:
+            if isinstance(value, bool):
+                return {'key': key, 'value': {'boolValue': value}}
+            if isinstance(value, int):
+                return {'key': key, 'value': {'intValue': str(value)}}
+            if isinstance(value, float):
+                return {'key': key, 'value': {'doubleValue': value}}
+            return {'key': key, 'value': {'stringValue': str(value)}}
+
+        with self.lock:
+            spans = list(self.spans)
+
+        # OTLP requires 16-byte hex trace ids; other ids passed to begin_trace() are hashed into one
+        otlp_trace_id = self.trace_id if _OTLP_ID_PATTERN.match(self.trace_id) \
+            else hashlib.md5(self.trace_id.encode()).hexdigest()
+        otlp_spans = []
+        for span in spans:
+            encoded = {
+                'traceId': otlp_trace_id,
+                'spanId': span.span_id,
+                'name': span.name,
+                'kind': 2 if span is self.root else 1,  # SERVER for the request, INTERNAL otherwise
+                'startTimeUnixNano': str(span.start_ns),
+                'endTimeUnixNano': str(span.end_ns or time.time_ns()),
+                'attributes': [attribute(k, v) for k, v in span.attributes.items()],
+                'status': {'code': 2, 'message': span.error} if span.status == 'error' else {'code': 1}
+            }
+            if span.parent_id:
+                encoded['parentSpanId'] = span.parent_id
+            otlp_spans.append(encoded)
+
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': [attribute('service.name', _settings['service_name'])]},
+                'scopeSpans': [{'scope': {'name': 'services.tracing'}, 'spans': otlp_spans}]
+            }]
+        }
+
+
+class _TraceStore:
+    """Bounded store of finished traces in the shared cache, least recently used evicted first"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.traces = None
+
+    def _cache(self):
+        # Created on first use: the cache backend is configured after this module is imported
+        with self.lock:
+            if self.traces is None:
+                self.traces = shared_cache.create('traces', max_entries=_settings['max_traces'])
+            return self.traces
+
+    def put(self, trace: Trace):
+        self._cache().set(trace.trace_id, trace)
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        return self._cache().get(trace_id)
+
+    def recent(self, limit: int) -> List[Trace]:
+        traces = [t for _, t in self._cache().items()]
+        traces.sort(key=lambda t: t.root.start_ns if t.root else 0, reverse=True)
+        return traces[:limit]
+
+
+_store = _TraceStore()
+
+
+class _OtlpExporter:
+    """Background thread that POSTs finished traces to an OTLP/HTTP collector"""
+
+    def __init__(self):
+        self.queue: "queue.Queue[Trace]" = queue.Queue(maxsize=1000)
+        self.thread = None
+        self.pid = None
+
+    def submit(self, trace: Trace):
+        if self.thread is None or self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.thread = threading.Thread(target=self._run, name='otlp-exporter', daemon=True)
+            self.thread.start()
+        try:
+            self.queue.put_nowait(trace)
+        except queue.Full:
+            logger.warning("Trace export queue full - dropping trace %s", trace.trace_id)
+
+    def _run(self):
+        session = requests.Session()
+        while True:
+            trace = self.queue.get()
+            try:
+                session.post(_settings['otlp_endpoint'], json=trace.to_otlp(), timeout=5)
+            except requests.exceptions.RequestException as e:
+                logger.warning("Failed to export trace %s: %s", trace.trace_id, e)
+
+
+_exporter = _OtlpExporter()
+
+
+def configure(enabled: bool = True, max_traces: int = 200, otlp_endpoint: str = '',
+              service_name: str = 'financial-analysis-backend'):
+    """Apply tracing settings (called once at startup from config.py values)"""
+    _settings.update(enabled=enabled, max_traces=max_traces, otlp_endpoint=otlp_endpoint,
+                     service_name=service_name)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+def begin_trace(name: str, trace_id: Optional[str] = None, **attributes) -> Optional[Dict[str, Any]]:
+    """Start a trace and make its root span current; returns a handle for end_trace"""
+    if not _settings['enabled']:
+        return None
+    if not trace_id or not _TRACE_ID_PATTERN.match(trace_id):
+        trace_id = new_trace_id()
+    trace = Trace(trace_id, name)
+    root = Span(trace, name, None, attributes)
+    trace.root = root
+    trace.add(root)
+    token = _current_span.set(root)
+    return {'trace': trace, 'token': token}
+
+
+def end_trace(handle: Optional[Dict[str, Any]], error: Optional[BaseException] = None, **attributes):
+    """Finish the root span, store the trace and export it if a collector is configured"""
+    if not handle:
+        return
+    trace = handle['trace']
+    for key, value in attributes.items():
+        trace.root.set_attribute(key, value)
+    trace.root.finish(error)
+    try:
+        _current_span.reset(handle['token'])
+    except ValueError:
+        # Ended from a different context (e.g. a streamed response) - nothing to restore
+        pass
+    _store.put(trace)
+    if _settings['otlp_endpoint']:
+        _exporter.submit(trace)
+
+
+@contextmanager
+def trace(name: str, trace_id: Optional[str] = None, **attributes):
+    """Context manager form of begin_trace/end_trace for non-HTTP entry points"""
+    handle = begin_trace(name, trace_id, **attributes)
+    try:
+        yield handle['trace'] if handle else None
+    except BaseException as e:
+        end_trace(handle, error=e)
+        raise
+    else:
+        end_trace(handle)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Record a child span of the current span; a no-op outside of a trace"""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(parent.trace, name, parent.span_id, attributes)
+    parent.trace.add(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.finish(error=e)
+        raise
+    else:
+        child.finish()
+    finally:
+        _current_span.reset(token)
+
+
+def current_trace_id() -> Optional[str]:
+    current = _current_span.get()
+    return current.trace.trace_id if current else None
+
+
+def propagate(func: Callable) -> Callable:
+    """
+    Bind func to the caller's context so spans it records join the caller's trace
+    (and the thread running it is sampled while the caller's request is profiled)
+    """
+    context = contextvars.copy_context()
+
+    def sampled(args, kwargs):
+        with sampled_thread():
+            return func(*args, **kwargs)
+
+    def run(*args, **kwargs):
+        return context.run(sampled, args, kwargs)
+    return run
+
+
+def get_trace(trace_id: str, fmt: str = 'json') -> Optional[Dict[str, Any]]:
+    """Look up a finished trace by id, as plain JSON or OTLP/JSON"""
+    found = _store.get(trace_id)
+    if not found:
+        return None
+    return found.to_otlp() if fmt == 'otlp' else found.to_dict()
+
+
+def recent_traces(limit: int = 50) -> List[Dict[str, Any]]:
+    """Summaries of the most recent traces, newest first"""
+    return [{
+        'trace_id': t.trace_id,
+        'name': t.name,
+        'duration_ms': round(t.root.duration_ms, 3) if t.root else None,
+        'status': t.root.status if t.root else None,
+        'span_count': len(t.spans)
+    } for t in _store.recent(limit)]
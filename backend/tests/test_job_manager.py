@@ -0,0 +1,75 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from services import job_manager, shared_cache
+
+LEASE_SECONDS = 1.0
+
+
+def _configure(directory: str):
+    shared_cache.configure('sqlite', path=os.path.join(directory, 'shared_cache.sqlite3'), lease_seconds=LEASE_SECONDS)
+    job_manager.configure(results_dir=os.path.join(directory, 'jobs'))
+
+
+def _slow_analysis(job):
+    for _ in range(300):
+        job.check_cancelled()
+        time.sleep(0.1)
+    return {'ok': True}
+
+
+def _worker(directory: str, query: str, delay: float, results):
+    """One server worker process: submits query after delay and stays up while its job runs"""
+    _configure(directory)
+    time.sleep(delay)
+    record, created = job_manager.submit(query, 'AAPL', _slow_analysis)
+    results.put((record['job_id'], created))
+    time.sleep(30)
+
+
+@pytest.fixture
+def spawn(tmp_path):
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    processes = []
+
+    def start(query: str, delay: float = 0.0):
+        process = context.Process(target=_worker, args=(str(tmp_path), query, delay, results), daemon=True)
+        process.start()
+        processes.append(process)
+        return process, results.get(timeout=60)
+
+    yield start
+    for process in processes:
+        process.kill()
+        process.join()
+
+
+def test_submit_deduplicates_across_processes(spawn):
+    first, (job_id, created) = spawn('Analyze AAPL')
+    assert created
+    # Submitted after the first lease ran out: the first worker has been renewing its registration
+    _, (attached_id, attached_created) = spawn('analyze   aapl', delay=LEASE_SECONDS * 1.5)
+    assert (attached_id, attached_created) == (job_id, False)
+
+    first.kill()
+    first.join()
+    _, (new_id, new_created) = spawn('Analyze AAPL')
+    assert new_created and new_id != job_id
+
+
+def test_expired_registration_is_ignored(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_manager, '_settings', dict(job_manager._settings, results_dir=str(tmp_path)))
+    monkeypatch.setattr(job_manager, '_shared', shared_cache.MemoryCache('analysis_jobs'))
+    job = job_manager.Job('Analyze AAPL', 'AAPL', ())
+    job_manager._persist(job)
+    # A live process (ours' parent stands in for another worker) whose registration is no longer renewed
+    entry = {'job_id': job.job_id, 'pid': os.getppid(), 'expires_at': time.time() - 1}
+    job_manager._shared.set(f"active:{job.key}", entry)
+    assert job_manager._unfinished_elsewhere(job.key) is None
+
+    job_manager._shared.set(f"active:{job.key}", dict(entry, expires_at=time.time() + 60))
+    assert job_manager._unfinished_elsewhere(job.key)['job_id'] == job.job_id
@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+import pytest
+
+from services import llm_cache
+
+
+def model(name='gpt-4o', temperature=0.2, max_tokens=1000):
+    return SimpleNamespace(model_name=name, temperature=temperature, max_tokens=max_tokens)
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """An enabled cache in a temporary database"""
+    monkeypatch.setattr(llm_cache, '_settings', dict(llm_cache._settings))
+    llm_cache.configure(enabled=True, path=str(tmp_path / 'llm_cache.sqlite3'))
+    return llm_cache
+
+
+def test_cache_key_separates_model_temperature_and_max_tokens():
+    prompt = "Summarize AAPL"
+    keys = {llm_cache.cache_key(llm, prompt) for llm in (
+        model(), model(name='gpt-4o-mini'), model(temperature=0.7), model(max_tokens=3000))}
+    assert len(keys) == 4
+
+
+def test_cache_key_ignores_whitespace_and_timestamps():
+    assert llm_cache.cache_key(model(), "Report  for AAPL\n at 2026-01-02 10:00:00") == \
+        llm_cache.cache_key(model(), "Report for AAPL at 2026-03-04 11:30:00")
+
+
+def test_response_is_not_served_to_a_larger_token_limit(cache):
+    cache.store(model(max_tokens=1000), "Write the report", 'deep_report', "short report")
+    assert cache.lookup(model(max_tokens=1000), "Write the report", 'deep_report') == "short report"
+    assert cache.lookup(model(max_tokens=3000), "Write the report", 'deep_report') is None
+
+
+def test_bypass_skips_lookups_but_still_stores(cache):
+    with cache.bypass():
+        assert cache.bypassed()
+        cache.store(model(), "prompt", 'summarize', "fresh")
+        assert cache.lookup(model(), "prompt", 'summarize') is None
+    assert cache.lookup(model(), "prompt", 'summarize') == "fresh"
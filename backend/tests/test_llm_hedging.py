@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from services import llm_hedging
+from services.metrics import LLM_HEDGES
+
+
+@pytest.fixture(autouse=True)
+def hedging(monkeypatch):
+    """Fresh latency windows and budget with thresholds small enough for millisecond test calls"""
+    monkeypatch.setattr(llm_hedging, '_tracker', llm_hedging.LatencyTracker())
+    llm_hedging.configure(min_samples=5, budget_ratio=1.0, budget_burst=3, timeout_multiplier=3.0,
+                          min_timeout=0.02, max_timeout=5.0)
+    yield
+    llm_hedging.configure()
+
+
+class Slots:
+    """Stands in for the LLMScheduler's hedge slot reservation"""
+
+    def __init__(self, free: bool):
+        self.free = free
+        self.reserved = 0
+        self.released = 0
+
+    async def reserve_slot(self) -> bool:
+        self.reserved += self.free
+        return self.free
+
+    def release_slot(self):
+        self.released += 1
+
+
+def roomy_timeouts():
+    """Timeouts well above the test calls, so only the hedge decision matters"""
+    llm_hedging.configure(min_samples=5, budget_ratio=1.0, budget_burst=3, min_timeout=2.0, max_timeout=5.0)
+
+
+def seed(call_type: str, seconds: float, count: int = 5):
+    for _ in range(count):
+        llm_hedging._tracker.record(call_type, seconds)
+
+
+def test_timeouts_are_recorded_and_widen_the_timeout():
+    seed('slow', 0.005)
+    assert llm_hedging.timeout_for('slow') == pytest.approx(0.02)
+
+    async def never_answers(claim):
+        await asyncio.sleep(10)
+
+    timeouts = []
+    for _ in range(3):
+        with pytest.raises(llm_hedging.LLMTimeout):
+            asyncio.run(llm_hedging.run_hedged('slow', never_answers))
+        timeouts.append(llm_hedging.timeout_for('slow'))
+
+    assert llm_hedging._tracker.summary()['slow']['samples'] == 8
+    assert timeouts[-1] > 0.05
+    assert timeouts == sorted(timeouts)
+
+
+def test_failed_calls_are_recorded():
+    async def fails(claim):
+        raise ValueError("provider error")
+
+    with pytest.raises(ValueError):
+        asyncio.run(llm_hedging.run_hedged('failing', fails))
+    assert llm_hedging._tracker.summary()['failing']['samples'] == 1
+
+
+def test_hedge_is_skipped_without_a_free_slot():
+    roomy_timeouts()
+    seed('busy', 0.01)
+    attempts = []
+
+    async def slow(claim):
+        attempts.append(1)
+        await asyncio.sleep(0.1)
+        return 'done'
+
+    before = LLM_HEDGES.value(call_type='busy', outcome='no_capacity')
+    slots = Slots(free=False)
+    assert asyncio.run(llm_hedging.run_hedged('busy', slow, slots=slots)) == 'done'
+    assert len(attempts) == 1
+    assert LLM_HEDGES.value(call_type='busy', outcome='no_capacity') == before + 1
+    assert slots.released == 0
+
+
+def test_hedge_takes_a_slot_and_releases_it():
+    roomy_timeouts()
+    seed('straggler', 0.01)
+    attempts = []
+
+    async def first_slow(claim):
+        attempts.append(1)
+        await asyncio.sleep(1.0 if len(attempts) == 1 else 0.0)
+        return f"attempt {len(attempts)}"
+
+    slots = Slots(free=True)
+    assert asyncio.run(llm_hedging.run_hedged('straggler', first_slow, slots=slots)) == 'attempt 2'
+    assert slots.reserved == 1
+    assert slots.released == 1
+    assert LLM_HEDGES.value(call_type='straggler', outcome='hedge_won') >= 1
@@ -0,0 +1,49 @@
+import threading
+import time
+
+import pytest
+
+from services import prompt_encoding
+
+SNAPSHOT = {
+    'basic_info': {'name': 'Example Corp', 'sector': 'Technology', 'market_cap': 2.5e12, 'employees': 150000},
+    'price_data': {'current_price': 187.123456, 'returns': {f'{n}d': n * 0.0123 for n in range(1, 40)}},
+    'valuation_metrics': {f'metric_{n}': n * 1.5 for n in range(1, 60)},
+    'risk_metrics': {'beta': 1.21, 'volatility': 0.27},
+    'news_data': [{'title': f'Headline number {n} about the company', 'source': 'Wire'} for n in range(30)],
+}
+
+
+@pytest.fixture
+def estimated_tokens(monkeypatch):
+    """Count tokens with the characters/4 estimate, as when tiktoken is unavailable"""
+    monkeypatch.setattr(prompt_encoding, '_encoding_loader', threading.Thread())
+    monkeypatch.setattr(prompt_encoding, '_encoding', None)
+
+
+@pytest.mark.parametrize('budget', [40, 75, 120, 200, 350])
+def test_snapshot_stays_within_budget_including_omitted_line(estimated_tokens, budget):
+    encoded = prompt_encoding.encode_snapshot(SNAPSHOT, token_budget=budget)
+    assert encoded['truncated'] or encoded['dropped']
+    assert encoded['tokens'] <= budget
+
+
+@pytest.mark.parametrize('budget', [20, 60, 150])
+def test_encode_data_stays_within_budget_including_omitted_line(estimated_tokens, budget):
+    text = prompt_encoding.encode_data('VALUATION', SNAPSHOT['valuation_metrics'], token_budget=budget)
+    assert text.endswith('more fields omitted)')
+    assert prompt_encoding.count_tokens(text) <= budget
+
+
+def test_hanging_tokenizer_download_falls_back_to_estimate(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(prompt_encoding, '_encoding_loader', None)
+    monkeypatch.setattr(prompt_encoding, '_encoding', None)
+    monkeypatch.setattr(prompt_encoding, '_load_encoding', lambda: release.wait(5))
+    monkeypatch.setattr(prompt_encoding, 'TOKENIZER_LOAD_TIMEOUT_SECONDS', 0.05)
+    start = time.perf_counter()
+    try:
+        assert prompt_encoding.count_tokens('x' * 40) == 10
+        assert time.perf_counter() - start < 1
+    finally:
+        release.set()
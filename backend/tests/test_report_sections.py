@@ -0,0 +1,163 @@
+import asyncio
+import copy
+import threading
+
+import pytest
+
+from agents.llm_client import stream_tokens_to, token_sink
+from agents.report_sections import ENHANCED_REPORT_SECTIONS, ReportSection, agenerate_sections, generate_sections
+from services import section_store
+
+SECTIONS = (
+    ReportSection('first', 'FIRST', ('research',), ('price_data',), "- first"),
+    ReportSection('second', 'SECOND', ('analysis',), ('risk_metrics',), "- second"),
+)
+
+
+class FlakyCall:
+    """Streams part of an answer and fails on the first attempt per section, then succeeds"""
+
+    def __init__(self):
+        self.attempts = {}
+        self.lock = threading.Lock()
+
+    def outcome(self, call_type):
+        with self.lock:
+            self.attempts[call_type] = self.attempts.get(call_type, 0) + 1
+            attempt = self.attempts[call_type]
+        sink = token_sink()
+        if attempt == 1:
+            sink(f"partial {call_type}")
+            return "", "error"
+        sink(f"text {call_type}")
+        return f"text {call_type}", "success"
+
+    def __call__(self, prompt, call_type):
+        return self.outcome(call_type)
+
+    async def acall(self, prompt, call_type):
+        return self.outcome(call_type)
+
+
+def test_retried_section_streams_only_the_successful_attempt():
+    streamed = []
+    with stream_tokens_to(streamed.append):
+        result = generate_sections(FlakyCall(), SECTIONS, "query", {'research': 'r', 'analysis': 'a'},
+                                   retries=1, header="HEADER")
+    text = "".join(streamed)
+    assert "partial" not in text
+    assert text.index("text report_first") < text.index("text report_second")
+    assert result['report'] == "HEADER\n\ntext report_first\n\ntext report_second"
+
+
+def test_failed_section_streams_only_its_placeholder():
+    streamed = []
+    with stream_tokens_to(streamed.append):
+        result = generate_sections(FlakyCall(), SECTIONS, "query", {}, retries=0)
+    text = "".join(streamed)
+    assert "partial" not in text
+    assert text.count("could not be generated") == 2
+    assert all(section['failed'] for section in result['sections'])
+
+
+def test_async_retried_section_streams_only_the_successful_attempt():
+    streamed = []
+
+    async def run():
+        with stream_tokens_to(streamed.append):
+            return await agenerate_sections(FlakyCall().acall, SECTIONS, "query", {}, retries=1)
+
+    result = asyncio.run(run())
+    assert "partial" not in "".join(streamed)
+    assert [section['failed'] for section in result['sections']] == [False, False]
+
+
+SNAPSHOT = {
+    'price_data': {'current_price': 187.5, 'returns': {'1m': 0.021}, 'volatility_1y': 0.24,
+                   'data_timestamp': '2026-01-02T10:00:00'},
+    'basic_info': {'market_cap': 2.9e12},
+    'valuation_metrics': {'pe_ratio': 29.1, 'ps_ratio': 7.4},
+    'financial_statements': {'revenue': 3.9e11},
+    'market_data': {'sp500_return': 0.012},
+    'risk_metrics': {'beta': 1.2},
+    'news_data': [{'title': 'Earnings beat'}],
+    'analyst_data': {'latest_recommendation': 'buy'},
+}
+
+OUTPUTS = {'research': 'research text', 'analysis': 'analysis text', 'recommendations': 'recommendation text'}
+
+
+class CountingCall:
+    """Records which sections were generated"""
+
+    def __init__(self):
+        self.generated = []
+
+    def __call__(self, prompt, call_type):
+        self.generated.append(call_type[len('report_'):])
+        return f"text of {call_type}", 'success'
+
+
+@pytest.fixture
+def sections_store():
+    section_store.configure(enabled=True)
+    yield
+    section_store.configure()
+
+
+def run_report(snapshot=SNAPSHOT, outputs=OUTPUTS, reuse=True):
+    call = CountingCall()
+    result = generate_sections(call, ENHANCED_REPORT_SECTIONS, "Analyze AAPL", outputs, symbol='AAPL',
+                               snapshot=snapshot, model='report-model', reuse=reuse)
+    return sorted(call.generated), result
+
+
+def test_fingerprint_covers_consumed_fields_only():
+    fields = ('price_data.current_price', 'risk_metrics')
+    base = section_store.fingerprint(SNAPSHOT, fields, 'query')
+    moved = copy.deepcopy(SNAPSHOT)
+    moved['price_data']['current_price'] = 190.0
+    unrelated = copy.deepcopy(SNAPSHOT)
+    unrelated['news_data'] = [{'title': 'Something else'}]
+    assert section_store.fingerprint(moved, fields, 'query') != base
+    assert section_store.fingerprint(unrelated, fields, 'query') == base
+    assert section_store.fingerprint(SNAPSHOT, fields, 'other query') != base
+
+
+def test_unchanged_inputs_reuse_every_section(sections_store):
+    generated, _ = run_report()
+    assert len(generated) == len(ENHANCED_REPORT_SECTIONS)
+    generated, result = run_report()
+    assert generated == []
+    assert result['reused_fraction'] == 1.0
+
+
+def test_data_change_regenerates_only_sections_consuming_it(sections_store):
+    run_report()
+    changed = copy.deepcopy(SNAPSHOT)
+    changed['news_data'] = [{'title': 'Guidance cut'}]
+    generated, _ = run_report(snapshot=changed)
+    assert generated == ['risks']
+
+
+def test_agent_output_change_regenerates_sections_carrying_it(sections_store):
+    run_report()
+    generated, _ = run_report(outputs=dict(OUTPUTS, recommendations='a different recommendation'))
+    assert generated == ['executive_summary', 'recommendation']
+
+
+def test_fetch_timestamps_do_not_invalidate_sections(sections_store):
+    run_report()
+    refetched = copy.deepcopy(SNAPSHOT)
+    refetched['price_data']['data_timestamp'] = '2026-01-02T10:05:00'
+    generated, _ = run_report(snapshot=refetched)
+    assert generated == []
+
+
+def test_reuse_disabled_regenerates_and_replaces_sections(sections_store):
+    run_report()
+    generated, result = run_report(reuse=False)
+    assert len(generated) == len(ENHANCED_REPORT_SECTIONS)
+    assert result['reused_fraction'] == 0.0
+    generated, _ = run_report()
+    assert generated == []
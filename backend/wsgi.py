@@ -0,0 +1,11 @@
+"""
+WSGI entry point for production serving:
+
+    cd backend
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+See gunicorn.conf.py for the worker settings.
+"""
+from app import app
+
+__all__ = ['app']
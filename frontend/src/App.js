@@ -47,6 +47,58 @@ const App = () => {
     return formatted;
   };
 
+  // POST to a Server-Sent Events endpoint, calling onToken with each streamed text chunk.
+  // Resolves with the payload of the final 'done' event.
+  const streamAgent = async (endpoint, body, onToken) => {
+    const response = await fetch(endpoint, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Accept': 'text/event-stream'
+      },
+      body: JSON.stringify(body),
+    });
+
+    if (!response.ok || !response.body) {
+      throw new Error(`Request to ${endpoint} failed: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      // Events are separated by a blank line
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const rawEvent = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+
+        let eventName = 'message';
+        let data = '';
+        rawEvent.split('\n').forEach(line => {
+          if (line.startsWith('event: ')) eventName = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        });
+        const payload = data ? JSON.parse(data) : {};
+
+        if (eventName === 'token') {
+          onToken(payload.text);
+        } else if (eventName === 'done') {
+          return payload;
+        } else if (eventName === 'error') {
+          throw new Error(payload.error || `Request to ${endpoint} failed`);
+        }
+      }
+    }
+
+    throw new Error(`Stream from ${endpoint} ended without a result`);
+  };
+
   const handleQuerySubmit = async (query) => {
     setAnalysisState({
       isRunning: true,
@@ -110,7 +162,9 @@ const App = () => {
       { id: 'recommendation', endpoint: '/api/agents/recommendation', name: 'Recommendation Agent' }
     ];
 
-    let cumulativeContext = '';
+    // The research step opens a run on the server; later steps send its id instead of
+    // resending every previous agent output
+    let runId = null;
     const agentOutputs = {};
 
     for (let i = 0; i < agentEndpoints.length; i++) {
@@ -128,28 +182,26 @@ const App = () => {
       }));
 
       try {
-        // Call the specific agent endpoint
-        const response = await fetch(agent.endpoint, {
-          method: 'POST',
-          headers: {
-            'Content-Type': 'application/json',
-          },
-          body: JSON.stringify({ 
-            query: query,
-            context: cumulativeContext 
-          }),
+        // Stream the agent's output so it renders as it is generated
+        let streamedOutput = '';
+        const result = await streamAgent(`${agent.endpoint}/stream`, {
+          query: query,
+          run_id: runId
+        }, (text) => {
+          streamedOutput += text;
+          const partialOutput = streamedOutput;
+          setAnalysisState(prev => ({
+            ...prev,
+            steps: prev.steps.map((step, idx) =>
+              idx === i ? { ...step, output: partialOutput } : step
+            )
+          }));
         });
 
-        if (!response.ok) {
-          throw new Error(`Agent ${agent.name} failed: ${response.status}`);
-        }
-
-        const result = await response.json();
-
         if (result.success) {
           // Store the full agent output
           agentOutputs[agent.id] = result.result;
-          cumulativeContext += `\n\n=== ${agent.name} Output ===\n${result.result}`;
+          runId = result.run_id || runId;
 
           // Update step to completed with full output
           setAnalysisState(prev => ({
@@ -204,9 +256,7 @@ const App = () => {
         },
         body: JSON.stringify({ 
           query: query,
-          research: agentOutputs.research,
-          analysis: agentOutputs.analysis,
-          recommendations: agentOutputs.recommendation
+          run_id: runId
         }),
       });
       
@@ -373,7 +423,7 @@ ${agentOutputs.recommendation || 'Recommendations not available'}
       </main>
 
       <AgentOutputModal 
-        step={selectedStep}
+        step={selectedStep && (analysisState.steps.find(step => step.id === selectedStep.id) || selectedStep)}
         isOpen={showModal}
         onClose={handleCloseModal}
       />